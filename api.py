@@ -0,0 +1,165 @@
+"""Requêtes de l'API JSON (/api/tipsters, /api/tips)
+
+Filtres, tri et pagination par curseur (keyset) : chaque page reprend après la clé de tri du dernier
+élément de la page précédente, via une comparaison de row values `(clé..., id) > (?, ...)`. Chaque tri
+correspond à un index SQLite (voir DatabaseManager._create_schema) : le coût d'une page ne dépend que
+de sa taille, pas de la position dans les résultats ni du volume total.
+"""
+import base64
+import binascii
+import json
+import sqlite3
+from typing import Dict, List, Mapping, Optional, Tuple
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# Tri -> expressions de la clé, la dernière étant unique (départage)
+TIPSTER_SORTS = {
+    # Tipster qualifié par backtest sans win rate (BACKTEST_QUALIFY) : -1, une comparaison avec NULL ne
+    # serait jamais vraie et le curseur sauterait ces lignes
+    "win_rate": ("IFNULL(win_rate, -1)", "name"),
+    "name": ("name",),
+}
+TIP_SORTS = {
+    # Date/heure ISO du match (le jour affiché ne se trie pas toujours chronologiquement)
+    "time": ("IFNULL(kickoff, '')", "id"),
+    "odds": ("IFNULL(odds_value, 0)", "id"),
+    "id": ("id",),
+}
+
+# Source des tips : table et colonnes renvoyées
+TIP_SOURCES = {
+    "tomorrow": ("tips", ("id", "tipster_name", "day", "time", "bookmaker", "match", "tip", "odds", "score")),
+    "profile": ("matches", ("id", "tipster_name", "day", "time", "bookmaker", "match", "tip", "stake", "odds", "score")),
+}
+
+
+class ApiError(ValueError):
+    """Paramètre de requête invalide (réponse 400)"""
+
+
+def _number(args: Mapping[str, str], name: str) -> Optional[float]:
+    value = args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return float(value.replace(",", "."))
+    except ValueError:
+        raise ApiError(f"Paramètre {name} invalide : {value}")
+
+
+def _choice(args: Mapping[str, str], name: str, choices, default: str) -> str:
+    value = args.get(name) or default
+    if value not in choices:
+        raise ApiError(f"Paramètre {name} invalide : {value} (valeurs possibles : {', '.join(choices)})")
+    return value
+
+
+def _limit(args: Mapping[str, str]) -> int:
+    value = args.get("limit")
+    if value in (None, ""):
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ApiError(f"Paramètre limit invalide : {value}")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def encode_cursor(sort: str, order: str, key: Tuple) -> str:
+    payload = json.dumps([sort, order, list(key)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str, size: int) -> List:
+    """Clé de reprise du curseur ; il doit avoir été émis pour le même tri"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_order, key = json.loads(payload)
+    except (binascii.Error, ValueError, TypeError):
+        raise ApiError("Curseur invalide")
+    if (cursor_sort, cursor_order) != (sort, order) or not isinstance(key, list) or len(key) != size:
+        raise ApiError("Curseur émis pour un autre tri")
+    # Seules des valeurs scalaires peuvent être liées à la requête SQLite
+    if not all(value is None or isinstance(value, (str, int, float)) for value in key):
+        raise ApiError("Curseur invalide")
+    return key
+
+
+def _page(conn: sqlite3.Connection, table: str, columns: Tuple[str, ...], where: List[str], params: List,
+          sort: str, sort_keys: Tuple[str, ...], order: str, cursor: Optional[str], limit: int) -> Dict:
+    """Une page de résultats et le curseur de la suivante (None en fin de résultats)"""
+    if cursor:
+        key = decode_cursor(cursor, sort, order, len(sort_keys))
+        where = where + [f'({", ".join(sort_keys)}) {"<" if order == "desc" else ">"} ({", ".join("?" * len(key))})']
+        params = params + key
+    direction = " DESC" if order == "desc" else ""
+    key_columns = [f"{expression} AS _key{i}" for i, expression in enumerate(sort_keys)]
+    query = (
+        f'SELECT {", ".join(columns + tuple(key_columns))} FROM {table}'
+        + (f' WHERE {" AND ".join(where)}' if where else '')
+        + f' ORDER BY {", ".join(expression + direction for expression in sort_keys)} LIMIT ?'
+    )
+    rows = conn.execute(query, params + [limit + 1]).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, order, tuple(last[f"_key{i}"] for i in range(len(sort_keys))))
+    return {
+        "items": [{column: row[column] for column in columns} for row in rows],
+        "next_cursor": next_cursor
+    }
+
+
+def query_tipsters(conn: sqlite3.Connection, args: Mapping[str, str]) -> Dict:
+    """Tipsters qualifiés.
+
+    Paramètres : min_win_rate, bookmaker (au moins un match à venir chez ce bookmaker), day,
+    sort (win_rate|name), order (asc|desc), limit, cursor.
+    """
+    sort = _choice(args, "sort", TIPSTER_SORTS, "win_rate")
+    order = _choice(args, "order", ("asc", "desc"), "desc" if sort == "win_rate" else "asc")
+    where, params = ["qualified = 1"], []
+    min_win_rate = _number(args, "min_win_rate")
+    if min_win_rate is not None:
+        where.append("win_rate >= ?")
+        params.append(min_win_rate)
+    for column in ("bookmaker", "day"):
+        if args.get(column):
+            where.append(f"EXISTS (SELECT 1 FROM matches m WHERE m.tipster_name = tipsters.name AND m.{column} = ?)")
+            params.append(args[column])
+    return _page(
+        conn, "tipsters", ("name", "win_rate", "tips", "profile_url"), where, params,
+        sort, TIPSTER_SORTS[sort], order, args.get("cursor"), _limit(args)
+    )
+
+
+def query_tips(conn: sqlite3.Connection, args: Mapping[str, str]) -> Dict:
+    """Tips des tipsters qualifiés.
+
+    Paramètres : source (tomorrow = page "Tomorrow Tips", profile = matchs à venir des profils),
+    bookmaker, min_odds, day, tipster, min_win_rate, sort (time|odds|id), order (asc|desc), limit, cursor.
+    """
+    table, columns = TIP_SOURCES[_choice(args, "source", TIP_SOURCES, "tomorrow")]
+    sort = _choice(args, "sort", TIP_SORTS, "time")
+    order = _choice(args, "order", ("asc", "desc"), "desc" if sort == "odds" else "asc")
+    where, params = [], []
+    for column, parameter in (("bookmaker", "bookmaker"), ("day", "day"), ("tipster_name", "tipster")):
+        if args.get(parameter):
+            where.append(f"{column} = ?")
+            params.append(args[parameter])
+    min_odds = _number(args, "min_odds")
+    if min_odds is not None:
+        where.append("odds_value >= ?")
+        params.append(min_odds)
+    min_win_rate = _number(args, "min_win_rate")
+    if min_win_rate is not None:
+        where.append("tipster_name IN (SELECT name FROM tipsters WHERE qualified = 1 AND win_rate >= ?)")
+        params.append(min_win_rate)
+    return _page(
+        conn, table, columns, where, params,
+        sort, TIP_SORTS[sort], order, args.get("cursor"), _limit(args)
+    )
@@ -0,0 +1,213 @@
+"""Backtest vectorisé des tips enregistrés (NumPy)
+
+Les tips réglables de `settled_tips` sont chargés en tableaux colonnes, réglés en bloc puis
+agrégés par tipster avec np.bincount / ufunc.reduceat : nombre de tips, taux de réussite,
+ROI (mises plates), yield (pondéré par la mise), drawdown maximum et croissance de bankroll
+en Kelly fractionnaire. Aucun calcul ne boucle sur les tips en Python.
+"""
+import sqlite3
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from stats import SCORE_RE, TOTAL_RE
+
+# Codes de marché des tips
+UNKNOWN, HOME, DRAW, AWAY, HOME_DRAW, DRAW_AWAY, HOME_AWAY, BTTS_YES, BTTS_NO, OVER, UNDER = range(11)
+MARKETS = {
+    "1": HOME, "X": DRAW, "2": AWAY,
+    "1X": HOME_DRAW, "X2": DRAW_AWAY, "12": HOME_AWAY,
+    "BTTS": BTTS_YES, "BTTS YES": BTTS_YES, "GG": BTTS_YES,
+    "BTTS NO": BTTS_NO, "NG": BTTS_NO,
+}
+
+
+class TipArrays(NamedTuple):
+    """Tips en colonnes, triés par tipster puis par date"""
+    tipster_names: List[str]
+    tipster: np.ndarray   # index dans tipster_names (int32)
+    market: np.ndarray    # code de marché (int8)
+    line: np.ndarray      # ligne over/under (float64, NaN sinon)
+    home: np.ndarray      # buts domicile (int16, -1 si score inconnu)
+    away: np.ndarray      # buts extérieur (int16, -1 si score inconnu)
+    odds: np.ndarray      # float64
+    stake: np.ndarray     # float64
+
+
+def _encode_tip(tip: str):
+    tip = (tip or "").strip().upper()
+    if tip in MARKETS:
+        return MARKETS[tip], np.nan
+    total = TOTAL_RE.fullmatch(tip)
+    if total:
+        return (OVER if total.group(1).upper().startswith("O") else UNDER), float(total.group(2).replace(",", "."))
+    return UNKNOWN, np.nan
+
+
+def _encode_score(score: str):
+    found = SCORE_RE.search(score or "")
+    return (int(found.group(1)), int(found.group(2))) if found else (-1, -1)
+
+
+def _factorize(values: Iterable) -> Tuple[List, np.ndarray]:
+    """Valeurs distinctes (ordre d'apparition) et code de chaque élément, par table de hachage"""
+    codes: Dict = {}
+    index = np.fromiter((codes.setdefault(value, len(codes)) for value in values), dtype=np.int64)
+    return list(codes), index
+
+
+def _to_float(values: Iterable, default: float) -> np.ndarray:
+    """Colonne numérique ; les chaînes ("1,85") ne sont converties qu'une fois par valeur distincte"""
+    values = list(values)
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+    unique_values, index = _factorize(values)
+    numbers = np.full(len(unique_values), default)
+    for i, value in enumerate(unique_values):
+        try:
+            numbers[i] = float(str(value).replace(",", "."))
+        except ValueError:
+            pass
+    return numbers[index]
+
+
+def from_columns(tipsters: Iterable[str], tips: Iterable[str], scores: Iterable[str],
+                 odds: Iterable, stakes: Iterable) -> TipArrays:
+    """Construit les tableaux à partir de colonnes brutes (chaînes telles que parsées), déjà triées par tipster"""
+    tipster_names, tipster_index = _factorize(tipsters)
+
+    # Les tips et scores distincts sont peu nombreux : on ne parse que les valeurs uniques
+    unique_tips, tip_index = _factorize(tips)
+    encoded_tips = [_encode_tip(tip) for tip in unique_tips]
+    market = np.array([m for m, _ in encoded_tips], dtype=np.int8)[tip_index]
+    line = np.array([l for _, l in encoded_tips], dtype=np.float64)[tip_index]
+
+    unique_scores, score_index = _factorize(scores)
+    goals = np.array([_encode_score(score) for score in unique_scores], dtype=np.int16).reshape(-1, 2)[score_index]
+
+    return TipArrays(
+        tipster_names=tipster_names,
+        tipster=tipster_index.astype(np.int32),
+        market=market,
+        line=line,
+        home=goals[:, 0],
+        away=goals[:, 1],
+        odds=_to_float(odds, np.nan),
+        stake=_to_float(stakes, 1.0),
+    )
+
+
+def load_tips(conn: sqlite3.Connection, names: Optional[List[str]] = None) -> TipArrays:
+    """Charge les tips réglables enregistrés (table settled_tips), éventuellement pour certains tipsters"""
+    query = 'SELECT tipster_name, tip, score, odds, stake FROM settled_tips'
+    params: List[str] = []
+    if names is not None:
+        query += f' WHERE tipster_name IN ({", ".join("?" * len(names))})'
+        params = names
+    # Ordre chronologique (date/heure ISO du match) : drawdown et mise de Kelly sans regard vers l'avenir.
+    # Les tips sans date lisible viennent en premier.
+    rows = conn.execute(query + ' ORDER BY tipster_name, kickoff, day, time', params).fetchall()
+    columns = list(zip(*rows)) if rows else [[], [], [], [], []]
+    return from_columns(*columns)
+
+
+def settle(tips: TipArrays) -> np.ndarray:
+    """Résultat de chaque tip : 1 gagné, 0 perdu, -1 non réglable (score inconnu, marché inconnu, push)"""
+    home, away = tips.home.astype(np.int32), tips.away.astype(np.int32)
+    total = home + away
+    won = np.select(
+        [
+            tips.market == HOME, tips.market == DRAW, tips.market == AWAY,
+            tips.market == HOME_DRAW, tips.market == DRAW_AWAY, tips.market == HOME_AWAY,
+            tips.market == BTTS_YES, tips.market == BTTS_NO,
+            tips.market == OVER, tips.market == UNDER,
+        ],
+        [
+            home > away, home == away, away > home,
+            home >= away, away >= home, home != away,
+            (home > 0) & (away > 0), (home == 0) | (away == 0),
+            total > tips.line, total < tips.line,
+        ],
+        default=False
+    )
+    settled = (home >= 0) & (tips.market != UNKNOWN) & ~np.isnan(tips.odds)
+    settled &= ~(((tips.market == OVER) | (tips.market == UNDER)) & (total == tips.line))
+    return np.where(settled, won.astype(np.int8), np.int8(-1))
+
+
+def evaluate(tips: TipArrays, kelly_fraction: float = 0.25, kelly_cap: float = 0.1,
+             prior_wins: float = 1.0, prior_losses: float = 1.0) -> Dict[str, Dict]:
+    """Métriques par tipster (tips dans l'ordre chronologique de chaque tipster).
+
+    La mise Kelly d'un tip n'utilise que les tips précédents du même tipster (taux de réussite a posteriori
+    d'un prior Beta(prior_wins, prior_losses)), pour ne pas regarder le futur.
+    """
+    outcome = settle(tips)
+    mask = outcome >= 0
+    group = tips.tipster[mask]
+    won = outcome[mask].astype(np.float64)
+    odds = tips.odds[mask]
+    stake = tips.stake[mask]
+    n_groups = len(tips.tipster_names)
+    if not len(group):
+        return {}
+
+    flat_return = np.where(won == 1, odds - 1, -1.0)
+    profit = stake * flat_return
+    n = np.bincount(group, minlength=n_groups)
+    wins = np.bincount(group, weights=won, minlength=n_groups)
+    staked = np.bincount(group, weights=stake, minlength=n_groups)
+    total_profit = np.bincount(group, weights=profit, minlength=n_groups)
+    flat_profit = np.bincount(group, weights=flat_return, minlength=n_groups)
+
+    # Début de chaque groupe (les tips sont triés par tipster)
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    present = group[starts]
+    sizes = np.diff(np.r_[starts, len(group)])
+    offsets = np.repeat(starts, sizes)
+
+    # Drawdown maximum de la courbe de profit : décalage par groupe pour un cummax qui repart à zéro
+    cumulative = np.cumsum(profit)
+    cumulative -= np.repeat(np.r_[0.0, cumulative[starts[1:] - 1]], sizes)
+    shift = 2 * np.abs(profit).sum() + 1
+    group_shift = np.repeat(np.arange(len(starts)) * shift, sizes)
+    peak = np.maximum(np.maximum.accumulate(cumulative + group_shift) - group_shift, 0.0)
+    drawdown = np.maximum.reduceat(peak - cumulative, starts)
+
+    # Kelly fractionnaire avec le taux de réussite connu avant chaque tip
+    wins_before = np.cumsum(won) - won
+    wins_before -= np.repeat(np.r_[0.0, np.cumsum(won)[starts[1:] - 1]], sizes)
+    tips_before = np.arange(len(group)) - offsets
+    p = (wins_before + prior_wins) / (tips_before + prior_wins + prior_losses)
+    edge = (p * odds - 1) / np.maximum(odds - 1, 1e-9)
+    fraction = np.clip(edge * kelly_fraction, 0.0, kelly_cap)
+    log_growth = np.add.reduceat(np.log1p(fraction * flat_return), starts)
+
+    results = {}
+    for i, g in enumerate(present):
+        results[tips.tipster_names[g]] = {
+            "tips": int(n[g]),
+            "wins": int(wins[g]),
+            "hit_rate": float(100 * wins[g] / n[g]),
+            "roi": float(100 * flat_profit[g] / n[g]),
+            "yield": float(100 * total_profit[g] / staked[g]) if staked[g] else 0.0,
+            "profit": float(total_profit[g]),
+            "max_drawdown": float(drawdown[i]),
+            "kelly_growth": 100 * float(np.expm1(log_growth[i])),
+        }
+    return results
+
+
+def qualify(results: Dict[str, Dict], min_tips: int, min_hit_rate: float = 0.0, min_yield: float = float("-inf"),
+            max_drawdown: float = float("inf")) -> List[str]:
+    """Tipsters qui passent tous les seuils, triés par yield décroissant"""
+    selected = [
+        name for name, metrics in results.items()
+        if metrics["tips"] >= min_tips
+        and metrics["hit_rate"] >= min_hit_rate
+        and metrics["yield"] >= min_yield
+        and metrics["max_drawdown"] <= max_drawdown
+    ]
+    return sorted(selected, key=lambda name: results[name]["yield"], reverse=True)
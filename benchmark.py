@@ -0,0 +1,718 @@
+"""Benchmarks hors-ligne du scraper contre un serveur HTTP local (stub)
+
+Usage :
+    python benchmark.py fetch --profiles 200 --latency 0.08
+    python benchmark.py pipeline --profiles 500 --tips 200 --parse-workers 4
+    python benchmark.py parse --repeat 200
+    python benchmark.py backtest --tipsters 2000 --tips 1000
+    python benchmark.py startup --repeat 5
+    python benchmark.py serve --workers 1,4 --duration 5
+    python benchmark.py cycle --tipsters 1000 --cycles 2 --change 0.1
+    python benchmark.py record --tipsters 10000 --out recordings/synthetic
+    python benchmark.py cycle --replay recordings/synthetic
+    python benchmark.py notify --tipsters 300 --change 0.2
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import socketserver
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import backtest
+import bet
+import metrics
+import notify
+import records
+import replay
+from parsers import PARSER_BACKENDS
+
+# Modules que le processus web ne doit pas charger au démarrage
+HEAVY_MODULES = ["requests", "bs4", "lxml", "numpy", "matplotlib"]
+
+BOOKMAKERS = ["Bet365", "Betclic", "Unibet", "Pinnacle", "Winamax"]
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Fichiers et répertoires de CONFIG redirigés vers un répertoire temporaire pendant une mesure
+WORK_PATHS = ("DATABASE", "SNAPSHOT_DIR", "CHART_DIR", "CACHE_DIR", "METRICS_FILE", "WEB_METRICS_DIR")
+
+# Page enregistrée -> méthode de parsing de TipsterScraper
+FIXTURE_PARSERS = {
+    "tomorrow": "parse_tomorrow_page",
+    "remainder": "parse_remainder_page",
+    "profile": "parse_tipster_profile_page",
+}
+
+
+def bench_pipeline(profiles: int, latency: float, tips: int, workers: int, parse_workers: int):
+    """Compare le parsing dans les threads de fetch au pipeline fetch -> pool de processus de parsing"""
+    bet.CONFIG["FETCH_WORKERS"] = workers
+    bet.CONFIG["FETCH_PER_HOST"] = workers
+    with stub_server(latency, tips) as base_url:
+        urls: List[str] = [f"{base_url}/profile/tipster{i}" for i in range(profiles)]
+        timings = {}
+        results = {}
+        for mode, n_parse in (("threads", 0), (f"pipeline ({parse_workers} processus)", parse_workers)):
+            scraper = bet.TipsterScraper(parse_workers=n_parse)
+            try:
+                if scraper.parse_pool is not None:
+                    # Démarrage des processus hors mesure
+                    list(scraper.parse_pool.map(abs, range(n_parse)))
+                start = time.perf_counter()
+                results[mode] = scraper.fetch_tipster_profiles(urls)
+                timings[mode] = time.perf_counter() - start
+            finally:
+                scraper.close()
+
+    first, *others = results.values()
+    assert all(r == first for r in others), "Le pipeline renvoie des profils différents"
+    print(f"{profiles} profils de {tips} tips, latence {latency * 1000:.0f} ms, {workers} threads de fetch")
+    for mode, elapsed in timings.items():
+        print(f"  {mode:<24} : {elapsed:.2f}s ({profiles / elapsed:.1f} profils/s)")
+
+
+def bench_backtest(tipsters: int, tips_per_tipster: int):
+    """Temps de chargement en colonnes, de règlement et d'agrégation du backtest vectorisé"""
+    rng = random.Random(0)
+    markets = ["1", "X", "2", "1X", "X2", "12", "BTTS", "BTTS NO", "Over 2.5", "Under 2.5", "Over 1.5"]
+    scores = [f"{home}:{away}" for home in range(5) for away in range(5)]
+    total = tipsters * tips_per_tipster
+    columns = (
+        [f"tipster{i:05d}" for i in range(tipsters) for _ in range(tips_per_tipster)],
+        [rng.choice(markets) for _ in range(total)],
+        [rng.choice(scores) for _ in range(total)],
+        [f"{rng.uniform(1.1, 4.0):.2f}" for _ in range(total)],
+        [str(rng.randint(1, 10)) for _ in range(total)],
+    )
+
+    start = time.perf_counter()
+    tips = backtest.from_columns(*columns)
+    load_time = time.perf_counter() - start
+    start = time.perf_counter()
+    results = backtest.evaluate(tips)
+    evaluate_time = time.perf_counter() - start
+    selected = backtest.qualify(results, min_tips=20, min_hit_rate=55, min_yield=5, max_drawdown=30)
+
+    print(f"{tipsters} tipsters x {tips_per_tipster} tips = {total} tips")
+    print(f"  colonnes  : {load_time:.2f}s")
+    print(f"  backtest  : {evaluate_time:.2f}s ({total / evaluate_time / 1e6:.1f} M tips/s)")
+    print(f"  qualifiés : {len(selected)}")
+
+
+def load_fixture(name: str) -> bytes:
+    """Charge une page HTML enregistrée dans fixtures/"""
+    with open(os.path.join(FIXTURES_DIR, f"{name}.html"), "rb") as f:
+        return f.read()
+
+
+def render_profile_page(name: str, win_rate: int, n_tips: int = 5) -> str:
+    """Génère une page de profil synthétique avec la même structure que typersi.com"""
+    rng = random.Random(name)
+    rows = "".join(
+        f"<tr><td>{i + 1}</td><td>2025-01-{(i % 28) + 1:02d}</td><td>{12 + i % 10}:00</td>"
+        f"<td>{rng.choice(BOOKMAKERS)}</td><td>Team {i}A - Team {i}B</td><td>1</td>"
+        f"<td>{rng.randint(1, 10)}</td><td>{rng.uniform(1.2, 4.0):.2f}</td><td>-</td></tr>"
+        for i in range(n_tips)
+    )
+    return (
+        f"<html><body><h1>{name}</h1>"
+        f"<div class=\"stat\"><div class=\"progressC\"><span>{win_rate}%</span></div></div>"
+        f"<h2 class=\"typ fw-bold\">Tips</h2><div class=\"table-responsive\"><table>"
+        f"<thead><tr><th>#</th></tr></thead><tbody>{rows}</tbody></table></div>"
+        f"</body></html>"
+    )
+
+
+def listing_row(position: int, name: str, rng: random.Random, revision: int = 0) -> str:
+    """Ligne de tip d'une page de listing ; `revision` change la ligne (et donc son empreinte)"""
+    return (
+        f"<tr><td>{position}</td>"
+        f"<td class=\"fw-bold\"><a class=\"link-underline-warning\" href=\"/profile/{name}\">{name}</a></td>"
+        f"<td>{12 + position % 10}:{revision * 5 % 60:02d}</td><td>{rng.choice(BOOKMAKERS)}</td>"
+        f"<td>Team {position}A - Team {position}B</td><td>1</td><td>{rng.randint(1, 10)}</td>"
+        f"<td>{rng.uniform(1.2, 4.0) + revision:.2f}</td><td>-</td></tr>"
+    )
+
+
+def render_listing_page(title: str, rows: List[str]) -> str:
+    """Page de listing (Remainder / Tomorrow Tips) avec la même structure que typersi.com"""
+    return (
+        f"<html><body><h2 class=\"typ fw-bold\">{title}</h2><div class=\"table-responsive\"><table>"
+        f"<thead><tr><th>#</th></tr></thead><tbody>{''.join(rows)}</tbody></table></div>"
+        f"</body></html>"
+    )
+
+
+class SyntheticSite:
+    """Pages de listing synthétiques pour `tipsters` tipsters (profils : render_profile_page).
+
+    La page Remainder liste chaque tipster une fois, la page Tomorrow Tips `tomorrow_tips` tips de
+    tipsters tirés au hasard ; `touch` modifie une fraction des lignes pour simuler un nouveau cycle.
+    """
+    def __init__(self, tipsters: int, tomorrow_tips: int, profile_tips: int = 5, seed: int = 0):
+        self.names = [f"tipster{i:06d}" for i in range(tipsters)]
+        self.tomorrow_tips = tomorrow_tips
+        self.profile_tips = profile_tips
+        self.seed = seed
+        self.revisions: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self.listings: Dict[str, bytes] = {}
+        self._render()
+
+    def _render(self):
+        rng = random.Random(self.seed)
+        remainder = [listing_row(i, name, rng, self.revisions.get(name, 0)) for i, name in enumerate(self.names)]
+        tomorrow = []
+        for i in range(self.tomorrow_tips):
+            name = rng.choice(self.names)
+            tomorrow.append(listing_row(i, name, rng, self.revisions.get(name, 0)))
+        self.listings = {
+            "/remainder": render_listing_page("Remainder", remainder).encode("utf-8"),
+            "/tomorrow": render_listing_page("Tomorrow tips", tomorrow).encode("utf-8"),
+        }
+
+    def touch(self, fraction: float):
+        """Change les lignes (et le profil) d'une fraction des tipsters"""
+        for name in self._rng.sample(self.names, int(len(self.names) * fraction)):
+            self.revisions[name] = self.revisions.get(name, 0) + 1
+        self._render()
+
+    def page(self, path: str) -> bytes:
+        if path in self.listings:
+            return self.listings[path]
+        name = path.rstrip("/").rsplit("/", 1)[-1]
+        return render_profile_page(name, random.Random(name).randint(0, 100),
+                                   self.profile_tips + self.revisions.get(name, 0)).encode("utf-8")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Sert des pages de profil synthétiques (et les listings d'un SyntheticSite) avec une latence simulée
+    (ETag / 304 supportés)"""
+    latency = 0.0
+    tips = 5
+    site: Optional[SyntheticSite] = None
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if self.site is not None:
+            body = self.site.page(self.path)
+        else:
+            name = self.path.rstrip("/").rsplit("/", 1)[-1]
+            body = render_profile_page(name, random.Random(name).randint(0, 100), self.tips).encode("utf-8")
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def stub_server(latency: float, tips: int = 5, site: Optional[SyntheticSite] = None):
+    """Démarre le serveur stub sur un port libre et renvoie son URL de base"""
+    handler = type("Handler", (StubHandler,), {"latency": latency, "tips": tips, "site": site})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextmanager
+def bench_config(**overrides):
+    """Redirige les fichiers de CONFIG (WORK_PATHS) vers un répertoire temporaire et applique `overrides` ;
+    CONFIG et le cache Flask sont restaurés à la sortie. Renvoie le répertoire temporaire"""
+    saved = dict(bet.CONFIG)
+    try:
+        with tempfile.TemporaryDirectory() as work:
+            bet.CONFIG.update({key: os.path.join(work, os.path.basename(bet.CONFIG[key])) for key in WORK_PATHS})
+            bet.CONFIG.update(overrides)
+            # Le cache Flask est construit à l'import : il faut le réinitialiser pour qu'il suive CACHE_DIR
+            bet.cache.init_app(bet.app, config=bet.cache_config())
+            yield work
+    finally:
+        bet.CONFIG.clear()
+        bet.CONFIG.update(saved)
+        bet.cache.init_app(bet.app, config=bet.cache_config())
+
+
+def bench_fetch(profiles: int, latency: float, workers: int):
+    """Compare le fetch séquentiel des profils au fetch concurrent"""
+    bet.CONFIG["FETCH_WORKERS"] = workers
+    bet.CONFIG["FETCH_PER_HOST"] = workers
+    with stub_server(latency) as base_url:
+        urls: List[str] = [f"{base_url}/profile/tipster{i}" for i in range(profiles)]
+
+        scraper = bet.TipsterScraper()
+        start = time.perf_counter()
+        sequential = [scraper.fetch_tipster_profile_data(url) for url in urls]
+        sequential_time = time.perf_counter() - start
+
+        scraper = bet.TipsterScraper()
+        start = time.perf_counter()
+        concurrent = scraper.fetch_tipster_profiles(urls)
+        concurrent_time = time.perf_counter() - start
+
+    assert sequential == concurrent, "Les résultats concurrents diffèrent du fetch séquentiel"
+    print(f"{profiles} profils, latence {latency * 1000:.0f} ms, {workers} workers")
+    print(f"  séquentiel : {sequential_time:.2f}s ({profiles / sequential_time:.1f} profils/s)")
+    print(f"  concurrent : {concurrent_time:.2f}s ({profiles / concurrent_time:.1f} profils/s)")
+    print(f"  speedup    : x{sequential_time / concurrent_time:.1f}")
+
+
+def bench_parse(repeat: int, tips_per_profile: int):
+    """Pages parsées par seconde pour chaque backend, sur les fixtures et une page de profil synthétique"""
+    pages = {name: (method, load_fixture(name)) for name, method in FIXTURE_PARSERS.items()}
+    pages["profile-synth"] = (
+        "parse_tipster_profile_page",
+        render_profile_page("synthetic", 80, n_tips=tips_per_profile).encode("utf-8")
+    )
+    print(f"{repeat} itérations par page ({tips_per_profile} tips par profil synthétique)")
+    for name, (method, html) in pages.items():
+        results = {}
+        for backend in PARSER_BACKENDS:
+            parse = getattr(bet.TipsterScraper(parser_backend=backend), method)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                results[backend] = parse(html)
+            elapsed = time.perf_counter() - start
+            print(f"  {name:<14} {backend:<5} {repeat / elapsed:>9.0f} pages/s")
+        assert len({json.dumps(records.plain(r), sort_keys=True) for r in results.values()}) == 1, f"Sorties différentes pour {name}"
+
+
+def import_times(module: str) -> Dict[str, int]:
+    """Temps d'import cumulé (µs) de chaque module chargé par `import module` (python -X importtime)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_response(timeout: float = 30.0) -> float:
+    """Secondes entre le lancement de `bet.py web` et la première réponse de /"""
+    port = free_port()
+    with tempfile.TemporaryDirectory() as work:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "bet.py"),
+             "web", "--host", "127.0.0.1", "--port", str(port)],
+            cwd=work, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            while time.perf_counter() - start < timeout:
+                try:
+                    with socket.create_connection(("127.0.0.1", port), timeout=1) as conn:
+                        conn.sendall(b"GET / HTTP/1.0\r\nHost: localhost\r\n\r\n")
+                        if conn.recv(12).startswith(b"HTTP/1."):
+                            return time.perf_counter() - start
+                except OSError:
+                    time.sleep(0.02)
+            raise TimeoutError("le serveur web n'a pas répondu")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def bench_startup(repeat: int, top: int):
+    """Temps d'import de bet (python -X importtime) et délai avant la première réponse du processus web"""
+    runs = [import_times("bet") for _ in range(repeat)]
+    total = statistics.median(run["bet"] for run in runs)
+    print(f"import bet : {total / 1000:.0f} ms (médiane de {repeat})")
+    slowest = sorted(((t, name) for name, t in runs[-1].items() if name != "bet"), reverse=True)[:top]
+    for t, name in slowest:
+        print(f"  {name:<40} {t / 1000:7.1f} ms")
+
+    check = subprocess.run(
+        [sys.executable, "-c",
+         "import sys, importlib.util, bet; "
+         f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules "
+         "and not isinstance(sys.modules[m], importlib.util._LazyModule)))"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+    )
+    eager = check.stdout.split()
+    print(f"modules lourds chargés à l'import : {', '.join(eager) if eager else 'aucun'}")
+    print(f"première réponse de `bet.py web` : {time_to_first_response():.2f}s")
+
+
+def populate_dashboard(tipsters: int, tips: int):
+    """Remplit la base courante (CONFIG) avec des données synthétiques et publie le snapshot"""
+    rng = random.Random(0)
+    names = [f"tipster{i:05d}" for i in range(tipsters)]
+    qualified = [{
+        "name": name,
+        "win_rate": float(rng.randint(76, 95)),
+        "profile_url": f"https://www.typersi.com/profile/{name}",
+        "upcoming_matches": []
+    } for name in names]
+    tomorrow_tips = records.TipColumns(records.Tip.create(
+        tipster_name=rng.choice(names),
+        time=f"{rng.randint(12, 22)}:{rng.choice(['00', '30'])}",
+        bookmaker=rng.choice(BOOKMAKERS),
+        match="Home - Away",
+        tip=rng.choice(["1", "X", "2"]),
+        odds=f"{rng.uniform(1.1, 4.0):.2f}",
+        score="-"
+    ) for _ in range(tips))
+    bet.DatabaseManager().save_cycle(qualified, tomorrow_tips, datetime.date.today().isoformat())
+    bet.publish_dashboard()
+
+
+def bench_serve(worker_counts: List[int], duration: float, clients: int, tipsters: int, tips: int):
+    """Débit de gunicorn (wsgi:app) selon le nombre de workers, sur le snapshot et l'API"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    paths = ["/", "/dashboard.json", "/api/tipsters?limit=50", "/api/tips?limit=50&sort=odds&min_odds=2"]
+    with bench_config() as work:
+        populate_dashboard(tipsters, tips)
+        print(f"{tipsters} tipsters, {tips} tips, {clients} clients, {duration:.0f}s par mesure")
+
+        for workers in worker_counts:
+            port = free_port()
+            process = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn", "-c", os.path.join(root, "gunicorn.conf.py"),
+                 "--chdir", work, "--pythonpath", root, "--workers", str(workers),
+                 "--bind", f"127.0.0.1:{port}", "--access-logfile", "/dev/null", "wsgi:app"],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                for _ in range(300):
+                    try:
+                        bet.requests.get(base_url + "/", timeout=1)
+                        break
+                    except bet.requests.ConnectionError:
+                        time.sleep(0.05)
+
+                def client(offset: int) -> int:
+                    session = bet.requests.Session()
+                    done, end = 0, time.perf_counter() + duration
+                    while time.perf_counter() < end:
+                        response = session.get(base_url + paths[(offset + done) % len(paths)],
+                                               headers={"Accept-Encoding": "gzip"})
+                        assert response.status_code == 200, response.status_code
+                        done += 1
+                    return done
+
+                with ThreadPoolExecutor(clients) as executor:
+                    total = sum(executor.map(client, range(clients)))
+                print(f"  {workers:>2} workers : {total / duration:7.0f} requêtes/s")
+            finally:
+                process.terminate()
+                process.wait()
+
+
+def record_synthetic(site: SyntheticSite, directory: str):
+    """Écrit les pages du site synthétique comme réponses enregistrées aux URLs de CONFIG (rejouables sans serveur)"""
+    urls = {"/remainder": bet.CONFIG["SCRAPE_URL_REMAINDER"], "/tomorrow": bet.CONFIG["SCRAPE_URL_TOMORROW_TIPS"]}
+    urls.update((f"/profile/{name}", f'{bet.CONFIG["SCRAPE_URL_BASE"]}/profile/{name}') for name in site.names)
+    os.makedirs(directory, exist_ok=True)
+    for path, url in urls.items():
+        body = site.page(path)
+        headers = {"Content-Type": "text/html; charset=utf-8", "ETag": '"%s"' % hashlib.md5(body).hexdigest()}
+        replay.save_response(directory, url, 200, headers, body)
+    print(f"{len(urls)} réponses enregistrées dans {directory} ({len(site.names)} tipsters)")
+
+
+def histogram_totals(histogram: metrics.Histogram) -> Dict[str, float]:
+    """Nombre d'observations et somme d'un histogramme, tous labels confondus"""
+    count, total = 0, 0.0
+    for observations, value in histogram.totals().values():
+        count += observations
+        total += value
+    return {"count": count, "sum": total}
+
+
+def bench_cycle(tipsters: int, tomorrow_tips: int, profile_tips: int, cycles: int, change: float, latency: float,
+                parse_workers: int, replay_dir: Optional[str], trace_memory: bool):
+    """Cycles complets (scheduled_job) contre le site synthétique ou des réponses enregistrées :
+    durée, pic mémoire et débit du parsing, des écritures en base et du rendu"""
+    # scheduled_job envoie les digests : jamais vers la vraie boîte (.env) pendant une mesure
+    with bench_config(PARSE_WORKERS=parse_workers, EMAIL_USER=None), ExitStack() as stack:
+        site = None
+        if replay_dir:
+            bet.CONFIG.update(HTTP_REPLAY="replay", HTTP_REPLAY_DIR=replay_dir)
+            print(f"Rejeu des réponses de {replay_dir}")
+        else:
+            site = SyntheticSite(tipsters, tomorrow_tips, profile_tips)
+            base_url = stack.enter_context(stub_server(latency, profile_tips, site))
+            bet.CONFIG.update(SCRAPE_URL_REMAINDER=f"{base_url}/remainder", SCRAPE_URL_TOMORROW_TIPS=f"{base_url}/tomorrow",
+                              SCRAPE_URL_BASE=base_url)
+            print(f"Site synthétique : {tipsters} tipsters, {tomorrow_tips} tips demain, {profile_tips} tips par profil, "
+                  f"latence {latency * 1000:.0f} ms")
+        bet.DatabaseManager.ensure_schema()
+        chart_service = bet.get_chart_service()
+
+        for n in range(cycles):
+            if n and site is not None and change:
+                site.touch(change)
+            parse_before = histogram_totals(metrics.PARSE_SECONDS)
+            db_before = histogram_totals(metrics.DB_WRITE_SECONDS)
+            fetch_before = histogram_totals(metrics.FETCH_SECONDS)
+            if trace_memory:
+                tracemalloc.start()
+            start = time.perf_counter()
+            cycle = bet.scheduled_job()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+            if trace_memory:
+                tracemalloc.stop()
+
+            start = time.perf_counter()
+            chart_service.wait()
+            charts_time = time.perf_counter() - start
+            start = time.perf_counter()
+            bet.publish_dashboard()
+            dashboard_time = time.perf_counter() - start
+
+            parse = {k: v - parse_before[k] for k, v in histogram_totals(metrics.PARSE_SECONDS).items()}
+            db = {k: v - db_before[k] for k, v in histogram_totals(metrics.DB_WRITE_SECONDS).items()}
+            fetch = {k: v - fetch_before[k] for k, v in histogram_totals(metrics.FETCH_SECONDS).items()}
+            print(f"cycle {n + 1} ({cycle['status']}) : {elapsed:.2f}s"
+                  + (f", pic mémoire {peak / 2 ** 20:.1f} Mio" if peak is not None else ""))
+            print(f"  profils     : {cycle.get('profiles_fetched', 0)} récupérés, {cycle.get('profiles_reused', 0)} réutilisés, "
+                  f"{cycle.get('profiles_failed', 0)} en échec ; {cycle.get('qualified', 0)} qualifiés, {cycle.get('tips', 0)} tips")
+            print(f"  fetch       : {fetch['count']:.0f} requêtes, {fetch['sum']:.2f}s cumulées")
+            if parse["sum"]:
+                print(f"  parsing     : {parse['count']:.0f} pages en {parse['sum']:.2f}s ({parse['count'] / parse['sum']:.0f} pages/s)")
+            print(f"  base        : {db['count']:.0f} écritures en {db['sum']:.2f}s")
+            print(f"  rendu       : tableau de bord {dashboard_time * 1000:.0f} ms, graphiques {charts_time:.2f}s (après le cycle)")
+
+
+class SmtpStubHandler(socketserver.StreamRequestHandler):
+    """Session SMTP minimale (EHLO, AUTH, MAIL, RCPT, DATA, NOOP, RSET, QUIT) : compte les connexions et garde
+    les messages reçus"""
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        self.reply("220 stub ESMTP")
+        for line in iter(self.rfile.readline, b""):
+            command = line.decode("ascii", "replace").strip().split(" ", 1)[0].upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250-stub", "250 AUTH PLAIN")
+            elif command == "AUTH":
+                self.reply("235 2.7.0 Authentication successful")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in iter(self.rfile.readline, b""):
+                    if data_line == b".\r\n":
+                        break
+                    data.append(data_line)
+                with self.server.lock:
+                    self.server.messages.append(b"".join(data))
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+    def reply(self, *lines: str):
+        self.wfile.write("".join(f"{line}\r\n" for line in lines).encode("ascii"))
+
+
+@contextmanager
+def smtp_stub():
+    """Démarre le serveur SMTP stub sur un port libre et renvoie le serveur (connections, messages)"""
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SmtpStubHandler)
+    server.daemon_threads = True
+    server.connections, server.messages, server.lock = 0, [], threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def read_sse(client, cursor: int, events: List[Dict], stop: threading.Event):
+    """Lit le flux /events depuis `cursor` (Last-Event-ID) dans `events` jusqu'à ce que `stop` soit levé"""
+    response = client.get("/events", headers={"Last-Event-ID": str(cursor)}, buffered=False)
+    try:
+        for chunk in response.response:
+            for message in chunk.decode("utf-8").split("\n\n"):
+                for line in message.split("\n"):
+                    if line.startswith("data: "):
+                        events.append(dict(json.loads(line[len("data: "):]), received_at=time.time()))
+            if stop.is_set():
+                break
+    finally:
+        response.close()
+
+
+def bench_notify(tipsters: int, tomorrow_tips: int, change: float, recipients: int):
+    """Trois cycles complets contre le site synthétique : événements de tips, délai de diffusion sur /events et
+    digests envoyés au serveur SMTP stub (le comportement est vérifié par test_notify.py)"""
+    site = SyntheticSite(tipsters, tomorrow_tips)
+    with stub_server(0.0, site=site) as base_url, smtp_stub() as smtp, bench_config(
+            SCRAPE_URL_REMAINDER=f"{base_url}/remainder", SCRAPE_URL_TOMORROW_TIPS=f"{base_url}/tomorrow",
+            SCRAPE_URL_BASE=base_url, SMTP_SERVER="127.0.0.1", SMTP_PORT=smtp.server_address[1], SMTP_SSL=False,
+            EMAIL_USER="bench@localhost", EMAIL_PASSWORD="bench", DIGEST_MIN_INTERVAL=0, DIGEST_MIN_ODDS=0,
+            DIGEST_RECIPIENTS=[f"user{i}@localhost" for i in range(recipients)],
+            SSE_POLL_SECONDS=0.1, SSE_HEARTBEAT_SECONDS=0.2
+    ):
+        print(f"Site synthétique : {tipsters} tipsters, {tomorrow_tips} tips demain, {change:.0%} modifiés par cycle, "
+              f"{recipients} destinataires")
+        bet.DatabaseManager.ensure_schema()
+        client = bet.app.test_client()
+
+        for n in range(3):
+            if n:
+                site.touch(change)
+            with bet.db_reader() as conn:
+                cursor = notify.latest_event_id(conn)
+            received, stop = [], threading.Event()
+            reader = threading.Thread(target=read_sse, args=(client, cursor, received, stop), daemon=True)
+            reader.start()
+            messages_before = len(smtp.messages)
+
+            start = time.perf_counter()
+            bet.scheduled_job()
+            elapsed = time.perf_counter() - start
+            with bet.db_reader() as conn:
+                events = notify.events_since(conn, cursor, limit=None)
+            deadline = time.monotonic() + 5
+            while len(received) < len(events) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            stop.set()
+            reader.join()
+
+            added = sum(1 for event in events if event["kind"] == "added")
+            delays = sorted(event["received_at"] - event["created_at"] for event in received)
+            messages = smtp.messages[messages_before:]
+            print(f"cycle {n + 1} : {elapsed:.2f}s, {added} tips ajoutés, {len(events) - added} retirés, "
+                  f"{len(received)} diffusés sur /events"
+                  + (f" (délai médian {statistics.median(delays) * 1000:.0f} ms, max {delays[-1] * 1000:.0f} ms)" if delays else "")
+                  + f", {len(messages)} emails, {smtp.connections} connexion(s) SMTP")
+
+        bet.get_mailer().close()
+        bet.get_event_feed().close()
+        # Les graphiques du dernier cycle sont écrits dans le répertoire temporaire : attendre avant de le supprimer
+        bet.get_chart_service().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fetch_parser = subparsers.add_parser("fetch", help="fetch séquentiel vs concurrent des profils")
+    fetch_parser.add_argument("--profiles", type=int, default=200)
+    fetch_parser.add_argument("--latency", type=float, default=0.08, help="latence simulée par requête (s)")
+    fetch_parser.add_argument("--workers", type=int, default=bet.CONFIG["FETCH_WORKERS"])
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="parsing en threads vs pool de processus")
+    pipeline_parser.add_argument("--profiles", type=int, default=500)
+    pipeline_parser.add_argument("--latency", type=float, default=0.01, help="latence simulée par requête (s)")
+    pipeline_parser.add_argument("--tips", type=int, default=200, help="lignes de tips par profil")
+    pipeline_parser.add_argument("--workers", type=int, default=bet.CONFIG["FETCH_WORKERS"])
+    pipeline_parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 2)
+
+    parse_parser = subparsers.add_parser("parse", help="micro-benchmark des backends de parsing")
+    parse_parser.add_argument("--repeat", type=int, default=200)
+    parse_parser.add_argument("--tips", type=int, default=50, help="lignes de tips du profil synthétique")
+
+    backtest_parser = subparsers.add_parser("backtest", help="backtest vectorisé sur des tips synthétiques")
+    backtest_parser.add_argument("--tipsters", type=int, default=2000)
+    backtest_parser.add_argument("--tips", type=int, default=1000, help="tips par tipster")
+
+    startup_parser = subparsers.add_parser("startup", help="temps d'import et de démarrage du processus web")
+    startup_parser.add_argument("--repeat", type=int, default=5)
+    startup_parser.add_argument("--top", type=int, default=10, help="modules les plus lents affichés")
+
+    serve_parser = subparsers.add_parser("serve", help="débit de gunicorn selon le nombre de workers")
+    serve_parser.add_argument("--workers", default=f"1,{os.cpu_count() or 2}", help="nombres de workers, séparés par des virgules")
+    serve_parser.add_argument("--duration", type=float, default=5.0, help="durée de chaque mesure (s)")
+    serve_parser.add_argument("--clients", type=int, default=8)
+    serve_parser.add_argument("--tipsters", type=int, default=500)
+    serve_parser.add_argument("--tips", type=int, default=5000)
+
+    cycle_parser = subparsers.add_parser("cycle", help="cycles complets contre un site synthétique ou des réponses enregistrées")
+    cycle_parser.add_argument("--tipsters", type=int, default=1000)
+    cycle_parser.add_argument("--tomorrow-tips", type=int, default=500, help="tips de la page Tomorrow Tips")
+    cycle_parser.add_argument("--profile-tips", type=int, default=5, help="lignes de tips par profil")
+    cycle_parser.add_argument("--cycles", type=int, default=2)
+    cycle_parser.add_argument("--change", type=float, default=0.1, help="fraction des tipsters modifiés entre deux cycles")
+    cycle_parser.add_argument("--latency", type=float, default=0.0, help="latence simulée par requête (s)")
+    cycle_parser.add_argument("--parse-workers", type=int, default=bet.CONFIG["PARSE_WORKERS"])
+    cycle_parser.add_argument("--replay", metavar="DIR", help="rejoue les réponses enregistrées dans DIR au lieu du site synthétique")
+    cycle_parser.add_argument("--no-tracemalloc", action="store_true", help="sans mesure du pic mémoire (plus rapide)")
+
+    record_parser = subparsers.add_parser("record", help="enregistre un site synthétique comme réponses rejouables")
+    record_parser.add_argument("--tipsters", type=int, default=1000)
+    record_parser.add_argument("--tomorrow-tips", type=int, default=500)
+    record_parser.add_argument("--profile-tips", type=int, default=5)
+    record_parser.add_argument("--out", default=os.path.join("recordings", "synthetic"))
+
+    notify_parser = subparsers.add_parser("notify", help="événements de tips, flux /events et digests (SMTP stub)")
+    notify_parser.add_argument("--tipsters", type=int, default=300)
+    notify_parser.add_argument("--tomorrow-tips", type=int, default=200, help="tips de la page Tomorrow Tips")
+    notify_parser.add_argument("--change", type=float, default=0.2, help="fraction des tipsters modifiés entre deux cycles")
+    notify_parser.add_argument("--recipients", type=int, default=2, help="destinataires des digests")
+
+    args = parser.parse_args()
+    # Les logs par profil fausseraient les mesures
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.command == "fetch":
+        bench_fetch(args.profiles, args.latency, args.workers)
+    elif args.command == "pipeline":
+        bench_pipeline(args.profiles, args.latency, args.tips, args.workers, args.parse_workers)
+    elif args.command == "parse":
+        bench_parse(args.repeat, args.tips)
+    elif args.command == "backtest":
+        bench_backtest(args.tipsters, args.tips)
+    elif args.command == "startup":
+        bench_startup(args.repeat, args.top)
+    elif args.command == "serve":
+        bench_serve([int(n) for n in args.workers.split(",")], args.duration, args.clients, args.tipsters, args.tips)
+    elif args.command == "cycle":
+        bench_cycle(args.tipsters, args.tomorrow_tips, args.profile_tips, args.cycles, args.change, args.latency,
+                    args.parse_workers, args.replay, not args.no_tracemalloc)
+    elif args.command == "record":
+        record_synthetic(SyntheticSite(args.tipsters, args.tomorrow_tips, args.profile_tips), args.out)
+    elif args.command == "notify":
+        bench_notify(args.tipsters, args.tomorrow_tips, args.change, args.recipients)
+
+
+if __name__ == "__main__":
+    main()
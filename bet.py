@@ -1,23 +1,64 @@
+from __future__ import annotations
+
+import argparse
+import datetime
+import hashlib
+import importlib.util
+import json
+import multiprocessing
 import os
+import queue
+import smtplib
 import sqlite3
+import sys
 import threading
 import time
 import logging
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from contextlib import contextmanager
-from typing import List, Dict, Optional
+from typing import Any, Callable, Iterable, List, Dict, NamedTuple, Optional, Tuple
 from logging.handlers import RotatingFileHandler
-import matplotlib.pyplot as plt
-import requests
-import schedule
-from bs4 import BeautifulSoup
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
-from flask import Flask, render_template
+from flask import Flask, Response, render_template, request, send_from_directory
 from flask_caching import Cache
+import api
+import charts
+import metrics
+import notify
+import records
+import scheduler
+import snapshot
+import stats
+
+
+def lazy_import(name: str):
+    """Module chargé au premier accès à un de ses attributs (importlib.util.LazyLoader).
+
+    Le processus web n'utilise ni le client HTTP, ni les parsers, ni NumPy : il démarre sans les charger.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+# Modules lourds du scraper, chargés à la première utilisation
+backtest = lazy_import("backtest")
+parsers = lazy_import("parsers")
+replay = lazy_import("replay")
+requests = lazy_import("requests")
 
 # Configuration initiale
 load_dotenv()
 app = Flask(__name__)
-cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache'})
 
 # Configuration
 CONFIG = {
@@ -26,270 +67,1194 @@ CONFIG = {
     "EMAIL_PASSWORD": os.getenv("EMAIL_PASSWORD"),
     "SMTP_SERVER": "smtp.gmail.com",
     "SMTP_PORT": 465,
+    "SMTP_SSL": True,                # SMTP over SSL (port 465) ; sinon SMTP simple avec STARTTLS si proposé
+    "SMTP_TIMEOUT": 30,
+    "SMTP_IDLE_TIMEOUT": 300,        # Connexion SMTP réutilisée entre deux digests si utilisée depuis moins longtemps
+    "DIGEST_RECIPIENTS": [address.strip() for address in (os.getenv("DIGEST_TO") or os.getenv("EMAIL_USER") or "").split(",") if address.strip()],
+    "DIGEST_MIN_INTERVAL": 0,        # Délai minimum entre deux digests (secondes) ; les nouveaux tips s'accumulent entre-temps
+    "DIGEST_MIN_ODDS": 0,            # Cote minimum d'un tip pour figurer dans le digest (0 = tous)
+    "DIGEST_MAX_TIPS": 200,          # Tips listés au maximum par digest (les suivants sont seulement comptés)
+    "EVENTS_RETENTION_DAYS": 7,      # Conservation des événements de tips ajoutés / retirés
+    "SSE_POLL_SECONDS": 2,           # Intervalle de vérification des nouveaux événements par processus web
+    "SSE_HEARTBEAT_SECONDS": 15,     # Commentaire envoyé sur un flux /events inactif (garde la connexion ouverte)
+    "SSE_STREAM_SECONDS": 300,       # Durée d'un flux /events ; le navigateur se reconnecte avec Last-Event-ID
+    "SSE_RETRY_MS": 5000,            # Délai de reconnexion indiqué aux clients
+    "SSE_MAX_STREAMS": 4,            # Flux /events simultanés par processus web (au-delà : 503), < threads gunicorn
     "SCRAPE_URL_REMAINDER": "https://typersi.com/pozostali/remainder",
     "SCRAPE_URL_TOMORROW_TIPS": "https://typersi.com/jutro/tomorrow", # URL de la page "Tomorrow Tips" - CORRECTE MAINTENANT
     "SCRAPE_URL_BASE": "https://www.typersi.com",
     "MIN_WIN_RATE": 75,  # Seuil de win rate minimum REMIS À 75%
-    "MIN_TIPS": 3        # Nombre minimum de tips
+    "MIN_TIPS": 3,       # Nombre minimum de tips
+    "FETCH_TIMEOUT": 10,     # Timeout par requête (secondes)
+    "FETCH_WORKERS": 8,      # Nombre de requêtes de profil en parallèle
+    "FETCH_PER_HOST": 4,     # Requêtes simultanées maximum par hôte
+    "FETCH_RETRIES": 2,      # Nouvelles tentatives sur erreur réseau / 5xx / 429
+    "FETCH_BACKOFF": 0.5,    # Délai initial du backoff exponentiel (secondes)
+    "FETCH_DEADLINE": 600,   # Échéance globale pour un lot de profils (secondes)
+    "PROFILE_CACHE_SIZE": 0,     # Cache de profils entre les cycles (0 = désactivé)
+    "PROFILE_CACHE_TTL": 3600,   # Durée de vie d'un profil en cache (secondes)
+    "HTTP_CACHE": True,          # Requêtes conditionnelles (ETag / Last-Modified) avec cache SQLite
+    "INCREMENTAL_SCRAPE": True,  # Ne récupère que les profils dont la ligne de listing a changé
+    "REFRESH_MIN_HOURS": 6,      # Intervalle de vérification d'un tipster inchangé sur le listing (heures)
+    "REFRESH_MAX_HOURS": 96,     # Intervalle maximum, atteint par doublement pour les profils inactifs (heures)
+    "PARSER_BACKEND": "lxml",    # Backend de parsing HTML : "lxml" (XPath, rapide) ou "bs4" (BeautifulSoup)
+    "PARSE_WORKERS": 0,          # Processus de parsing des profils (0 = parsing dans les threads de fetch)
+    "PARSE_QUEUE_SIZE": 64,      # Pages en attente de parsing au maximum (backpressure sur les fetchers)
+    "HTTP_REPLAY": None,         # "record" : enregistre les réponses HTTP, "replay" : les rejoue sans réseau (None = désactivé)
+    "HTTP_REPLAY_DIR": "recordings", # Dossier des réponses enregistrées
+    "DB_READERS": 4,             # Connexions SQLite en lecture dans le pool
+    "DB_MMAP_SIZE": 256 * 1024 * 1024,  # PRAGMA mmap_size (octets)
+    "DB_CACHE_SIZE": -20000,     # PRAGMA cache_size (négatif = en KiB)
+    "QUALIFY_WINDOW_DAYS": 0,    # Fenêtre (7/30/90) du taux de réussite glissant pour la qualification (0 = win rate du profil)
+    "QUALIFY_MIN_SETTLED": 10,   # Tips réglés minimum dans la fenêtre pour utiliser le taux glissant
+    "BACKTEST_QUALIFY": False,   # Qualification par backtest des tips enregistrés au lieu du seuil MIN_WIN_RATE
+    "BACKTEST_MIN_TIPS": 20,     # Tips réglés minimum
+    "BACKTEST_MIN_HIT_RATE": 55, # Taux de réussite minimum (%)
+    "BACKTEST_MIN_YIELD": 5,     # Yield minimum (%)
+    "BACKTEST_MAX_DRAWDOWN": 30, # Drawdown maximum (en unités de mise)
+    "SNAPSHOT_DIR": "snapshot",  # Dossier du tableau de bord pré-rendu publié à chaque cycle
+    "CHART_DIR": "charts",       # Dossier des graphiques (noms de fichier hashés, servis sous /charts/)
+    "CHART_FORMATS": ["png", "svg"], # Formats rendus ; le premier est affiché par le tableau de bord
+    "CACHE_TYPE": "FileSystemCache", # Cache des réponses de l'API partagé entre workers ("SimpleCache" = par processus)
+    "CACHE_DIR": "cache",            # Dossier du FileSystemCache
+    "CACHE_TIMEOUT": 24 * 3600,      # Durée de vie maximale ; les clés changent avec la version des données
+    "CACHE_THRESHOLD": 2000,         # Nombre d'entrées au-delà duquel le FileSystemCache est élagué
+    "SCHEDULE_CADENCE": {            # Intervalle entre deux cycles, par page de listing (secondes)
+        "tomorrow": 3600,
+        "remainder": 3 * 3600
+    },
+    "SCHEDULE_JITTER": 0.1,          # Variation aléatoire des intervalles (fraction, ±)
+    "SCHEDULE_RETRY_BASE": 300,      # Premier délai avant un nouvel essai après un cycle en échec (doublé ensuite)
+    "SCHEDULE_LEASE_TTL": 900,       # Durée du bail SQLite qui empêche deux cycles simultanés (renouvelé en cours de cycle)
+    "METRICS_FILE": "metrics/scraper.prom",  # Métriques du scraper, écrites à chaque cycle et servies par /metrics
+    "WEB_METRICS_DIR": "metrics/web",        # Métriques du serveur web, un fichier par worker additionnés par /metrics
+    "WEB_METRICS_INTERVAL": 5,               # Délai minimum entre deux écritures du fichier d'un worker (secondes)
+    "LOG_SAMPLE_RATE": 0.01          # Proportion des logs par profil / par tip émis au niveau DEBUG
 }
 
+metrics.DEBUG_SAMPLE_RATE = CONFIG["LOG_SAMPLE_RATE"]
+
+
+def cache_config() -> Dict[str, Any]:
+    """Configuration Flask-Caching tirée de CONFIG (à repasser à cache.init_app si CONFIG change)"""
+    return {
+        'CACHE_TYPE': CONFIG["CACHE_TYPE"],
+        'CACHE_DIR': CONFIG["CACHE_DIR"],
+        'CACHE_DEFAULT_TIMEOUT': CONFIG["CACHE_TIMEOUT"],
+        'CACHE_THRESHOLD': CONFIG["CACHE_THRESHOLD"]
+    }
+
+
+# Cache partagé par les workers web (les clés incluent la version du snapshot)
+cache = Cache(app, config=cache_config())
+
+# Codes HTTP pour lesquels une nouvelle tentative a du sens
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
 # Configuration du logging
+log_handlers: List[logging.Handler] = [logging.StreamHandler()]
+# Les processus du pool de parsing (forkserver / spawn) réimportent ce module : seul le processus principal écrit
+# app.log, sinon plusieurs processus feraient tourner (rotation) le même fichier
+if multiprocessing.parent_process() is None:
+    log_handlers.insert(0, RotatingFileHandler(
+        'app.log',
+        maxBytes=1e6,
+        backupCount=3,
+        encoding='utf-8'
+    ))
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        RotatingFileHandler(
-            'app.log',
-            maxBytes=1e6,
-            backupCount=3,
-            encoding='utf-8'
-        ),
-        logging.StreamHandler()
-    ]
+    handlers=log_handlers
 )
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
-    """Fonction pour obtenir une connexion à la base de données"""
-    conn = sqlite3.connect(CONFIG["DATABASE"])
-    conn.row_factory = sqlite3.Row
-    return conn
+class ConnectionPool:
+    """Pool de connexions SQLite : une connexion d'écriture partagée (sérialisée par un verrou)
+    et des connexions de lecture réutilisées, PRAGMAs appliqués une fois à l'ouverture"""
+    def __init__(self, database: str, readers: int):
+        self.database = database
+        self.pid = os.getpid()
+        self._writer = self._connect()
+        self._writer.execute('PRAGMA journal_mode=WAL')
+        self._writer_lock = threading.Lock()
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(readers)
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.database, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA mmap_size={int(CONFIG["DB_MMAP_SIZE"])}')
+        conn.execute(f'PRAGMA cache_size={int(CONFIG["DB_CACHE_SIZE"])}')
+        if read_only:
+            # Transactions gérées explicitement par reader()
+            conn.isolation_level = None
+            conn.execute('PRAGMA query_only=ON')
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """Connexion d'écriture : commit en sortie, rollback sur exception"""
+        with self._writer_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+
+    @contextmanager
+    def reader(self):
+        """Connexion de lecture dans une transaction : toutes les requêtes voient le même snapshot"""
+        with self._reader_slots:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                conn = self._connect(read_only=True)
+            try:
+                conn.execute('BEGIN')
+                try:
+                    yield conn
+                finally:
+                    conn.execute('COMMIT')
+            finally:
+                self._readers.put(conn)
+
+
+_db_pools: Dict[str, ConnectionPool] = {}
+_db_pools_lock = threading.Lock()
+
+
+def get_db_pool() -> ConnectionPool:
+    """Pool de connexions de la base configurée (recréé après un fork)"""
+    with _db_pools_lock:
+        pool = _db_pools.get(CONFIG["DATABASE"])
+        if pool is None or pool.pid != os.getpid():
+            pool = ConnectionPool(CONFIG["DATABASE"], CONFIG["DB_READERS"])
+            _db_pools[CONFIG["DATABASE"]] = pool
+        return pool
+
+
+def db_reader():
+    """Connexion de lecture du pool (context manager)"""
+    return get_db_pool().reader()
+
+
+def db_writer():
+    """Connexion d'écriture du pool (context manager)"""
+    return get_db_pool().writer()
+
+class ProfileCache:
+    """Cache des profils parsés indexé par profile_url, avec taille max (LRU) et TTL optionnels"""
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, profile_url: str) -> Optional[Dict]:
+        """Renvoie le profil en cache ou None"""
+        with self._lock:
+            entry = self._entries.get(profile_url)
+            if entry is not None:
+                stored_at, profile_data = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._entries.move_to_end(profile_url)
+                    self.hits += 1
+                    return profile_data
+                del self._entries[profile_url]
+            self.misses += 1
+        return None
+
+    def discard(self, profile_url: str):
+        """Retire un profil du cache (listing modifié : le profil en cache est périmé)"""
+        with self._lock:
+            self._entries.pop(profile_url, None)
+
+    def put(self, profile_url: str, profile_data: Dict):
+        """Ajoute un profil au cache"""
+        with self._lock:
+            self._entries[profile_url] = (time.monotonic(), profile_data)
+            self._entries.move_to_end(profile_url)
+            if self.max_size is not None:
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+    def stats(self) -> str:
+        """Résumé des compteurs pour les logs"""
+        total = self.hits + self.misses
+        ratio = 100 * self.hits / total if total else 0.0
+        return f"{self.hits} hits / {self.misses} misses ({ratio:.0f}%), {len(self._entries)} entrées"
+
+
+class ResponseCache:
+    """Cache persistant des réponses HTTP (en-têtes de validation, hash du corps et résultat parsé).
+
+    Les entrées du cycle sont gardées en mémoire par `store` et écrites en une transaction par `flush` :
+    les threads de fetch ne se disputent pas le verrou d'écriture de la base. La table http_cache doit exister
+    (DatabaseManager.ensure_schema).
+    """
+    def __init__(self):
+        self._pending: Dict[Tuple[str, str], Tuple] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, url: str, parser: str) -> Optional[sqlite3.Row]:
+        """Renvoie l'entrée en cache pour cette URL et ce parser, ou None"""
+        with db_reader() as conn:
+            return conn.execute(
+                'SELECT etag, last_modified, body_hash, parsed FROM http_cache WHERE url = ? AND parser = ?',
+                (url, parser)
+            ).fetchone()
+
+    def store(self, url: str, parser: str, etag: Optional[str], last_modified: Optional[str],
+              body_hash: str, parsed):
+        """Enregistre (ou remplace) l'entrée en cache ; écrite en base au prochain flush"""
+        entry = (url, parser, etag, last_modified, body_hash, json.dumps(records.plain(parsed)))
+        with self._lock:
+            self._pending[(url, parser)] = entry
+
+    def flush(self):
+        """Écrit les entrées en attente en une seule transaction"""
+        with self._lock:
+            entries, self._pending = list(self._pending.values()), {}
+        if not entries:
+            return
+        with metrics.DB_WRITE_SECONDS.time(operation="http_cache"), db_writer() as conn:
+            conn.executemany('''
+                INSERT INTO http_cache (url, parser, etag, last_modified, body_hash, parsed)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url, parser) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                body_hash = excluded.body_hash,
+                parsed = excluded.parsed,
+                last_updated = CURRENT_TIMESTAMP
+            ''', entries)
+
+
+class ChangeTracker:
+    """Détection de changements sur les pages de listing, avec intervalle de rafraîchissement adaptatif.
+
+    Un profil n'est récupéré que si le tipster est nouveau, si l'empreinte de ses lignes de listing a changé,
+    ou si son intervalle de vérification est écoulé. L'intervalle double à chaque vérification qui ne trouve
+    aucun changement du profil (jusqu'à REFRESH_MAX_HOURS) et revient à REFRESH_MIN_HOURS sinon.
+    La table listing_fingerprints doit exister (DatabaseManager.ensure_schema).
+    """
+    def __init__(self):
+        self._fingerprints: Dict[str, Optional[str]] = {}
+        self._stored: Dict[str, sqlite3.Row] = {}
+        # Profils dont l'empreinte de listing a changé depuis le dernier fetch (plan)
+        self.changed: List[str] = []
+
+    @staticmethod
+    def fingerprint(rows: List[Dict]) -> Optional[str]:
+        """Empreinte d'un tipster sur l'ensemble des listings (None si une ligne n'a pas d'empreinte)"""
+        row_fingerprints = [row.get("fingerprint") for row in rows]
+        if None in row_fingerprints:
+            return None
+        return hashlib.sha1("|".join(sorted(row_fingerprints)).encode("utf-8")).hexdigest()
+
+    def plan(self, listed_tipsters: List[Dict]) -> Tuple[List[str], Dict[str, Dict]]:
+        """Sépare les profils à récupérer des profils réutilisables (dernier profil enregistré)"""
+        rows_by_url: Dict[str, List[Dict]] = {}
+        for tipster in listed_tipsters:
+            rows_by_url.setdefault(tipster["profile_url"], []).append(tipster)
+        self._fingerprints = {url: self.fingerprint(rows) for url, rows in rows_by_url.items()}
+
+        with db_reader() as conn:
+            self._stored = {
+                row["profile_url"]: row for row in conn.execute(
+                    'SELECT profile_url, fingerprint, profile, profile_hash, last_fetched, interval_hours '
+                    'FROM listing_fingerprints'
+                )
+            }
+
+        now = time.time()
+        to_fetch, reused = [], {}
+        self.changed = []
+        for url, fingerprint in self._fingerprints.items():
+            stored = self._stored.get(url)
+            if stored is not None and stored["fingerprint"] != fingerprint:
+                self.changed.append(url)
+            if (stored is not None and fingerprint is not None and stored["fingerprint"] == fingerprint
+                    and now - stored["last_fetched"] < stored["interval_hours"] * 3600):
+                reused[url] = records.revive(json.loads(stored["profile"]))
+            else:
+                to_fetch.append(url)
+        metrics.CACHE_REQUESTS.inc(len(reused), cache="listing", result="hit")
+        metrics.CACHE_REQUESTS.inc(len(to_fetch), cache="listing", result="miss")
+        logger.info(f"Listing : {len(to_fetch)} profils à récupérer, {len(reused)} inchangés réutilisés")
+        return to_fetch, reused
+
+    def record(self, fetched_profiles: Dict[str, Optional[Dict]]):
+        """Enregistre empreintes et profils récupérés, et ajuste l'intervalle de chaque tipster"""
+        now = time.time()
+        rows = []
+        for url, profile in fetched_profiles.items():
+            if profile is None:
+                continue  # Nouvel essai au prochain cycle
+            profile_json = json.dumps(records.plain(profile), sort_keys=True)
+            profile_hash = hashlib.sha1(profile_json.encode("utf-8")).hexdigest()
+            stored = self._stored.get(url)
+            if stored is not None and stored["profile_hash"] == profile_hash:
+                interval = min(stored["interval_hours"] * 2, CONFIG["REFRESH_MAX_HOURS"])
+            else:
+                interval = CONFIG["REFRESH_MIN_HOURS"]
+            rows.append((url, self._fingerprints.get(url), profile_json, profile_hash, now, interval))
+
+        with metrics.DB_WRITE_SECONDS.time(operation="fingerprints"), db_writer() as conn:
+            conn.executemany('''
+                INSERT INTO listing_fingerprints (profile_url, fingerprint, profile, profile_hash, last_fetched, interval_hours)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(profile_url) DO UPDATE SET
+                fingerprint = excluded.fingerprint,
+                profile = excluded.profile,
+                profile_hash = excluded.profile_hash,
+                last_fetched = excluded.last_fetched,
+                interval_hours = excluded.interval_hours
+            ''', rows)
+
+
+class PendingParse(NamedTuple):
+    """Page de profil téléchargée, en cours de parsing dans le pool de processus"""
+    future: Future
+    headers: Any
+    body_hash: Optional[str]
+
 
 class TipsterScraper:
     """Classe pour le scraping des données des tipsters"""
-    def __init__(self):
+    def __init__(self, response_cache: Optional[ResponseCache] = None, parser_backend: Optional[str] = None,
+                 parse_workers: int = 0):
+        self.response_cache = response_cache
+        parser_backend = parser_backend or CONFIG["PARSER_BACKEND"]
+        self.parser = parsers.PARSER_BACKENDS[parser_backend](CONFIG["SCRAPE_URL_BASE"])
+        # Mode pipeline : les threads de fetch envoient les pages brutes à un pool de processus de parsing
+        self.parse_pool: Optional[ProcessPoolExecutor] = None
+        if parse_workers > 0:
+            # Processus démarrés depuis un serveur dédié (forkserver, sinon spawn) et non par fork : ils sont créés
+            # au premier envoi, depuis un thread de fetch, pendant que d'autres threads (fetch, bail, graphiques)
+            # peuvent détenir des verrous (logging, urllib3) qu'un fork hériterait verrouillés.
+            # init_parse_worker reconstruit l'état du processus.
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self.parse_pool = ProcessPoolExecutor(
+                max_workers=parse_workers,
+                mp_context=multiprocessing.get_context(start_method),
+                initializer=parsers.init_parse_worker,
+                initargs=(parser_backend, CONFIG["SCRAPE_URL_BASE"])
+            )
+            self._parse_slots = threading.BoundedSemaphore(CONFIG["PARSE_QUEUE_SIZE"])
         self.session = requests.Session()
         self.session.headers.update({
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         })
+        # Pool de connexions partagé par les threads de fetch
+        pool = {"pool_connections": CONFIG["FETCH_WORKERS"], "pool_maxsize": CONFIG["FETCH_WORKERS"]}
+        if CONFIG["HTTP_REPLAY"]:
+            # Enregistrement / rejeu des réponses (fixtures hors-ligne)
+            adapter = replay.RecordReplayAdapter(CONFIG["HTTP_REPLAY_DIR"], CONFIG["HTTP_REPLAY"], **pool)
+        else:
+            adapter = requests.adapters.HTTPAdapter(**pool)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_semaphores_lock = threading.Lock()
+        # Pages de listing dont le téléchargement a échoué (échec partiel du cycle)
+        self.failed_pages: List[str] = []
+
+    def close(self):
+        """Arrête le pool de parsing, écrit les réponses du cycle dans le cache et ferme la session HTTP"""
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown(cancel_futures=True)
+            self.parse_pool = None
+        if self.response_cache is not None:
+            try:
+                self.response_cache.flush()
+            except sqlite3.Error as e:
+                logger.error(f"Erreur d'enregistrement du cache de réponses : {e}")
+        self.session.close()
+
+    @staticmethod
+    def _url_type(url: str) -> str:
+        """Type d'URL pour les métriques : page de listing ou profil"""
+        if url == CONFIG["SCRAPE_URL_REMAINDER"]:
+            return "remainder"
+        if url == CONFIG["SCRAPE_URL_TOMORROW_TIPS"]:
+            return "tomorrow"
+        return "profile"
+
+    def _host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        """Sémaphore limitant le nombre de requêtes simultanées vers un même hôte"""
+        host = urlsplit(url).netloc
+        with self._host_semaphores_lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(CONFIG["FETCH_PER_HOST"])
+                self._host_semaphores[host] = semaphore
+            return semaphore
+
+    def _get(self, url: str, deadline: Optional[float] = None,
+             headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """GET avec retries et backoff exponentiel, borné par une échéance (time.monotonic)"""
+        attempts = CONFIG["FETCH_RETRIES"] + 1
+        url_type = self._url_type(url)
+        for attempt in range(attempts):
+            try:
+                with self._host_semaphore(url), metrics.FETCH_SECONDS.time(url_type=url_type):
+                    response = self.session.get(url, headers=headers, timeout=CONFIG["FETCH_TIMEOUT"])
+                if response.status_code not in RETRYABLE_STATUS:
+                    response.raise_for_status()
+                    return response
+                error = requests.HTTPError(f"{response.status_code} Error for url: {url}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            delay = CONFIG["FETCH_BACKOFF"] * (2 ** attempt)
+            if attempt == attempts - 1 or (deadline is not None and time.monotonic() + delay > deadline):
+                metrics.FETCH_ERRORS.inc(url_type=url_type)
+                raise error
+            logger.warning(f"Nouvelle tentative dans {delay:.1f}s ({error}) - URL: {url}")
+            time.sleep(delay)
+
+    def _fetch_conditional(self, url: str, parser_name: str,
+                           deadline: Optional[float] = None) -> Tuple[Any, Optional[requests.Response], Optional[str]]:
+        """GET, conditionnel si le cache de réponses est actif.
+
+        Renvoie (résultat parsé réutilisable, None, None) sur un 304 ou un corps identique,
+        sinon (None, réponse à parser, hash du corps).
+        """
+        if self.response_cache is None:
+            return None, self._get(url, deadline), None
+
+        cached = self.response_cache.lookup(url, parser_name)
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = self._get(url, deadline, headers)
+        if cached is not None and response.status_code == 304:
+            metrics.CACHE_REQUESTS.inc(cache="http", result="hit")
+            return records.revive(json.loads(cached["parsed"])), None, None
+
+        body_hash = hashlib.sha256(response.content).hexdigest()
+        if cached is not None and cached["body_hash"] == body_hash:
+            metrics.CACHE_REQUESTS.inc(cache="http", result="hit")
+            parsed = records.revive(json.loads(cached["parsed"]))
+            self._store_response(url, parser_name, response.headers, body_hash, parsed)
+            return parsed, None, None
+        metrics.CACHE_REQUESTS.inc(cache="http", result="miss")
+        return None, response, body_hash
+
+    def _store_response(self, url: str, parser_name: str, headers, body_hash: Optional[str], parsed):
+        """Enregistre les en-têtes de validation et le résultat parsé dans le cache de réponses"""
+        if self.response_cache is not None:
+            self.response_cache.store(
+                url, parser_name, headers.get("ETag"), headers.get("Last-Modified"), body_hash, parsed
+            )
+
+    def _fetch_parsed(self, url: str, parser: Callable, deadline: Optional[float] = None):
+        """Récupère et parse une page ; avec le cache de réponses, envoie une requête conditionnelle
+        et réutilise le résultat parsé sur un 304 ou un corps identique"""
+        parsed, response, body_hash = self._fetch_conditional(url, parser.__name__, deadline)
+        if response is None:
+            return parsed
+        with metrics.PARSE_SECONDS.time(page=self._url_type(url)):
+            parsed = parser(response.content)
+        self._store_response(url, parser.__name__, response.headers, body_hash, parsed)
+        return parsed
+
+    def _fetch_profile_to_pool(self, profile_url: str, deadline: float):
+        """Étape fetch du mode pipeline : télécharge un profil et le soumet au pool de parsing.
+
+        Bloque tant que PARSE_QUEUE_SIZE pages attendent déjà d'être parsées (backpressure).
+        Renvoie un PendingParse, le profil déjà connu (cache de réponses) ou None en cas d'échec.
+        """
+        try:
+            parsed, response, body_hash = self._fetch_conditional(profile_url, "parse_tipster_profile_page", deadline)
+        except requests.RequestException as e:
+            logger.error(f"Erreur de requête vers la page de profil : {e} - URL: {profile_url}")
+            return None
+        if response is None:
+            return parsed
+        if not self._parse_slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            logger.error(f"File de parsing saturée jusqu'à l'échéance - URL: {profile_url}")
+            return None
+        try:
+            future = self.parse_pool.submit(parsers.parse_profile_in_worker, response.content)
+        except Exception as e:
+            # Pool cassé (BrokenProcessPool) ou arrêté : la place réservée dans la file est rendue
+            self._parse_slots.release()
+            logger.error(f"Erreur d'envoi au pool de parsing : {e} - URL: {profile_url}")
+            return None
+        future.add_done_callback(lambda _: self._parse_slots.release())
+        return PendingParse(future, response.headers, body_hash)
+
+    def _collect_parsed(self, profile_url: str, pending: PendingParse, deadline: float) -> Optional[Dict]:
+        """Attend le résultat d'un parsing soumis au pool de processus"""
+        try:
+            parsed, parse_seconds = pending.future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            logger.error(f"Échéance dépassée pendant le parsing - URL: {profile_url}")
+            return None
+        except Exception as e:
+            logger.error(f"Erreur de parsing de la page de profil : {e} - URL: {profile_url}")
+            return None
+        metrics.PARSE_SECONDS.observe(parse_seconds, page="profile")
+        parsed = records.revive(parsed)
+        self._store_response(profile_url, "parse_tipster_profile_page", pending.headers, pending.body_hash, parsed)
+        return parsed
 
     def fetch_tipsters_from_remainder_page(self) -> List[Dict]:
         """Récupère les tipsters depuis la page Remainder"""
         try:
-            response = self.session.get(CONFIG["SCRAPE_URL_REMAINDER"], timeout=10)
-            response.raise_for_status()
-            return self.parse_remainder_page(response.content)
+            return self._fetch_parsed(CONFIG["SCRAPE_URL_REMAINDER"], self.parse_remainder_page)
         except requests.RequestException as e:
             logger.error(f"Erreur de requête vers la page Remainder : {e}")
+            self.failed_pages.append("remainder")
             return []
 
     def parse_remainder_page(self, html_content: bytes) -> List[Dict]:
         """Analyse la page Remainder pour extraire les tipsters et URLs de profil"""
-        soup = BeautifulSoup(html_content, 'lxml')
-        tipsters_data = []
-        tipster_elements = soup.select('td.fw-bold')
-        for element in tipster_elements:
-            name_element = element.find('a', class_='link-underline-warning')
-            if name_element:
-                name = name_element.text.strip()
-                profile_path = name_element['href']
-                profile_url = CONFIG["SCRAPE_URL_BASE"] + profile_path
-                tipsters_data.append({"name": name, "profile_url": profile_url})
-        return tipsters_data
-
-    def fetch_tipster_profile_data(self, profile_url: str) -> Optional[Dict]:
+        return self.parser.parse_tipster_links(html_content)
+
+    def fetch_tipster_profile_data(self, profile_url: str, deadline: Optional[float] = None) -> Optional[Dict]:
         """Récupère les données depuis la page de profil d'un tipster"""
         try:
-            response = self.session.get(profile_url, timeout=10)
-            response.raise_for_status()
-            return self.parse_tipster_profile_page(response.content)
+            return self._fetch_parsed(profile_url, self.parse_tipster_profile_page, deadline)
         except requests.RequestException as e:
             logger.error(f"Erreur de requête vers la page de profil : {e} - URL: {profile_url}")
             return None
 
-    def parse_tipster_profile_page(self, html_content: bytes) -> Dict:
-        """Analyse la page de profil du tipster pour extraire win rate et matchs à venir (MODIFIÉE - logging win rate amélioré)"""
-        soup = BeautifulSoup(html_content, 'lxml')
-        win_rate = None
-        upcoming_matches = []
-
-        # Extraction du Win Rate
-        effectiveness_element = soup.select_one('div.stat div.progressC span')
-        if effectiveness_element:
-            win_rate_str_raw = effectiveness_element.text.strip() # Capture la valeur brute
-            logger.info(f"Win rate trouvé (texte brut) : {win_rate_str_raw}") # LOG : Valeur brute
-            win_rate_str = win_rate_str_raw.replace('%', '')
-            logger.info(f"Win rate après replace('%', '') : {win_rate_str}") # LOG : Valeur après replace
+    def fetch_tipster_profiles(self, profile_urls: List[str],
+                               cache: Optional[ProfileCache] = None) -> List[Optional[Dict]]:
+        """Récupère plusieurs profils en parallèle, résultats dans l'ordre des URLs (None si échec ou échéance dépassée).
+
+        Chaque URL n'est récupérée qu'une fois par appel ; les profils présents dans `cache` ne sont pas re-téléchargés.
+        """
+        profiles: Dict[str, Optional[Dict]] = {}
+        to_fetch = []
+        for url in dict.fromkeys(profile_urls):
+            cached = cache.get(url) if cache is not None else None
+            if cached is not None:
+                profiles[url] = cached
+            else:
+                to_fetch.append(url)
+
+        if to_fetch:
+            deadline = time.monotonic() + CONFIG["FETCH_DEADLINE"]
+            executor = ThreadPoolExecutor(max_workers=CONFIG["FETCH_WORKERS"])
+            fetch = self.fetch_tipster_profile_data if self.parse_pool is None else self._fetch_profile_to_pool
             try:
-                win_rate = float(win_rate_str)
-                logger.info(f"Win rate converti en float : {win_rate}")
-            except ValueError as e:
-                logger.warning(f"Erreur de conversion Win rate en float : {win_rate_str} - Erreur: {e}") # LOG : Erreur détaillée
-        else:
-            logger.warning("Element win rate non trouvé sur la page de profil")
-
-        # Extraction des matchs
-        tips_table = soup.select_one('h2.typ.fw-bold + div.table-responsive table')
-        if tips_table:
-            match_rows = tips_table.select('tbody tr')
-            for row in match_rows:
-                match_data = [cell.text.strip() for cell in row.select('td')]
-                if len(match_data) >= 9:
-                    upcoming_matches.append({
-                        "day": match_data[1],
-                        "time": match_data[2],
-                        "bookmaker": match_data[3],
-                        "match": match_data[4],
-                        "tip": match_data[5],
-                        "stake": match_data[6],
-                        "odds": match_data[7],
-                        "score": match_data[8]
-                    })
-
-        return {
-            "win_rate": win_rate,
-            "upcoming_matches": upcoming_matches
-        }
+                futures = {executor.submit(fetch, url, deadline): url for url in to_fetch}
+                done, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+                for future in done:
+                    url = futures[future]
+                    try:
+                        profile_data = future.result()
+                        if isinstance(profile_data, PendingParse):
+                            profile_data = self._collect_parsed(url, profile_data, deadline)
+                    except Exception as e:
+                        # Erreur de parsing ou inattendue : seul ce profil est en échec, pas le cycle
+                        logger.error(f"Erreur de récupération de la page de profil : {e} - URL: {url}")
+                        logger.exception("Erreur détaillée lors de la récupération du profil (avec traceback)")
+                        profile_data = None
+                    profiles[url] = profile_data
+                    if profile_data is not None and cache is not None:
+                        cache.put(url, profile_data)
+                if not_done:
+                    logger.error(f"Échéance dépassée : {len(not_done)} profils non récupérés sur {len(to_fetch)}")
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        return [profiles.get(url) for url in profile_urls]
+
+    def parse_tipster_profile_page(self, html_content: bytes) -> Dict:
+        """Analyse la page de profil du tipster pour extraire win rate et matchs à venir"""
+        return self.parser.parse_profile(html_content)
 
-    def fetch_tips_from_tomorrow_page(self) -> List[Dict]:
-        """Récupère les tips depuis la page "Tomorrow Tips" (URL corrigée)"""
+    def fetch_tomorrow_page(self) -> Dict:
+        """Récupère la page "Tomorrow Tips" en une seule requête : tipsters (URLs de profil) et tips"""
         try:
-            response = self.session.get(CONFIG["SCRAPE_URL_TOMORROW_TIPS"], timeout=10) # URL CORRECTE
-            response.raise_for_status()
-            return self.parse_tomorrow_tips(response.content)
+            return self._fetch_parsed(CONFIG["SCRAPE_URL_TOMORROW_TIPS"], self.parse_tomorrow_page)
         except requests.RequestException as e:
             logger.error(f"Erreur de requête vers la page Tomorrow Tips : {e}")
-            return []
+            self.failed_pages.append("tomorrow")
+            return {"tipsters": [], "tips": []}
+
+    def parse_tomorrow_page(self, html_content: bytes) -> Dict:
+        """Analyse la page "Tomorrow Tips" (un seul arbre DOM) pour extraire tipsters et tips"""
+        return self.parser.parse_tomorrow_page(html_content)
 
     def parse_tomorrow_tips(self, html_content: bytes) -> List[Dict]:
         """Analyse la page "Tomorrow Tips" pour extraire les tips"""
-        soup = BeautifulSoup(html_content, 'lxml')
-        tomorrow_tips = []
-
-        # Sélectionner les tables de tips (les deux sections)
-        tip_tables = soup.select('h2.typ.fw-bold + div.table-responsive table')  # Sélectionne toutes les tables après un h2.typ.fw-bold
-
-        for table in tip_tables:
-            match_rows = table.select('tbody tr')
-            for row in match_rows:
-                match_data = [cell.text.strip() for cell in row.select('td')]
-                if len(match_data) >= 9:
-                    tomorrow_tips.append({
-                        "tipster_name": match_data[1],
-                        "time": match_data[2],
-                        "bookmaker": match_data[3],
-                        "match": match_data[4],
-                        "tip": match_data[5],
-                        "odds": match_data[7],
-                        "score": match_data[8]
-                    })
-        return tomorrow_tips
-
-    def fetch_tipsters_from_tomorrow_tips_page(self) -> List[Dict]:
-        """Récupère les tipsters depuis la page "Tomorrow Tips" """
-        try:
-            response = self.session.get(CONFIG["SCRAPE_URL_TOMORROW_TIPS"], timeout=10)
-            response.raise_for_status()
-            return self.parse_tomorrow_tipsters_page(response.content)
-        except requests.RequestException as e:
-            logger.error(f"Erreur de requête vers la page Tomorrow Tips (tipsters) : {e}")
-            return []
+        return self.parser.parse_tomorrow_tips(html_content)
 
     def parse_tomorrow_tips_page(self, html_content: bytes) -> List[Dict]:
         """Analyse la page "Tomorrow Tips" pour extraire les tipsters et URLs de profil"""
-        soup = BeautifulSoup(html_content, 'lxml')
-        tipsters_data = []
-        tipster_elements = soup.select('td.fw-bold') # Assuming same selector as remainder page for tipster names
-        for element in tipster_elements:
-            name_element = element.find('a', class_='link-underline-warning') # Assuming same selector as remainder page for tipster links
-            if name_element:
-                name = name_element.text.strip()
-                profile_path = name_element['href']
-                profile_url = CONFIG["SCRAPE_URL_BASE"] + profile_path
-                tipsters_data.append({"name": name, "profile_url": profile_url})
-        return tipsters_data
+        return self.parser.parse_tipster_links(html_content)
+
+
+UPSERT_TIPSTER_SQL = '''
+    INSERT INTO tipsters (name, win_rate, tips, profile_url)
+    VALUES (:name, :win_rate, :tips, :profile_url)
+    ON CONFLICT(name) DO UPDATE SET
+    win_rate = excluded.win_rate,
+    tips = excluded.tips,
+    last_updated = CURRENT_TIMESTAMP,
+    profile_url = excluded.profile_url
+'''
+
+# Colonnes des matchs à venir (pages de profil) et des tips de la page "Tomorrow Tips"
+MATCH_COLUMNS = records.MATCH_FIELDS
+TIP_COLUMNS = records.TIP_FIELDS
 
 
 class DatabaseManager:
     """Gestionnaire de base de données"""
+    # Bases dont le schéma a déjà été initialisé dans ce processus
+    _initialized_databases: set = set()
+    _init_lock = threading.Lock()
+
     def __init__(self):
-        self.init_db()
+        self.ensure_schema()
+
+    @classmethod
+    def ensure_schema(cls):
+        """Initialise le schéma de CONFIG["DATABASE"], une seule fois par base et par processus"""
+        with cls._init_lock:
+            if CONFIG["DATABASE"] not in cls._initialized_databases:
+                cls.init_db()
+                cls._initialized_databases.add(CONFIG["DATABASE"])
 
-    def init_db(self):
-        """Initialise la structure de la base de données"""
-        conn = get_db_connection()
+    @classmethod
+    def init_db(cls):
+        """Initialise la structure de la base de données (WAL activé par le pool de connexions)"""
         try:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS tipsters (
-                    name TEXT PRIMARY KEY,
-                    win_rate REAL CHECK(win_rate BETWEEN 0 AND 100),
-                    tips INTEGER CHECK(tips >= 0),
-                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    profile_url TEXT
-                )
-            ''')
-            conn.execute('''
-                CREATE INDEX IF NOT EXISTS idx_win_rate
-                ON tipsters(win_rate DESC)
-                ''')
+            with db_writer() as conn:
+                cls._create_schema(conn)
             logger.info("Structure de la base de données vérifiée")
         except sqlite3.Error as e:
             logger.error(f"Erreur d'initialisation : {e}")
             raise
-        finally:
-            conn.close()
+
+    @classmethod
+    def _create_schema(cls, conn: sqlite3.Connection):
+        """Crée les tables et index manquants"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS tipsters (
+                name TEXT PRIMARY KEY,
+                win_rate REAL CHECK(win_rate BETWEEN 0 AND 100),
+                tips INTEGER CHECK(tips >= 0),
+                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                profile_url TEXT,
+                qualified INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        # Bases créées par une version antérieure
+        cls._ensure_column(conn, 'tipsters', 'profile_url', 'TEXT')
+        cls._ensure_column(conn, 'tipsters', 'qualified', 'INTEGER NOT NULL DEFAULT 0')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_win_rate
+            ON tipsters(win_rate DESC)
+            ''')
+        # Index des tris de l'API (/api/tipsters)
+        conn.execute('DROP INDEX IF EXISTS idx_tipsters_qualified_win_rate')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tipsters_qualified_rate ON tipsters(qualified, IFNULL(win_rate, -1), name)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tipsters_qualified_name ON tipsters(qualified, name)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS matches (
+                id INTEGER PRIMARY KEY,
+                tipster_name TEXT NOT NULL,
+                day TEXT,
+                time TEXT,
+                bookmaker TEXT,
+                match TEXT,
+                tip TEXT,
+                stake TEXT,
+                odds TEXT,
+                score TEXT,
+                odds_value REAL,
+                kickoff TEXT
+            )
+        ''')
+        cls._ensure_column(conn, 'matches', 'odds_value', 'REAL')
+        cls._ensure_column(conn, 'matches', 'kickoff', 'TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_matches_tipster ON matches(tipster_name)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_matches_day ON matches(day)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_matches_bookmaker ON matches(bookmaker)')
+        # Index des tris de l'API (/api/tips?source=profile) ; le rowid (id) départage. Le tri chronologique
+        # utilise la date/heure ISO du match : le jour affiché (jj.mm.aaaa...) ne se trie pas
+        conn.execute('DROP INDEX IF EXISTS idx_matches_day_time')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_matches_kickoff ON matches(IFNULL(kickoff, ''))")
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_matches_odds ON matches(IFNULL(odds_value, 0))')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS tips (
+                id INTEGER PRIMARY KEY,
+                tipster_name TEXT NOT NULL,
+                day TEXT,
+                time TEXT,
+                bookmaker TEXT,
+                match TEXT,
+                tip TEXT,
+                odds TEXT,
+                score TEXT,
+                odds_value REAL,
+                kickoff TEXT
+            )
+        ''')
+        cls._ensure_column(conn, 'tips', 'odds_value', 'REAL')
+        cls._ensure_column(conn, 'tips', 'kickoff', 'TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tips_tipster ON tips(tipster_name)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tips_day ON tips(day)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tips_bookmaker ON tips(bookmaker)')
+        # Index des tris de l'API (/api/tips) ; le rowid (id) départage
+        conn.execute('DROP INDEX IF EXISTS idx_tips_day_time')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tips_kickoff ON tips(IFNULL(kickoff, ''))")
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tips_odds ON tips(IFNULL(odds_value, 0))')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT NOT NULL,
+                parser TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT NOT NULL,
+                parsed TEXT NOT NULL,
+                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (url, parser)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS listing_fingerprints (
+                profile_url TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                profile TEXT NOT NULL,
+                profile_hash TEXT NOT NULL,
+                last_fetched REAL NOT NULL,
+                interval_hours REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS listings (
+                page TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        stats.create_schema(conn)
+        scheduler.create_schema(conn)
+        notify.create_schema(conn)
+
+    @staticmethod
+    def _ensure_column(conn: sqlite3.Connection, table: str, column: str, definition: str):
+        """Ajoute une colonne manquante à une table existante"""
+        columns = {row["name"] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if column not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
 
     def upsert_tipsters(self, tipsters: List[Dict]):
         """Mise à jour des données des tipsters"""
-        conn = get_db_connection()
         try:
-            conn.executemany('''
-                INSERT INTO tipsters (name, win_rate, tips, profile_url)
-                VALUES (:name, :win_rate, :tips, :profile_url)
-                ON CONFLICT(name) DO UPDATE SET
-                win_rate = excluded.win_rate,
-                tips = excluded.tips,
-                last_updated = CURRENT_TIMESTAMP,
-                profile_url = excluded.profile_url
-            ''', tipsters)
-            conn.commit()
+            with db_writer() as conn:
+                conn.executemany(UPSERT_TIPSTER_SQL, tipsters)
             logger.info(f"Mise à jour de {len(tipsters)} tipsters")
         except sqlite3.Error as e:
             logger.error(f"Erreur de mise à jour : {e}")
             logger.exception("Erreur détaillée lors de l'upsert (avec traceback)")
-        finally:
-            conn.close()
 
-def analyze_and_visualize(tipsters: List[Dict]):
-    """Génère la visualisation des données"""
+    def save_cycle(self, qualified_tipsters: List[Dict], tomorrow_tips: records.TipColumns, tips_day: str,
+                   unavailable_tipsters: Iterable[str] = ()):
+        """Remplace le snapshot (tipsters qualifiés, matchs à venir, tips) en une seule transaction
+
+        `unavailable_tipsters` : tipsters dont le profil n'a pas pu être récupéré ; leurs tips absents du snapshot
+        ne sont pas notifiés comme retirés. Une erreur SQLite est relancée (transaction annulée) : le cycle échoue.
+        """
+        tipster_rows = [{
+            "name": t["name"],
+            "win_rate": t["win_rate"],
+            "tips": len(t["upcoming_matches"]),
+            "profile_url": t["profile_url"]
+        } for t in qualified_tipsters]
+        # Cote et date/heure ISO du match (parsées au parsing de la page) pour les filtres et tris de l'API
+        match_rows = [
+            (t["name"], *match.raw(), match.odds_value, match.kickoff.isoformat() if match.kickoff else None)
+            for t in qualified_tipsters for match in t["upcoming_matches"]
+        ]
+        tip_rows = []
+        for row in tomorrow_tips.rows():
+            kickoff = records.parse_kickoff(tips_day, row[TIP_COLUMNS.index("time")])
+            tip_rows.append((tips_day, *row, kickoff.isoformat() if kickoff else None))
+
+        try:
+            with metrics.DB_WRITE_SECONDS.time(operation="save_cycle"), db_writer() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                previous_tips = notify.snapshot_tips(conn)
+                conn.execute('UPDATE tipsters SET qualified = 0 WHERE qualified = 1')
+                conn.executemany(UPSERT_TIPSTER_SQL, tipster_rows)
+                conn.executemany('UPDATE tipsters SET qualified = 1 WHERE name = ?', [(t["name"],) for t in tipster_rows])
+                conn.execute('DELETE FROM matches')
+                conn.executemany(
+                    f'INSERT INTO matches (tipster_name, {", ".join(MATCH_COLUMNS)}, odds_value, kickoff) '
+                    f'VALUES ({", ".join("?" * (len(MATCH_COLUMNS) + 3))})',
+                    match_rows
+                )
+                conn.execute('DELETE FROM tips')
+                conn.executemany(
+                    f'INSERT INTO tips (day, {", ".join(TIP_COLUMNS)}, odds_value, kickoff) '
+                    f'VALUES ({", ".join("?" * (len(TIP_COLUMNS) + 3))})',
+                    tip_rows
+                )
+                # Événements des tips ajoutés / retirés (flux /events et digests)
+                events = notify.record_diff(conn, previous_tips, notify.snapshot_tips(conn),
+                                            CONFIG["EVENTS_RETENTION_DAYS"], unavailable_tipsters)
+            logger.info(f"Snapshot enregistré : {len(tipster_rows)} tipsters, {len(match_rows)} matchs, {len(tip_rows)} tips")
+            logger.info(f"Événements : {events['added']} tips ajoutés, {events['removed']} retirés")
+            for kind, count in events.items():
+                metrics.TIP_EVENTS.inc(count, kind=kind)
+        except sqlite3.Error as e:
+            logger.error(f"Erreur d'enregistrement du snapshot : {e}")
+            logger.exception("Erreur détaillée lors de l'enregistrement (avec traceback)")
+            raise
+
+
+    def save_listing(self, page: str, data):
+        """Enregistre le dernier résultat parsé d'une page de listing"""
+        with metrics.DB_WRITE_SECONDS.time(operation="listing"), db_writer() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO listings (page, data) VALUES (?, ?)',
+                (page, json.dumps(records.plain(data)))
+            )
+
+    def load_listing(self, page: str):
+        """Dernier résultat enregistré d'une page de listing, None si jamais récupérée"""
+        with db_reader() as conn:
+            row = conn.execute('SELECT data FROM listings WHERE page = ?', (page,)).fetchone()
+        return records.revive(json.loads(row["data"])) if row else None
+
+    def load_profiles(self, profile_urls: Iterable[str]) -> Dict[str, Dict]:
+        """Derniers profils connus : profil enregistré à son dernier fetch (listing_fingerprints), sinon win rate
+        et matchs du snapshot pour un tipster qualifié. Les URLs sans profil connu sont absentes du résultat."""
+        profile_urls = list(profile_urls)
+        if not profile_urls:
+            return {}
+        placeholders = ", ".join("?" * len(profile_urls))
+        profiles = {}
+        with db_reader() as conn:
+            for row in conn.execute(
+                f'SELECT profile_url, profile FROM listing_fingerprints WHERE profile_url IN ({placeholders})', profile_urls
+            ):
+                profiles[row["profile_url"]] = records.revive(json.loads(row["profile"]))
+            missing = [url for url in profile_urls if url not in profiles]
+            if missing:
+                tipsters = conn.execute(
+                    f'SELECT name, win_rate, profile_url FROM tipsters WHERE qualified = 1 '
+                    f'AND profile_url IN ({", ".join("?" * len(missing))})', missing
+                ).fetchall()
+                for tipster in tipsters:
+                    matches = conn.execute(
+                        f'SELECT {", ".join(MATCH_COLUMNS)} FROM matches WHERE tipster_name = ? ORDER BY id',
+                        (tipster["name"],)
+                    )
+                    profiles[tipster["profile_url"]] = {
+                        "win_rate": tipster["win_rate"],
+                        "upcoming_matches": [records.Match.create(*match) for match in matches]
+                    }
+        return profiles
+
+    def record_history(self, profiles: Dict[str, Dict]) -> int:
+        """Ajoute le cycle à l'historique et met à jour les statistiques glissantes (une transaction).
+        Une erreur SQLite est relancée (transaction annulée) : le cycle échoue."""
+        try:
+            with metrics.DB_WRITE_SECONDS.time(operation="history"), db_writer() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                new_settled = stats.record_cycle(conn, profiles, datetime.date.today())
+            logger.info(f"Historique : {len(profiles)} tipsters, {new_settled} nouveaux tips réglés")
+            return new_settled
+        except sqlite3.Error as e:
+            logger.error(f"Erreur d'enregistrement de l'historique : {e}")
+            logger.exception("Erreur détaillée lors de l'enregistrement de l'historique (avec traceback)")
+            raise
+
+    def rolling_stats(self, names: List[str]) -> Dict[str, Dict]:
+        """Statistiques glissantes 7/30/90 jours des tipsters demandés"""
+        with db_reader() as conn:
+            return stats.rolling_stats(conn, names)
+
+
+    def cumulative_roi(self, names: List[str]) -> List[Tuple[str, float]]:
+        """ROI cumulé jour par jour des tipsters demandés"""
+        with db_reader() as conn:
+            return stats.cumulative_roi(conn, names)
+
+    def backtest(self, names: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Backtest vectorisé des tips enregistrés (tous les tipsters si names est None)"""
+        with db_reader() as conn:
+            tips = backtest.load_tips(conn, names)
+        return backtest.evaluate(tips)
+
+
+def qualifying_win_rate(win_rate: Optional[float], tipster_stats: Optional[Dict]) -> Optional[float]:
+    """Taux de réussite utilisé pour la qualification : glissant sur QUALIFY_WINDOW_DAYS si assez de tips réglés,
+    sinon celui affiché sur le profil"""
+    window = CONFIG["QUALIFY_WINDOW_DAYS"]
+    if window and tipster_stats and window in tipster_stats:
+        rolling = tipster_stats[window]
+        if rolling["n"] >= CONFIG["QUALIFY_MIN_SETTLED"]:
+            return rolling["hit_rate"]
+    return win_rate
+
+
+def build_qualifier(db: DatabaseManager, names: List[str]) -> Callable[[str, Optional[float]], bool]:
+    """Règle de qualification du cycle : backtest (BACKTEST_QUALIFY) ou seuil MIN_WIN_RATE sur le win rate
+    (glissant si QUALIFY_WINDOW_DAYS)"""
+    if CONFIG["BACKTEST_QUALIFY"]:
+        selected = set(backtest.qualify(
+            db.backtest(names),
+            min_tips=CONFIG["BACKTEST_MIN_TIPS"],
+            min_hit_rate=CONFIG["BACKTEST_MIN_HIT_RATE"],
+            min_yield=CONFIG["BACKTEST_MIN_YIELD"],
+            max_drawdown=CONFIG["BACKTEST_MAX_DRAWDOWN"]
+        ))
+        logger.info(f"Backtest : {len(selected)} tipsters passent les seuils sur {len(names)}")
+        return lambda name, win_rate: name in selected
+
+    tipster_stats = db.rolling_stats(names) if CONFIG["QUALIFY_WINDOW_DAYS"] else {}
+
+    def qualifies(name: str, win_rate: Optional[float]) -> bool:
+        rate = qualifying_win_rate(win_rate, tipster_stats.get(name))
+        return rate is not None and rate > CONFIG["MIN_WIN_RATE"]
+    return qualifies
+
+
+def load_snapshot(conn: sqlite3.Connection) -> Tuple[List[Dict], List[Dict]]:
+    """Charge le dernier snapshot enregistré : (tipsters qualifiés avec leurs matchs, tips de "Tomorrow Tips")"""
+    matches_by_tipster: Dict[str, List[Dict]] = {}
+    for row in conn.execute(f'SELECT tipster_name, {", ".join(MATCH_COLUMNS)} FROM matches ORDER BY id'):
+        matches_by_tipster.setdefault(row["tipster_name"], []).append({column: row[column] for column in MATCH_COLUMNS})
+
+    qualified_tipsters = [{
+        "name": row["name"],
+        "win_rate": row["win_rate"],
+        "profile_url": row["profile_url"],
+        "upcoming_matches": matches_by_tipster.get(row["name"], [])
+    } for row in conn.execute(
+        'SELECT name, win_rate, profile_url FROM tipsters WHERE qualified = 1 ORDER BY win_rate DESC, name'
+    )]
+
+    tomorrow_tips = [
+        {column: row[column] for column in TIP_COLUMNS}
+        for row in conn.execute(f'SELECT {", ".join(TIP_COLUMNS)} FROM tips ORDER BY id')
+    ]
+    return qualified_tipsters, tomorrow_tips
+
+
+def chart_urls() -> Dict[str, str]:
+    """URL de la dernière version de chaque graphique, dans le format affiché par le tableau de bord"""
+    fmt = CONFIG["CHART_FORMATS"][0]
+    return {
+        chart_type: f'charts/{files[fmt]}'
+        for chart_type, files in charts.read_manifest(CONFIG["CHART_DIR"]).items() if fmt in files
+    }
+
+
+def dashboard_data(conn: sqlite3.Connection) -> Dict:
+    """Données du tableau de bord (variables du template dashboard.html)"""
+    qualified_tipsters, tomorrow_tips = load_snapshot(conn)
+    chart_paths = chart_urls()
+    return {
+        "qualified_tipsters": qualified_tipsters,
+        "image_path": chart_paths.pop("win_rates", 'static/tipsters.png'),
+        "charts": chart_paths,
+        "homepage_tips": tomorrow_tips,
+        # Curseur du flux /events : la page reçoit les tips ajoutés après sa publication
+        "last_event_id": notify.latest_event_id(conn)
+    }
+
+
+# Publications sérialisées : le cycle et le thread des graphiques (on_done) publient tous deux, et le nettoyage
+# des anciennes versions d'une publication supprimerait les fichiers du manifeste écrit par l'autre
+_publish_lock = threading.Lock()
+
+
+def publish_dashboard():
+    """Rend le tableau de bord depuis la base et publie le snapshot versionné (HTML + JSON)"""
     try:
-        plt.figure(figsize=(10, 6))
-        plt.barh(
-            [t['name'] for t in tipsters],
-            [t['win_rate'] for t in tipsters],
-            color='#4CAF50'
+        with _publish_lock:
+            with db_reader() as conn:
+                data = dashboard_data(conn)
+            with app.app_context():
+                html = render_template('dashboard.html', **data)
+            version, published = snapshot.publish(CONFIG["SNAPSHOT_DIR"], data, html)
+        if published:
+            logger.info(f"Snapshot du tableau de bord publié : version {version}")
+        else:
+            logger.info(f"Snapshot du tableau de bord inchangé : version {version}")
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"Erreur de publication du snapshot : {e}")
+
+
+# Service de rendu des graphiques, un par dossier (thread de fond démarré à la première utilisation)
+_chart_services: Dict[str, charts.ChartService] = {}
+_chart_services_lock = threading.Lock()
+
+
+def get_chart_service() -> charts.ChartService:
+    with _chart_services_lock:
+        service = _chart_services.get(CONFIG["CHART_DIR"])
+        if service is None:
+            service = _chart_services[CONFIG["CHART_DIR"]] = charts.ChartService(CONFIG["CHART_DIR"], CONFIG["CHART_FORMATS"])
+        return service
+
+
+def submit_charts(db: DatabaseManager, qualified_tipsters: List[Dict], observed_win_rates: List[float]):
+    """Soumet les graphiques du cycle au rendu en arrière-plan ; le snapshot est republié une fois les fichiers écrits"""
+    get_chart_service().submit({
+        "win_rates": {"tipsters": [
+            {"name": t["name"], "win_rate": t["win_rate"]} for t in qualified_tipsters if t["win_rate"] is not None
+        ]},
+        "win_rate_histogram": {"win_rates": sorted(observed_win_rates), "threshold": CONFIG["MIN_WIN_RATE"]},
+        "roi_over_time": {"roi": db.cumulative_roi([t["name"] for t in qualified_tipsters])},
+    }, on_done=lambda manifest: publish_dashboard())
+
+
+# Connexion SMTP des digests, conservée entre les cycles
+_mailer: Optional[notify.DigestMailer] = None
+_mailer_lock = threading.Lock()
+
+
+def get_mailer() -> notify.DigestMailer:
+    global _mailer
+    with _mailer_lock:
+        if _mailer is None:
+            _mailer = notify.DigestMailer(
+                CONFIG["SMTP_SERVER"], CONFIG["SMTP_PORT"], CONFIG["EMAIL_USER"], CONFIG["EMAIL_PASSWORD"],
+                use_ssl=CONFIG["SMTP_SSL"], timeout=CONFIG["SMTP_TIMEOUT"], idle_timeout=CONFIG["SMTP_IDLE_TIMEOUT"]
+            )
+        return _mailer
+
+
+def send_digest():
+    """Envoie par email les tips ajoutés depuis le dernier digest (ignoré si l'email n'est pas configuré)"""
+    if not CONFIG["EMAIL_USER"] or not CONFIG["DIGEST_RECIPIENTS"]:
+        return
+    try:
+        sent = notify.send_digest(
+            db_writer, get_mailer(), CONFIG["EMAIL_USER"], CONFIG["DIGEST_RECIPIENTS"],
+            min_interval=CONFIG["DIGEST_MIN_INTERVAL"], min_odds=CONFIG["DIGEST_MIN_ODDS"],
+            max_tips=CONFIG["DIGEST_MAX_TIPS"]
         )
-        plt.title('Top Tipsters - Taux de Réussite')
-        plt.xlabel('Pourcentage de réussite')
-        plt.tight_layout()
-        plt.savefig('static/tipsters.png')
-        plt.close()
-        logger.info("Visualisation générée avec succès")
-    except Exception as e:
-        logger.error(f"Erreur de visualisation : {e}")
+        if sent:
+            metrics.DIGEST_MESSAGES.inc(len(CONFIG["DIGEST_RECIPIENTS"]), result="sent")
+    except (smtplib.SMTPException, OSError, sqlite3.Error) as e:
+        metrics.DIGEST_MESSAGES.inc(len(CONFIG["DIGEST_RECIPIENTS"]), result="failed")
+        logger.error(f"Erreur d'envoi du digest : {e}")
 
-def scheduled_job():
-    """Tâche planifiée principale (modifiée pour inclure les tips de la homepage)"""
-    logger.info("Démarrage de la tâche planifiée")
-    global QUALIFIED_TIPSTERS
-    global TOMORROW_TIPS
 
+# Pages de listing, chacune avec sa cadence (CONFIG["SCHEDULE_CADENCE"])
+PAGE_TYPES = ("remainder", "tomorrow")
+
+
+def fetch_listing(db: DatabaseManager, scraper: TipsterScraper, page: str, due: bool, fetch: Callable[[], Any]):
+    """Page de listing du cycle : téléchargée si elle est due, sinon (ou en cas d'échec) dernier résultat enregistré"""
+    if not due:
+        stored = db.load_listing(page)
+        if stored is not None:
+            return stored
+    result = fetch()
+    if page in scraper.failed_pages:
+        stored = db.load_listing(page)
+        return result if stored is None else stored
+    db.save_listing(page, result)
+    return result
+
+
+def scheduled_job(pages: Iterable[str] = PAGE_TYPES) -> Dict:
+    """Tâche planifiée principale (modifiée pour inclure les tips de la homepage) ; renvoie les métriques du cycle.
+
+    Seules les pages de listing de `pages` sont re-téléchargées ; les autres reprennent leur dernier résultat.
+    """
+    pages = tuple(pages)
+    logger.info(f"Démarrage de la tâche planifiée ({', '.join(pages)})")
+    cycle: Dict[str, Any] = {"status": "ok"}
+    start = time.perf_counter()
+
+    scraper = None
     try:
-        scraper = TipsterScraper()
+        # Le schéma (dont http_cache et listing_fingerprints) est créé avant le cache de réponses et le suivi
         db = DatabaseManager()
+        scraper = TipsterScraper(
+            ResponseCache() if CONFIG["HTTP_CACHE"] else None,
+            parse_workers=CONFIG["PARSE_WORKERS"]
+        )
+
+        # Tipsters des pages Remainder et "Tomorrow Tips" (une seule requête pour les tipsters et les tips)
+        remainder_tipsters = fetch_listing(db, scraper, "remainder", "remainder" in pages,
+                                           scraper.fetch_tipsters_from_remainder_page)
+        tomorrow_page = fetch_listing(db, scraper, "tomorrow", "tomorrow" in pages, scraper.fetch_tomorrow_page)
+        tomorrow_tipsters = tomorrow_page["tipsters"]
+        listed_tipsters = remainder_tipsters + tomorrow_tipsters
 
-        # Récupération des tipsters qualifiés depuis la page Remainder
-        remainder_tipsters = scraper.fetch_tipsters_from_remainder_page()
+        # Profils : seuls les tipsters nouveaux ou modifiés sur les listings sont récupérés
+        tracker = ChangeTracker() if CONFIG["INCREMENTAL_SCRAPE"] else None
+        if tracker is not None:
+            profile_urls, reused_profiles = tracker.plan(listed_tipsters)
+            if PROFILE_CACHE is not None:
+                # Un profil en cache d'un tipster dont les lignes ont changé est périmé
+                for url in tracker.changed:
+                    PROFILE_CACHE.discard(url)
+        else:
+            profile_urls, reused_profiles = list(dict.fromkeys(t["profile_url"] for t in listed_tipsters)), {}
+        # Un tipster présent sur plusieurs lignes ou sur les deux pages n'est récupéré qu'une fois par cycle
+        duplicates = len(listed_tipsters) - len({t["profile_url"] for t in listed_tipsters})
+        metrics.CACHE_REQUESTS.inc(duplicates, cache="dedup", result="hit")
+        logger.info(f"Profils : {len(listed_tipsters)} lignes de listing, {duplicates} doublons récupérés une seule fois")
+        profile_cache_before = (PROFILE_CACHE.hits, PROFILE_CACHE.misses) if PROFILE_CACHE is not None else None
+        fetched_profiles = dict(zip(profile_urls, scraper.fetch_tipster_profiles(profile_urls, PROFILE_CACHE)))
+        if PROFILE_CACHE is not None:
+            metrics.CACHE_REQUESTS.inc(PROFILE_CACHE.hits - profile_cache_before[0], cache="profile", result="hit")
+            metrics.CACHE_REQUESTS.inc(PROFILE_CACHE.misses - profile_cache_before[1], cache="profile", result="miss")
+            logger.info(f"Cache de profils (inter-cycles) : {PROFILE_CACHE.stats()}")
+        failed_urls = [url for url, profile in fetched_profiles.items() if profile is None]
+        # Profils en échec : dernier profil connu, pour qu'une erreur réseau ne retire pas le tipster du snapshot
+        carried_profiles = db.load_profiles(failed_urls)
+        cycle.update(
+            listings_failed=len(scraper.failed_pages),
+            profiles_fetched=len(fetched_profiles) - len(failed_urls),
+            profiles_reused=len(reused_profiles),
+            profiles_failed=len(failed_urls),
+            profiles_carried=len(carried_profiles)
+        )
+        if carried_profiles:
+            logger.warning(f"{len(failed_urls)} profils en échec, {len(carried_profiles)} repris du dernier profil connu")
+        if tracker is not None:
+            tracker.record(fetched_profiles)
+        profiles_by_url = {**reused_profiles, **fetched_profiles, **carried_profiles}
+        remainder_profiles = [profiles_by_url.get(t["profile_url"]) for t in remainder_tipsters]
+        tomorrow_profiles = [profiles_by_url.get(t["profile_url"]) for t in tomorrow_tipsters]
+
+        # Historique du cycle (profils effectivement récupérés) et statistiques glissantes (mises à jour en O(delta))
+        observed_profiles = {
+            tipster_info["name"]: fetched_profiles[tipster_info["profile_url"]]
+            for tipster_info in listed_tipsters if fetched_profiles.get(tipster_info["profile_url"])
+        }
+        db.record_history(observed_profiles)
+        qualifies = build_qualifier(db, list(dict.fromkeys(
+            tipster_info["name"] for tipster_info in listed_tipsters if profiles_by_url.get(tipster_info["profile_url"])
+        )))
+
+        # Filtrage des tipsters de la page Remainder
         qualified_remainder_tipsters_data = [] # Renamed variable to distinguish from tomorrow tipsters
         added_tipster_names = set()
-
-        for tipster_info in remainder_tipsters:
-            profile_data = scraper.fetch_tipster_profile_data(tipster_info["profile_url"])
+        for tipster_info, profile_data in zip(remainder_tipsters, remainder_profiles):
             if profile_data:
                 win_rate = profile_data.get("win_rate")
                 upcoming_matches = profile_data.get("upcoming_matches")
 
-                if win_rate is not None and win_rate > CONFIG["MIN_WIN_RATE"]:
+                if qualifies(tipster_info["name"], win_rate):
                     tipster_name = tipster_info["name"]
                     if tipster_name not in added_tipster_names:
                         qualified_remainder_tipsters_data.append({ # Renamed variable
@@ -300,106 +1265,326 @@ def scheduled_job():
                         })
                         added_tipster_names.add(tipster_name)
 
-        # Récupération des tipsters de Tomorrow Tips et filtrage par win rate
-        tomorrow_tipsters = scraper.fetch_tipsters_from_tomorrow_tips_page() # Fetch tipsters from tomorrow page
+        # Filtrage des tipsters de la page Tomorrow Tips
         qualified_tomorrow_tipsters_data = []
-        for tipster_info in tomorrow_tipsters: # Iterate through tomorrow tipsters
-            profile_data = scraper.fetch_tipster_profile_data(tipster_info["profile_url"])
+        for tipster_info, profile_data in zip(tomorrow_tipsters, tomorrow_profiles): # Iterate through tomorrow tipsters
             if profile_data:
                 win_rate = profile_data.get("win_rate")
-                if win_rate is not None and win_rate > CONFIG["MIN_WIN_RATE"]:
-                    qualified_tomorrow_tipsters_data.append({ # Add to separate list for tomorrow tipsters
-                        "name": tipster_info["name"],
-                        "win_rate": win_rate,
-                        "profile_url": tipster_info["profile_url"],
-                        "upcoming_matches": [] # No upcoming matches fetched yet for tomorrow tipsters
-                    })
-
+                if qualifies(tipster_info["name"], win_rate):
+                    tipster_name = tipster_info["name"]
+                    if tipster_name not in added_tipster_names:
+                        qualified_tomorrow_tipsters_data.append({ # Add to separate list for tomorrow tipsters
+                            "name": tipster_name,
+                            "win_rate": win_rate,
+                            "profile_url": tipster_info["profile_url"],
+                            "upcoming_matches": [] # No upcoming matches fetched yet for tomorrow tipsters
+                        })
+                        added_tipster_names.add(tipster_name)
 
         # Combine qualified tipsters from both pages (Remainder and Tomorrow Tips)
         qualified_tipsters_data = qualified_remainder_tipsters_data + qualified_tomorrow_tipsters_data
 
         if qualified_tipsters_data:
-            analyze_and_visualize([
-                {"name": t["name"], "win_rate": t["win_rate"]} for t in qualified_tipsters_data if t["win_rate"] is not None
-            ])
             logger.info(f"Tipsters qualifiés trouvés : {[t['name'] for t in qualified_tipsters_data]}")
-            QUALIFIED_TIPSTERS = qualified_tipsters_data
         else:
             logger.info("Aucun tipster qualifié trouvé selon les critères")
-            QUALIFIED_TIPSTERS = []
 
 
-        # Récupération des tips depuis la page "Tomorrow Tips" (inchangée - now uses qualified tipster list)
-        tomorrow_tips = scraper.fetch_tips_from_tomorrow_page()
+        # Tips de la page "Tomorrow Tips" (déjà récupérés avec les tipsters)
+        tomorrow_tips = records.TipColumns(tomorrow_page["tips"])
 
-        # Filtrage des tips de la page "Tomorrow Tips" (inchangée - now uses qualified tipster list)
-        filtered_tomorrow_tips = []
+        # Filtrage des tips de la page "Tomorrow Tips" sur la colonne des noms (tipsters qualifiés)
         qualified_tipster_names = {tipster['name'] for tipster in qualified_tipsters_data}
-        logger.info(f"Tipsters qualifiés (noms) : {qualified_tipster_names}")
+        logger.debug(f"Tipsters qualifiés (noms) : {qualified_tipster_names}")
+        filtered_tomorrow_tips = tomorrow_tips.where_tipster(qualified_tipster_names)
 
-        for tip in tomorrow_tips:
-            tipster_name_tip = tip["tipster_name"].strip()
-            logger.info(f"Tip Tomorrow - Tipster: '{tipster_name_tip}'")
-
-            if tipster_name_tip in qualified_tipster_names:
-                filtered_tomorrow_tips.append(tip)
-                logger.info(f"Tip Tomorrow - KEPT: '{tipster_name_tip}'")
-            else:
-                logger.info(f"Tip Tomorrow - FILTERED OUT: '{tipster_name_tip}'")
+        if logger.isEnabledFor(logging.DEBUG):
+            # Log par tip : DEBUG et échantillonné
+            for tipster_name_tip in tomorrow_tips.columns["tipster_name"]:
+                if metrics.sampled():
+                    kept = tipster_name_tip in qualified_tipster_names
+                    logger.debug(f"Tip Tomorrow - {'KEPT' if kept else 'FILTERED OUT'}: '{tipster_name_tip}'")
 
         logger.info(f"Tips de la page Tomorrow Tips récupérés : {len(tomorrow_tips)} tips, après filtrage : {len(filtered_tomorrow_tips)}")
-        TOMORROW_TIPS = filtered_tomorrow_tips
+
+        # Les tips de la page "Tomorrow Tips" portent sur le lendemain du scraping
+        tips_day = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+        unavailable_tipsters = {t["name"] for t in listed_tipsters if t["profile_url"] in failed_urls}
+        db.save_cycle(qualified_tipsters_data, filtered_tomorrow_tips, tips_day, unavailable_tipsters)
+        cycle.update(qualified=len(qualified_tipsters_data), tips=len(filtered_tomorrow_tips))
+        if cycle["listings_failed"] or cycle["profiles_failed"]:
+            cycle["status"] = "partial"
+        publish_dashboard()
+        send_digest()
+        # Graphiques rendus en arrière-plan (win rate de chaque tipster listé pour l'histogramme)
+        listed_profiles = {t["name"]: profiles_by_url.get(t["profile_url"]) for t in listed_tipsters}
+        submit_charts(db, qualified_tipsters_data, [
+            profile["win_rate"] for profile in listed_profiles.values() if profile and profile["win_rate"] is not None
+        ])
 
     except Exception as e:
         logger.error(f"Erreur dans la tâche planifiée : {e}")
+        cycle.update(status="failed", error=str(e))
+    finally:
+        if scraper is not None:
+            scraper.close()
+        metrics.CYCLE_SECONDS.observe(time.perf_counter() - start, status=cycle["status"])
+        metrics.LAST_CYCLE.set(time.time(), status=cycle["status"])
+        try:
+            metrics.SCRAPER.write_textfile(CONFIG["METRICS_FILE"])
+        except OSError as e:
+            logger.error(f"Erreur d'écriture des métriques : {e}")
+    return cycle
+
+# Cache de profils conservé entre les cycles (None si désactivé)
+PROFILE_CACHE: Optional[ProfileCache] = (
+    ProfileCache(CONFIG["PROFILE_CACHE_SIZE"], CONFIG["PROFILE_CACHE_TTL"])
+    if CONFIG["PROFILE_CACHE_SIZE"] else None
+)
+
+# Lecteurs du snapshot publié, un par dossier
+_snapshot_stores: Dict[str, snapshot.SnapshotStore] = {}
+
+
+def get_snapshot_store() -> snapshot.SnapshotStore:
+    directory = CONFIG["SNAPSHOT_DIR"]
+    store = _snapshot_stores.get(directory)
+    if store is None:
+        store = _snapshot_stores.setdefault(directory, snapshot.SnapshotStore(directory))
+    return store
+
+
+def snapshot_response(kind: str) -> Optional[Response]:
+    """Sert le snapshot publié (ETag fort, 304, variante pré-compressée), None si aucun n'est publié"""
+    variant = get_snapshot_store().select(kind, (encoding for encoding, quality in request.accept_encodings if quality > 0))
+    if variant is None:
+        metrics.SNAPSHOT_RESPONSES.inc(kind=kind, status="missing")
+        return None
+    response = Response(variant.body, content_type=variant.mimetype)
+    response.set_etag(variant.etag)
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    if variant.encoding:
+        response.content_encoding = variant.encoding
+    response = response.make_conditional(request)
+    metrics.SNAPSHOT_RESPONSES.inc(kind=kind, status=str(response.status_code))
+    return response
+
+
+# Surveillance des événements de tips pour les flux /events, une par base
+_event_feeds: Dict[str, notify.EventFeed] = {}
+_event_feeds_lock = threading.Lock()
+
+
+def get_event_feed() -> notify.EventFeed:
+    with _event_feeds_lock:
+        feed = _event_feeds.get(CONFIG["DATABASE"])
+        if feed is None:
+            # Lié au pool de sa base : le feed ne lit pas une autre base si CONFIG["DATABASE"] change
+            feed = _event_feeds[CONFIG["DATABASE"]] = notify.EventFeed(get_db_pool().reader, CONFIG["SSE_POLL_SECONDS"])
+        return feed
 
-# Variables globales pour stocker les tipsters qualifiés et les tips de la homepage
-QUALIFIED_TIPSTERS: List[Dict] = []
-TOMORROW_TIPS: List[Dict] = []
 
 # Configuration Flask
 @app.route('/')
-@cache.cached(timeout=300)
 def dashboard():
-    """Endpoint du tableau de bord"""
-    conn = get_db_connection()
+    """Endpoint du tableau de bord (snapshot pré-rendu, rendu depuis la base s'il n'est pas encore publié)"""
     try:
-        return render_template(
-            'dashboard.html',
-            qualified_tipsters=QUALIFIED_TIPSTERS,
-            image_path='static/tipsters.png',
-            homepage_tips=TOMORROW_TIPS
-        )
+        response = snapshot_response('html')
+        if response is not None:
+            return response
+        with db_reader() as conn:
+            return render_template('dashboard.html', **dashboard_data(conn))
     except sqlite3.OperationalError as e:
         logger.critical(f"Erreur de base de données : {e}")
         return render_template('error.html', error="Base de données non initialisée"), 500
     except Exception as e:
         logger.error(f"Erreur générale : {e}")
         return render_template('error.html', error="Erreur inattendu"), 500
-    finally:
-        conn.close()
 
-def run_scheduler():
-    """Exécution du planificateur en arrière-plan"""
-    schedule.every(3).hours.do(scheduled_job)
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+@app.route('/dashboard.json')
+def dashboard_json():
+    """Données du tableau de bord en JSON compact (snapshot publié)"""
+    response = snapshot_response('json')
+    if response is not None:
+        return response
+    try:
+        with db_reader() as conn:
+            return dashboard_data(conn)
+    except sqlite3.OperationalError as e:
+        logger.critical(f"Erreur de base de données : {e}")
+        return {"error": "Base de données non initialisée"}, 500
 
-if __name__ == '__main__':
-    os.makedirs('static', exist_ok=True)
-    os.makedirs('templates', exist_ok=True)
+def api_response(query: Callable[[sqlite3.Connection, Dict], Dict]):
+    """Exécute une requête de l'API sur une connexion en lecture (400 si un paramètre est invalide).
+
+    Les résultats sont mis en cache (partagé entre workers) sous la version du snapshot publié :
+    un nouveau cycle qui change les données change toutes les clés.
+    """
+    manifest = get_snapshot_store().manifest()
+    cache_key = f'api:{manifest["version"]}:{request.full_path}' if manifest else None
+    if cache_key is not None:
+        cached = cache.get(cache_key)
+        metrics.API_CACHE_REQUESTS.inc(result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+    try:
+        with db_reader() as conn:
+            result = query(conn, request.args)
+        if cache_key is not None:
+            cache.set(cache_key, result)
+        return result
+    except api.ApiError as e:
+        return {"error": str(e)}, 400
+    except sqlite3.OperationalError as e:
+        logger.critical(f"Erreur de base de données : {e}")
+        return {"error": "Base de données non initialisée"}, 500
+
+_sse_slots: Optional[threading.BoundedSemaphore] = None
+_sse_slots_lock = threading.Lock()
+
+
+def get_sse_slots() -> threading.BoundedSemaphore:
+    """Places de flux /events du processus : chaque flux occupe un thread du worker, les autres restent aux
+    requêtes courtes (/, /api/*)"""
+    global _sse_slots
+    with _sse_slots_lock:
+        if _sse_slots is None:
+            _sse_slots = threading.BoundedSemaphore(CONFIG["SSE_MAX_STREAMS"])
+        return _sse_slots
 
-    # Initialisation forcée de la BDD
-    DatabaseManager().init_db()
 
-    # Premier scraping immédiat
+@app.route('/events')
+def events_stream():
+    """Flux Server-Sent Events des tips ajoutés / retirés après le curseur (en-tête Last-Event-ID, sinon ?since=,
+    sinon maintenant). Le flux se termine après SSE_STREAM_SECONDS ; le navigateur se reconnecte depuis son curseur.
+    Au-delà de SSE_MAX_STREAMS flux ouverts dans ce processus : 503."""
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('since')
     try:
-        scheduled_job()
-    except Exception as e:
-        logger.error(f"Erreur initiale : {e}")
+        feed = get_event_feed()
+        after_id = int(cursor) if cursor is not None else feed.latest_id()
+    except ValueError:
+        return {"error": f"Curseur d'événements invalide : {cursor}"}, 400
+    except sqlite3.OperationalError as e:
+        logger.critical(f"Erreur de base de données : {e}")
+        return {"error": "Base de données non initialisée"}, 500
+    slots = get_sse_slots()
+    if not slots.acquire(blocking=False):
+        metrics.SSE_REJECTED.inc()
+        retry_after = str(max(1, CONFIG["SSE_RETRY_MS"] // 1000))
+        return {"error": "Trop de flux d'événements ouverts"}, 503, {"Retry-After": retry_after}
+
+    def stream(after_id: int):
+        metrics.SSE_CLIENTS.inc()
+        try:
+            yield f"retry: {CONFIG['SSE_RETRY_MS']}\n\n"
+            deadline = time.monotonic() + CONFIG["SSE_STREAM_SECONDS"]
+            while time.monotonic() < deadline:
+                events = feed.wait(after_id, min(CONFIG["SSE_HEARTBEAT_SECONDS"], deadline - time.monotonic()))
+                if not events:
+                    yield ": keepalive\n\n"
+                for event in events:
+                    after_id = event["id"]
+                    yield notify.format_sse(event)
+        finally:
+            metrics.SSE_CLIENTS.inc(-1)
+
+    response = Response(stream(after_id), mimetype='text/event-stream')
+    # Place rendue à la fermeture de la réponse, même si le flux n'a jamais été itéré (client parti)
+    response.call_on_close(slots.release)
+    response.cache_control.no_cache = True
+    # Pas de mise en tampon par un reverse proxy (nginx)
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.after_request
+def write_web_metrics(response: Response) -> Response:
+    """Publie (au plus toutes les WEB_METRICS_INTERVAL secondes) les métriques de ce worker pour /metrics"""
+    try:
+        metrics.write_web_textfile(CONFIG["WEB_METRICS_DIR"], CONFIG["WEB_METRICS_INTERVAL"])
+    except OSError as e:
+        logger.error(f"Erreur d'écriture des métriques web : {e}")
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métriques au format texte Prometheus : celles de tous les workers web (additionnées) et celles du dernier
+    cycle du scraper"""
+    directory = CONFIG["WEB_METRICS_DIR"]
+    metrics.write_web_textfile(directory)
+    body = metrics.merge_textfiles(
+        os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(".prom")
+    )
+    try:
+        with open(CONFIG["METRICS_FILE"], encoding="utf-8") as f:
+            body += f.read()
+    except FileNotFoundError:
+        pass
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/charts/<path:filename>')
+def chart_file(filename: str):
+    """Graphiques rendus : nom de fichier hashé, donc cache navigateur d'un an"""
+    response = send_from_directory(os.path.abspath(CONFIG["CHART_DIR"]), filename, max_age=365 * 24 * 3600)
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/api/tipsters')
+def api_tipsters():
+    """Tipsters qualifiés : filtres, tri et pagination par curseur (voir api.query_tipsters)"""
+    return api_response(api.query_tipsters)
+
+@app.route('/api/tips')
+def api_tips():
+    """Tips des tipsters qualifiés : filtres, tri et pagination par curseur (voir api.query_tips)"""
+    return api_response(api.query_tips)
+
+def run_scheduler():
+    """Planificateur : cadence par page, jitter, bail SQLite et nouvel essai en cas d'échec"""
+    scheduler.Scheduler(
+        scheduled_job,
+        db_writer,
+        CONFIG["SCHEDULE_CADENCE"],
+        jitter=CONFIG["SCHEDULE_JITTER"],
+        retry_base=CONFIG["SCHEDULE_RETRY_BASE"],
+        lease_ttl=CONFIG["SCHEDULE_LEASE_TTL"]
+    ).run_forever()
+
+def run_worker():
+    """Processus scraper : premier cycle immédiat (toutes les pages) puis cycles planifiés"""
+    DatabaseManager.ensure_schema()
+    run_scheduler()
+
+def run_web(host: str, port: int):
+    """Processus web : sert le dernier snapshot enregistré, sans scraper"""
+    DatabaseManager.ensure_schema()
+    metrics.reset_web_textfiles(CONFIG["WEB_METRICS_DIR"])
+    app.run(host=host, port=port, debug=False)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scraper et tableau de bord des tipsters")
+    parser.add_argument('mode', nargs='?', choices=('all', 'web', 'worker', 'once'), default='all',
+                        help="web : serveur seul, worker : scraper seul, once : un seul cycle, all : web + worker (défaut)")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    replay_group = parser.add_mutually_exclusive_group()
+    replay_group.add_argument('--record', metavar='DIR', help="enregistre les réponses HTTP du scraper dans DIR")
+    replay_group.add_argument('--replay', metavar='DIR', help="rejoue les réponses enregistrées dans DIR, sans réseau")
+    args = parser.parse_args()
+
+    if args.record or args.replay:
+        CONFIG.update(HTTP_REPLAY='record' if args.record else 'replay', HTTP_REPLAY_DIR=args.record or args.replay)
+    os.makedirs('static', exist_ok=True)
 
-    # Démarrage des threads
-    threading.Thread(target=run_scheduler, daemon=True).start()
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    if args.mode == 'worker':
+        run_worker()
+    elif args.mode == 'once':
+        DatabaseManager.ensure_schema()
+        result = scheduled_job()
+        logger.info(f"Cycle terminé : {result}")
+        sys.exit(0 if result["status"] == "ok" else 1)
+    else:
+        if args.mode == 'all':
+            # Le premier scraping tourne en arrière-plan : le tableau de bord sert tout de suite le dernier snapshot
+            threading.Thread(target=run_worker, name="scraper", daemon=True).start()
+        run_web(args.host, args.port)
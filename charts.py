@@ -0,0 +1,170 @@
+"""Service de rendu des graphiques du tableau de bord
+
+Les graphiques sont construits avec l'API objet de matplotlib (Figure + canvas Agg/SVG), sans l'état
+global de pyplot, dans un thread dédié : le cycle de scraping ne fait que soumettre les données.
+Le nom de chaque fichier contient le hash des données d'entrée (et du type/format) : un graphique
+dont les données n'ont pas changé n'est pas re-rendu, et ses URLs peuvent être mises en cache
+indéfiniment par les navigateurs. Les fichiers sont écrits de façon atomique (fichier temporaire
+puis renommage) et `charts.json` référence la dernière version de chaque graphique.
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+from snapshot import write_atomic
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "charts.json"
+FORMATS = ("png", "svg")
+
+# Incrémenté quand le rendu change, pour invalider les fichiers existants
+RENDER_VERSION = 1
+
+
+def _win_rates(figure: "Figure", data: Dict):
+    """Taux de réussite des tipsters qualifiés (barres horizontales)"""
+    ax = figure.add_subplot()
+    ax.barh([t["name"] for t in data["tipsters"]], [t["win_rate"] for t in data["tipsters"]], color='#4CAF50')
+    ax.set_title('Top Tipsters - Taux de Réussite')
+    ax.set_xlabel('Pourcentage de réussite')
+
+
+def _win_rate_histogram(figure: "Figure", data: Dict):
+    """Distribution des taux de réussite de tous les tipsters observés"""
+    ax = figure.add_subplot()
+    ax.hist(data["win_rates"], bins=20, range=(0, 100), color='#2196F3', edgecolor='white')
+    ax.axvline(data["threshold"], color='#F44336', linestyle='--', label=f'Seuil ({data["threshold"]}%)')
+    ax.set_title('Distribution des taux de réussite')
+    ax.set_xlabel('Pourcentage de réussite')
+    ax.set_ylabel('Tipsters')
+    ax.legend()
+
+
+def _roi_over_time(figure: "Figure", data: Dict):
+    """ROI cumulé des tipsters qualifiés, jour par jour"""
+    ax = figure.add_subplot()
+    days = [day for day, _ in data["roi"]]
+    ax.plot(days, [roi for _, roi in data["roi"]], color='#FF9800', marker='o' if len(days) < 30 else None)
+    ax.axhline(0, color='grey', linewidth=0.8)
+    ax.set_title('ROI cumulé des tipsters qualifiés')
+    ax.set_ylabel('ROI (%)')
+    ax.tick_params(axis='x', labelrotation=45)
+
+
+# Type de graphique -> fonction de dessin
+CHART_TYPES: Dict[str, Callable[["Figure", Dict], None]] = {
+    "win_rates": _win_rates,
+    "win_rate_histogram": _win_rate_histogram,
+    "roi_over_time": _roi_over_time,
+}
+
+
+def chart_filename(chart_type: str, fmt: str, data: Dict) -> str:
+    """Nom du fichier : type, hash des données d'entrée et format"""
+    payload = json.dumps([RENDER_VERSION, chart_type, fmt, data], sort_keys=True, separators=(",", ":"))
+    return f"{chart_type}.{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]}.{fmt}"
+
+
+def render(chart_type: str, data: Dict, fmt: str) -> bytes:
+    """Rend un graphique en mémoire (API objet, sans pyplot)"""
+    # Import différé : le processus web lit le manifeste sans charger matplotlib
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 6))
+    CHART_TYPES[chart_type](figure, data)
+    figure.tight_layout()
+    with tempfile.SpooledTemporaryFile() as buffer:
+        figure.savefig(buffer, format=fmt, metadata={"Software": None} if fmt == "png" else {"Date": None})
+        buffer.seek(0)
+        return buffer.read()
+
+
+def read_manifest(directory: str) -> Dict[str, Dict[str, str]]:
+    """Dernier fichier rendu de chaque graphique : {type: {format: nom}}"""
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+class ChartService:
+    """Rendu des graphiques dans un thread de fond.
+
+    `submit` met en file un lot de graphiques et rend la main ; le worker ne rend que les fichiers
+    absents, met à jour le manifeste, supprime les anciennes versions puis appelle `on_done`.
+    """
+    def __init__(self, directory: str, formats: Iterable[str] = ("png",)):
+        self.directory = directory
+        self.formats = tuple(formats)
+        self._jobs: "queue.Queue[Optional[Tuple[Dict[str, Dict], Optional[Callable]]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="chart-renderer", daemon=True)
+        self._thread.start()
+
+    def submit(self, charts: Dict[str, Dict], on_done: Optional[Callable[[Dict[str, Dict[str, str]]], None]] = None):
+        """Met en file le rendu de {type: données} ; on_done reçoit le manifeste une fois les fichiers écrits"""
+        self._jobs.put((charts, on_done))
+
+    def wait(self):
+        """Attend la fin des rendus en file"""
+        self._jobs.join()
+
+    def close(self):
+        self._jobs.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                if job is None:
+                    return
+                charts, on_done = job
+                manifest = self.render_all(charts)
+                if on_done is not None:
+                    on_done(manifest)
+            except Exception as e:
+                logger.error(f"Erreur de rendu des graphiques : {e}")
+            finally:
+                self._jobs.task_done()
+
+    def render_all(self, charts: Dict[str, Dict]) -> Dict[str, Dict[str, str]]:
+        """Rend les graphiques dont les données ont changé et renvoie le manifeste à jour"""
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = read_manifest(self.directory)
+        rendered = 0
+        for chart_type, data in charts.items():
+            files = {}
+            for fmt in self.formats:
+                name = chart_filename(chart_type, fmt, data)
+                path = os.path.join(self.directory, name)
+                if not os.path.exists(path):
+                    write_atomic(path, render(chart_type, data, fmt))
+                    rendered += 1
+                files[fmt] = name
+            manifest[chart_type] = files
+        write_atomic(os.path.join(self.directory, MANIFEST), json.dumps(manifest, sort_keys=True).encode("utf-8"))
+        self._cleanup(manifest)
+        logger.info(f"Graphiques : {rendered} rendus, {len(charts) * len(self.formats) - rendered} inchangés")
+        return manifest
+
+    def _cleanup(self, manifest: Dict[str, Dict[str, str]]):
+        """Supprime les fichiers qui ne sont plus référencés (sauf les plus récents, encore en cache côté clients)"""
+        current = {name for files in manifest.values() for name in files.values()}
+        stale: List[Tuple[float, str]] = []
+        for name in os.listdir(self.directory):
+            if name.split(".")[0] in CHART_TYPES and name not in current:
+                stale.append((os.path.getmtime(os.path.join(self.directory, name)), name))
+        # On garde la version précédente de chaque fichier pour les pages déjà servies
+        stale.sort(reverse=True)
+        for _, name in stale[len(current):]:
+            os.unlink(os.path.join(self.directory, name))
@@ -0,0 +1,24 @@
+"""Configuration gunicorn : `gunicorn -c gunicorn.conf.py wsgi:app`"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+# Le travail par requête est court (fichier du snapshot, page d'index SQLite), hors flux /events
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Chaque flux /events (Server-Sent Events) occupe un thread pendant SSE_STREAM_SECONDS : plusieurs threads par
+# worker, dont au plus SSE_MAX_STREAMS pour les flux (au-delà : 503), pour que les autres requêtes soient servies
+threads = int(os.getenv("WEB_THREADS", 8))
+# Application chargée une fois dans le maître ; le pool SQLite est recréé dans chaque worker (changement de pid)
+preload_app = True
+# Chemins relatifs de CONFIG (base, snapshot, graphiques, cache) résolus depuis le dossier du projet
+chdir = os.path.dirname(os.path.abspath(__file__))
+timeout = 30
+accesslog = "-"
+
+
+def worker_exit(server, worker):
+    """Dernier état des métriques du worker conservé pour /metrics (ses compteurs restent dans les totaux) ;
+    ses flux /events sont fermés"""
+    from bet import CONFIG, metrics
+    metrics.SSE_CLIENTS.set(0)
+    metrics.write_web_textfile(CONFIG["WEB_METRICS_DIR"])
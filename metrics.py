@@ -0,0 +1,262 @@
+"""Instrumentation : compteurs, jauges et histogrammes au format texte Prometheus
+
+Deux registres :
+- SCRAPER : mesures du cycle de scraping (fetch, parsing, écritures en base, caches, durée du cycle).
+  Le processus scraper les écrit dans un fichier à la fin de chaque cycle (à la manière du textfile
+  collector de node_exporter) ; le processus web les relit pour /metrics.
+- WEB : mesures du processus web (cache de l'API, réponses du snapshot, flux /events). Chaque worker
+  gunicorn a les siennes : il les écrit dans son propre fichier et /metrics additionne les fichiers de
+  tous les workers (`merge_textfiles`), quel que soit le worker qui répond.
+
+Les logs par élément (profil, tip) passent au niveau DEBUG et ne sont émis que pour un échantillon
+(`sampled`), pour ne pas payer le coût du logging à chaque ligne.
+"""
+import bisect
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from snapshot import write_atomic
+
+# Bornes par défaut des histogrammes de durée (secondes)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Proportion des logs par élément émis au niveau DEBUG
+DEBUG_SAMPLE_RATE = 0.01
+
+LabelValues = Tuple[str, ...]
+
+
+def sampled(rate: Optional[float] = None) -> bool:
+    """Vrai pour une fraction `rate` des appels (DEBUG_SAMPLE_RATE par défaut)"""
+    return random.random() < (DEBUG_SAMPLE_RATE if rate is None else rate)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Compteur monotone"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """Valeur instantanée"""
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Histogramme cumulatif (buckets, somme et nombre d'observations)"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelValues, List[float]] = {}  # compte par bucket (+Inf en dernier), somme
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def totals(self) -> Dict[LabelValues, Tuple[int, float]]:
+        """(nombre d'observations, somme) par combinaison de labels"""
+        with self._lock:
+            return {key: (sum(state[:-1]), state[-1]) for key, state in self._values.items()}
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe la durée du bloc"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def merge_textfiles(paths: Iterable[str]) -> str:
+    """Additionne les séries de plusieurs rendus d'un même registre (un fichier par processus) : compteurs,
+    buckets, sommes et nombres d'observations des histogrammes et jauges (valeurs par processus) s'ajoutent"""
+    headers: Dict[str, List[str]] = {}
+    samples: Dict[str, Dict[str, float]] = {}
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            continue
+        name = ""
+        for line in lines:
+            if line.startswith("# HELP "):
+                name = line.split(" ", 3)[2]
+                headers.setdefault(name, [])
+                samples.setdefault(name, {})
+            if line.startswith("#"):
+                if line not in headers[name]:
+                    headers[name].append(line)
+            elif line:
+                series, value = line.rsplit(" ", 1)
+                samples[name][series] = samples[name].get(series, 0) + float(value)
+    blocks = [
+        "\n".join(headers[name] + [f"{series} {_format_value(value)}" for series, value in samples[name].items()])
+        for name in headers
+    ]
+    return "\n".join(blocks) + "\n" if blocks else ""
+
+
+class Registry:
+    """Ensemble de métriques rendues ensemble"""
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+    def write_textfile(self, path: str):
+        """Écrit le rendu dans `path` de façon atomique (lu par le processus web)"""
+        path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, self.render().encode("utf-8"))
+
+
+SCRAPER = Registry()
+FETCH_SECONDS = SCRAPER.histogram("betclic_fetch_seconds", "Latence des requêtes HTTP par type d'URL", ("url_type",))
+FETCH_ERRORS = SCRAPER.counter("betclic_fetch_errors_total", "Requêtes HTTP en échec (après nouvelles tentatives)", ("url_type",))
+PARSE_SECONDS = SCRAPER.histogram("betclic_parse_seconds", "Temps de parsing par page", ("page",))
+DB_WRITE_SECONDS = SCRAPER.histogram("betclic_db_write_seconds", "Durée des écritures en base", ("operation",))
+CACHE_REQUESTS = SCRAPER.counter(
+    "betclic_cache_requests_total", "Consultations des caches du scraper", ("cache", "result")
+)
+CYCLE_SECONDS = SCRAPER.histogram(
+    "betclic_cycle_seconds", "Durée des cycles de scraping", ("status",),
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+)
+LAST_CYCLE = SCRAPER.gauge("betclic_last_cycle_timestamp_seconds", "Fin du dernier cycle (epoch)", ("status",))
+TIP_EVENTS = SCRAPER.counter("betclic_tip_events_total", "Tips ajoutés / retirés entre deux snapshots", ("kind",))
+DIGEST_MESSAGES = SCRAPER.counter("betclic_digest_messages_total", "Emails de digest par résultat", ("result",))
+
+WEB = Registry()
+API_CACHE_REQUESTS = WEB.counter("betclic_api_cache_requests_total", "Consultations du cache de l'API", ("result",))
+SNAPSHOT_RESPONSES = WEB.counter(
+    "betclic_snapshot_responses_total", "Réponses du snapshot publié", ("kind", "status")
+)
+SSE_CLIENTS = WEB.gauge("betclic_sse_clients", "Flux /events ouverts")
+SSE_REJECTED = WEB.counter("betclic_sse_rejected_total", "Flux /events refusés (SSE_MAX_STREAMS atteint)")
+
+# Dernière écriture du fichier WEB de ce processus (time.monotonic)
+_web_written = 0.0
+
+
+def web_textfile(directory: str) -> str:
+    """Fichier des métriques WEB du processus courant"""
+    return os.path.join(directory, f"{os.getpid()}.prom")
+
+
+def write_web_textfile(directory: str, interval: float = 0):
+    """Écrit les métriques WEB du processus si la dernière écriture date de plus de `interval` secondes"""
+    global _web_written
+    now = time.monotonic()
+    if now - _web_written >= interval:
+        _web_written = now
+        WEB.write_textfile(web_textfile(directory))
+
+
+def reset_web_textfiles(directory: str):
+    """Efface les fichiers WEB d'un lancement précédent (au démarrage du serveur, avant les workers)"""
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith(".prom"):
+                os.unlink(os.path.join(directory, name))
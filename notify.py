@@ -0,0 +1,329 @@
+"""Notifications des tips des tipsters qualifiés
+
+- Diff : à chaque cycle, save_cycle compare dans sa transaction le nouveau snapshot (tips de "Tomorrow Tips"
+  et matchs à venir des tipsters qualifiés) au précédent et enregistre un événement par tip ajouté ou retiré
+  dans `tip_events`. L'id des événements est croissant : c'est le curseur des clients (Last-Event-ID).
+  Un tip n'est « ajouté » qu'à sa première apparition (registre `seen_tips`, conservé entre les cycles) et
+  s'il reste à jouer ; un tipster absent du cycle parce que son profil n'a pas pu être récupéré ne produit
+  pas de « retiré ».
+- Flux SSE : `EventFeed` surveille la table depuis un seul thread par processus web et réveille les flux
+  /events en attente ; chaque flux ne relit que les événements postérieurs à son curseur.
+- Emails : `send_digest` regroupe les tips ajoutés depuis le dernier envoi en un email par destinataire,
+  envoyés par `DigestMailer` sur une connexion SMTP conservée entre les envois.
+"""
+import datetime
+import json
+import logging
+import smtplib
+import sqlite3
+import threading
+import time
+from contextlib import AbstractContextManager
+from email.message import EmailMessage
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from stats import parse_score
+
+logger = logging.getLogger(__name__)
+
+# Source de l'événement -> table du snapshot
+SOURCES = {"tomorrow": "tips", "profile": "matches"}
+EVENT_COLUMNS = ("tipster_name", "day", "time", "bookmaker", "match", "tip", "odds", "odds_value")
+# Identité d'un tip d'un snapshot à l'autre (la cote peut bouger sans que le tip soit nouveau)
+KEY_COLUMNS = ("tipster_name", "day", "time", "match", "tip")
+# Ligne de digest_state marquant le premier snapshot (référence, sans événements)
+BASELINE = "baseline"
+
+ConnectionFactory = Callable[[], AbstractContextManager]
+TipKey = Tuple[str, Tuple]
+
+
+class SnapshotTip(NamedTuple):
+    values: Tuple  # valeurs de EVENT_COLUMNS
+    live: bool     # tip encore à jouer
+
+
+def create_schema(conn: sqlite3.Connection):
+    """Crée la table des événements et l'état des digests"""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS tip_events (
+            id INTEGER PRIMARY KEY,
+            created_at REAL NOT NULL,
+            kind TEXT NOT NULL,
+            source TEXT NOT NULL,
+            {", ".join(f"{column} REAL" if column == "odds_value" else f"{column} TEXT" for column in EVENT_COLUMNS)}
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tip_events_created ON tip_events(created_at)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS seen_tips (
+            key TEXT PRIMARY KEY,
+            last_seen REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS digest_state (
+            name TEXT PRIMARY KEY,
+            last_event_id INTEGER NOT NULL,
+            sent_at REAL
+        )
+    ''')
+
+
+def is_live(score: Optional[str], kickoff: Optional[str], now: str) -> bool:
+    """Tip encore à jouer : pas de score et coup d'envoi (ISO) inconnu ou à venir"""
+    return parse_score(score) is None and (kickoff is None or kickoff >= now)
+
+
+def snapshot_tips(conn: sqlite3.Connection) -> Dict[TipKey, SnapshotTip]:
+    """Tips du snapshot enregistré : {(source, clé): SnapshotTip}"""
+    now = datetime.datetime.now().isoformat()
+    tips = {}
+    for source, table in SOURCES.items():
+        for row in conn.execute(f'SELECT {", ".join(EVENT_COLUMNS)}, score, kickoff FROM {table}'):
+            tips[(source, tuple(row[column] for column in KEY_COLUMNS))] = SnapshotTip(
+                tuple(row[column] for column in EVENT_COLUMNS), is_live(row["score"], row["kickoff"], now)
+            )
+    return tips
+
+
+def record_diff(conn: sqlite3.Connection, before: Dict[TipKey, SnapshotTip], after: Dict[TipKey, SnapshotTip],
+                retention_days: float, unavailable: Iterable[str] = ()) -> Dict[str, int]:
+    """Enregistre les tips ajoutés et retirés entre deux snapshots (dans la transaction de save_cycle).
+
+    - ajouté : tip à jouer jamais vu (registre seen_tips) ; un tip retiré puis revenu n'est pas annoncé à nouveau,
+      un tip déjà réglé (score connu, match commencé) jamais ;
+    - retiré : tip à jouer qui disparaît du snapshot, sauf pour les tipsters de `unavailable` (profil non récupéré).
+
+    Le premier snapshot d'une base sert de référence et ne produit pas d'événements : tout serait « nouveau ».
+    """
+    now = time.time()
+    cutoff = now - retention_days * 86400
+    conn.execute('DELETE FROM tip_events WHERE created_at < ?', (cutoff,))
+    conn.execute('DELETE FROM seen_tips WHERE last_seen < ?', (cutoff,))
+    seen = {row[0] for row in conn.execute('SELECT key FROM seen_tips')}
+    keys = {key: json.dumps(key, ensure_ascii=False) for key in after}
+    conn.executemany(
+        'INSERT INTO seen_tips (key, last_seen) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET last_seen = excluded.last_seen',
+        [(text, now) for text in keys.values()]
+    )
+    if conn.execute('SELECT 1 FROM digest_state WHERE name = ?', (BASELINE,)).fetchone() is None:
+        conn.execute('INSERT INTO digest_state (name, last_event_id, sent_at) VALUES (?, 0, ?)', (BASELINE, now))
+        return {"added": 0, "removed": 0}
+
+    unavailable = set(unavailable)
+    events = (
+        [(now, "added", key[0], *tip.values) for key, tip in after.items() if tip.live and keys[key] not in seen]
+        + [
+            (now, "removed", key[0], *tip.values) for key, tip in before.items()
+            if tip.live and key not in after and key[1][0] not in unavailable
+        ]
+    )
+    # Ordre stable pour les clients : par type, source, jour et heure du match puis tipster
+    events.sort(key=lambda event: (event[1], event[2], event[4] or "", event[5] or "", event[3]))
+    conn.executemany(
+        f'INSERT INTO tip_events (created_at, kind, source, {", ".join(EVENT_COLUMNS)}) '
+        f'VALUES ({", ".join("?" * (len(EVENT_COLUMNS) + 3))})',
+        events
+    )
+    return {kind: sum(1 for event in events if event[1] == kind) for kind in ("added", "removed")}
+
+
+def _event(row: sqlite3.Row) -> Dict:
+    return {key: row[key] for key in row.keys()}
+
+
+def latest_event_id(conn: sqlite3.Connection) -> int:
+    return conn.execute('SELECT IFNULL(MAX(id), 0) FROM tip_events').fetchone()[0]
+
+
+def events_since(conn: sqlite3.Connection, after_id: int, limit: Optional[int] = 500,
+                 kind: Optional[str] = None) -> List[Dict]:
+    """Événements d'id > after_id, du plus ancien au plus récent (tous si limit est None)"""
+    query = 'SELECT * FROM tip_events WHERE id > ?' + (' AND kind = ?' if kind else '') + ' ORDER BY id LIMIT ?'
+    params = (after_id,) + ((kind,) if kind else ()) + (-1 if limit is None else limit,)
+    return [_event(row) for row in conn.execute(query, params)]
+
+
+def format_sse(event: Dict) -> str:
+    """Message Server-Sent Events (id = curseur de reprise, type = kind)"""
+    return f"id: {event['id']}\nevent: {event['kind']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+class EventFeed:
+    """Surveille tip_events pour les flux SSE d'un processus : un thread interroge MAX(id) toutes les `poll`
+    secondes et réveille les flux en attente, qui relisent alors leurs événements."""
+    def __init__(self, connect: ConnectionFactory, poll: float = 2.0):
+        self.connect = connect
+        self.poll = poll
+        self._condition = threading.Condition()
+        self._latest: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+
+    def _refresh(self):
+        with self.connect() as conn:
+            latest = latest_event_id(conn)
+        with self._condition:
+            if latest != self._latest:
+                self._latest = latest
+                self._condition.notify_all()
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        # Première lecture dans le thread appelant : une base absente remonte à la requête
+        self._refresh()
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="event-feed", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._closed.wait(self.poll):
+            try:
+                self._refresh()
+            except sqlite3.Error as e:
+                logger.error(f"Erreur de lecture des événements : {e}")
+
+    def close(self):
+        """Arrête le thread de surveillance (la base n'est plus lue)"""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def latest_id(self) -> int:
+        self._start()
+        return self._latest
+
+    def wait(self, after_id: int, timeout: float) -> List[Dict]:
+        """Événements d'id > after_id ; attend au plus `timeout` secondes s'il n'y en a pas encore"""
+        self._start()
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._latest > after_id, timeout):
+                return []
+        with self.connect() as conn:
+            return events_since(conn, after_id)
+
+
+class DigestMailer:
+    """Envoi SMTP sur une connexion conservée entre les envois.
+
+    La connexion est vérifiée (NOOP) avant d'être réutilisée, rouverte si le serveur l'a fermée, et remplacée
+    si elle est restée plus de `idle_timeout` secondes sans envoi.
+    """
+    def __init__(self, host: str, port: int, user: Optional[str], password: Optional[str], use_ssl: bool = True,
+                 timeout: float = 30, idle_timeout: float = 300):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.connections = 0
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _open(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            smtp.ehlo()
+            if smtp.has_extn("starttls"):
+                smtp.starttls()
+                smtp.ehlo()
+        if self.user and self.password:
+            smtp.login(self.user, self.password)
+        self.connections += 1
+        return smtp
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._smtp is not None:
+            if time.monotonic() - self._last_used < self.idle_timeout:
+                try:
+                    if self._smtp.noop()[0] == 250:
+                        return self._smtp
+                except (smtplib.SMTPException, OSError):
+                    pass
+            self._discard()
+        self._smtp = self._open()
+        return self._smtp
+
+    def _discard(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def send(self, messages: Iterable[EmailMessage]) -> int:
+        """Envoie les messages sur la connexion partagée (une reconnexion si le serveur l'a coupée)"""
+        sent = 0
+        with self._lock:
+            for message in messages:
+                try:
+                    self._connection().send_message(message)
+                except smtplib.SMTPServerDisconnected:
+                    self._smtp = None
+                    self._connection().send_message(message)
+                self._last_used = time.monotonic()
+                sent += 1
+        return sent
+
+    def close(self):
+        with self._lock:
+            self._discard()
+
+
+def build_digest(events: List[Dict], sender: str, recipient: str, omitted: int = 0) -> EmailMessage:
+    """Email de synthèse des tips ajoutés (`omitted` : tips au-delà de la limite, seulement comptés)"""
+    message = EmailMessage()
+    message["Subject"] = f"{len(events)} nouveau{'x' if len(events) > 1 else ''} tip{'s' if len(events) > 1 else ''} de tipsters qualifiés"
+    message["From"] = sender
+    message["To"] = recipient
+    lines = [
+        f"- {event['day'] or ''} {event['time'] or ''} {event['tipster_name']} : {event['match']} - "
+        f"Tip {event['tip']} @ {event['odds']} ({event['bookmaker']})"
+        + (" [Tomorrow Tips]" if event["source"] == "tomorrow" else "")
+        for event in events
+    ]
+    if omitted:
+        lines.append(f"... et {omitted} autre{'s' if omitted > 1 else ''}")
+    message.set_content("Nouveaux tips depuis le dernier envoi :\n\n" + "\n".join(lines) + "\n")
+    return message
+
+
+def send_digest(connect: ConnectionFactory, mailer: DigestMailer, sender: str, recipients: List[str],
+                min_interval: float = 0, min_odds: float = 0, max_tips: int = 200, name: str = "email") -> int:
+    """Envoie les tips ajoutés depuis le dernier digest (cote >= min_odds) ; renvoie le nombre de tips envoyés.
+
+    Le curseur n'avance qu'après un envoi réussi : en cas d'échec, les tips repartent au digest suivant.
+    Entre deux envois espacés de moins de `min_interval` secondes, les événements s'accumulent.
+    """
+    now = time.time()
+    with connect() as conn:
+        state = conn.execute('SELECT last_event_id, sent_at FROM digest_state WHERE name = ?', (name,)).fetchone()
+        last_event_id = state["last_event_id"] if state else 0
+        if state is not None and state["sent_at"] is not None and now - state["sent_at"] < min_interval:
+            return 0
+        latest = latest_event_id(conn)
+        events = [
+            event for event in events_since(conn, last_event_id, limit=None, kind="added")
+            if event["id"] <= latest and (not min_odds or (event["odds_value"] or 0) >= min_odds)
+        ]
+    tips, omitted = events[:max_tips], max(len(events) - max_tips, 0)
+    if tips:
+        mailer.send(build_digest(tips, sender, recipient, omitted) for recipient in recipients)
+        logger.info(f"Digest envoyé : {len(events)} tips, {len(recipients)} destinataires")
+    with connect() as conn:
+        conn.execute('''
+            INSERT INTO digest_state (name, last_event_id, sent_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET last_event_id = excluded.last_event_id,
+            sent_at = COALESCE(excluded.sent_at, digest_state.sent_at)
+        ''', (name, latest, now if tips else None))
+    return len(events) if tips else 0
@@ -0,0 +1,243 @@
+"""Backends de parsing des pages typersi.com
+
+Chaque backend expose les mêmes méthodes et renvoie des résultats identiques champ pour champ
+(lignes de tips en enregistrements records.Match / records.Tip) :
+- SoupParser : BeautifulSoup + sélecteurs CSS (implémentation historique)
+- LxmlParser : lxml brut + XPath, sans construire d'arbre BeautifulSoup (plus rapide)
+"""
+import hashlib
+import logging
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+import lxml.etree
+import lxml.html
+from bs4 import BeautifulSoup, UnicodeDammit
+
+from metrics import sampled
+from records import Match, Tip, plain
+
+logger = logging.getLogger(__name__)
+
+Html = Union[bytes, str]
+
+
+def parse_win_rate(text: Optional[str]) -> Optional[float]:
+    """Convertit le texte du win rate ("78%") en float, None si absent ou invalide"""
+    if text is None:
+        logger.warning("Element win rate non trouvé sur la page de profil")
+        return None
+    win_rate_str_raw = text.strip() # Capture la valeur brute
+    win_rate_str = win_rate_str_raw.replace('%', '')
+    try:
+        win_rate = float(win_rate_str)
+        # Log par profil : DEBUG et échantillonné (coût du logging sur le chemin chaud)
+        if logger.isEnabledFor(logging.DEBUG) and sampled():
+            logger.debug(f"Win rate : texte brut {win_rate_str_raw!r} -> {win_rate}")
+        return win_rate
+    except ValueError as e:
+        logger.warning(f"Erreur de conversion Win rate en float : {win_rate_str} - Erreur: {e}") # LOG : Erreur détaillée
+        return None
+
+
+def row_fingerprint(cells: List[str]) -> str:
+    """Empreinte d'une ligne de listing (nom, compteurs, tips visibles) pour la détection de changements"""
+    return hashlib.sha1("\x1f".join(cells).encode("utf-8")).hexdigest()[:16]
+
+
+def profile_match(match_data: List[str]) -> Match:
+    """Ligne du tableau de tips d'une page de profil"""
+    return Match.create(*match_data[1:9])
+
+
+def tomorrow_tip(match_data: List[str]) -> Tip:
+    """Ligne des tables de la page "Tomorrow Tips" (colonne Stake ignorée)"""
+    return Tip.create(*match_data[1:6], match_data[7], match_data[8])
+
+
+class SoupParser:
+    """Backend BeautifulSoup : arbre complet et sélecteurs CSS"""
+    name = "bs4"
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+
+    def parse_tipster_links(self, html_content: Html) -> List[Dict]:
+        """Tipsters et URLs de profil (pages Remainder et Tomorrow Tips)"""
+        return self._tipster_links(BeautifulSoup(html_content, 'lxml'))
+
+    def parse_profile(self, html_content: Html) -> Dict:
+        """Win rate et matchs à venir d'une page de profil"""
+        soup = BeautifulSoup(html_content, 'lxml')
+        effectiveness_element = soup.select_one('div.stat div.progressC span')
+        win_rate = parse_win_rate(effectiveness_element.text if effectiveness_element else None)
+
+        upcoming_matches = []
+        tips_table = soup.select_one('h2.typ.fw-bold + div.table-responsive table')
+        if tips_table:
+            for row in tips_table.select('tbody tr'):
+                match_data = [cell.text.strip() for cell in row.select('td')]
+                if len(match_data) >= 9:
+                    upcoming_matches.append(profile_match(match_data))
+
+        return {
+            "win_rate": win_rate,
+            "upcoming_matches": upcoming_matches
+        }
+
+    def parse_tomorrow_tips(self, html_content: Html) -> List[Tip]:
+        """Tips de la page "Tomorrow Tips" """
+        return self._tomorrow_tips(BeautifulSoup(html_content, 'lxml'))
+
+    def parse_tomorrow_page(self, html_content: Html) -> Dict:
+        """Tipsters et tips de la page "Tomorrow Tips" depuis un seul arbre"""
+        soup = BeautifulSoup(html_content, 'lxml')
+        return {"tipsters": self._tipster_links(soup), "tips": self._tomorrow_tips(soup)}
+
+    def _tipster_links(self, soup: BeautifulSoup) -> List[Dict]:
+        tipsters_data = []
+        for element in soup.select('td.fw-bold'):
+            name_element = element.find('a', class_='link-underline-warning')
+            if name_element:
+                row = element.find_parent('tr')
+                cells = [cell.text.strip() for cell in row.find_all('td')] if row else [element.text.strip()]
+                tipsters_data.append({
+                    "name": name_element.text.strip(),
+                    "profile_url": self.base_url + name_element['href'],
+                    "fingerprint": row_fingerprint(cells)
+                })
+        return tipsters_data
+
+    def _tomorrow_tips(self, soup: BeautifulSoup) -> List[Tip]:
+        tomorrow_tips = []
+        # Toutes les tables après un h2.typ.fw-bold (les deux sections)
+        for table in soup.select('h2.typ.fw-bold + div.table-responsive table'):
+            for row in table.select('tbody tr'):
+                match_data = [cell.text.strip() for cell in row.select('td')]
+                if len(match_data) >= 9:
+                    tomorrow_tips.append(tomorrow_tip(match_data))
+        return tomorrow_tips
+
+
+def _has_class(name: str) -> str:
+    """Prédicat XPath équivalent au sélecteur CSS `.name`"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Équivalents XPath des sélecteurs CSS de SoupParser
+XPATH_TIPSTER_CELLS = f"//td[{_has_class('fw-bold')}]"
+XPATH_TIPSTER_LINK = f".//a[{_has_class('link-underline-warning')}]"
+XPATH_WIN_RATE = f"//div[{_has_class('stat')}]//div[{_has_class('progressC')}]//span"
+XPATH_TIPS_TABLES = (
+    f"//h2[{_has_class('typ')} and {_has_class('fw-bold')}]"
+    f"/following-sibling::*[1][self::div and {_has_class('table-responsive')}]//table"
+)
+
+
+class LxmlParser:
+    """Backend lxml brut : XPath directement sur l'arbre libxml2, sans objets BeautifulSoup"""
+    name = "lxml"
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+
+    @staticmethod
+    def _tree(html_content: Html):
+        # Même détection d'encodage que BeautifulSoup (libxml2 supposerait du latin-1 sans <meta charset>)
+        if isinstance(html_content, bytes):
+            try:
+                html_content = html_content.decode('utf-8')
+            except UnicodeDecodeError:
+                html_content = UnicodeDammit(html_content).unicode_markup
+        try:
+            return lxml.html.document_fromstring(html_content)
+        except lxml.etree.ParserError:
+            # Page vide ou sans élément (commentaires seuls) : document vide, comme BeautifulSoup
+            return lxml.html.document_fromstring("<html></html>")
+
+    @staticmethod
+    def _rows(table) -> List[List[str]]:
+        return [
+            [cell.text_content().strip() for cell in row.iterfind('.//td')]
+            for row in table.xpath('.//tbody//tr')
+        ]
+
+    def parse_tipster_links(self, html_content: Html) -> List[Dict]:
+        """Tipsters et URLs de profil (pages Remainder et Tomorrow Tips)"""
+        return self._tipster_links(self._tree(html_content))
+
+    def parse_profile(self, html_content: Html) -> Dict:
+        """Win rate et matchs à venir d'une page de profil"""
+        tree = self._tree(html_content)
+        effectiveness_elements = tree.xpath(XPATH_WIN_RATE)
+        win_rate = parse_win_rate(effectiveness_elements[0].text_content() if effectiveness_elements else None)
+
+        upcoming_matches = []
+        tips_tables = tree.xpath(XPATH_TIPS_TABLES)
+        if tips_tables:
+            for match_data in self._rows(tips_tables[0]):
+                if len(match_data) >= 9:
+                    upcoming_matches.append(profile_match(match_data))
+
+        return {
+            "win_rate": win_rate,
+            "upcoming_matches": upcoming_matches
+        }
+
+    def parse_tomorrow_tips(self, html_content: Html) -> List[Tip]:
+        """Tips de la page "Tomorrow Tips" """
+        return self._tomorrow_tips(self._tree(html_content))
+
+    def parse_tomorrow_page(self, html_content: Html) -> Dict:
+        """Tipsters et tips de la page "Tomorrow Tips" depuis un seul arbre"""
+        tree = self._tree(html_content)
+        return {"tipsters": self._tipster_links(tree), "tips": self._tomorrow_tips(tree)}
+
+    def _tipster_links(self, tree) -> List[Dict]:
+        tipsters_data = []
+        for element in tree.xpath(XPATH_TIPSTER_CELLS):
+            name_elements = element.xpath(XPATH_TIPSTER_LINK)
+            if name_elements:
+                row = next(element.iterancestors('tr'), None)
+                cells = (
+                    [cell.text_content().strip() for cell in row.iterfind('.//td')]
+                    if row is not None else [element.text_content().strip()]
+                )
+                tipsters_data.append({
+                    "name": name_elements[0].text_content().strip(),
+                    "profile_url": self.base_url + name_elements[0].attrib['href'],
+                    "fingerprint": row_fingerprint(cells)
+                })
+        return tipsters_data
+
+    def _tomorrow_tips(self, tree) -> List[Tip]:
+        tomorrow_tips = []
+        for table in tree.xpath(XPATH_TIPS_TABLES):
+            for match_data in self._rows(table):
+                if len(match_data) >= 9:
+                    tomorrow_tips.append(tomorrow_tip(match_data))
+        return tomorrow_tips
+
+
+PARSER_BACKENDS = {
+    SoupParser.name: SoupParser,
+    LxmlParser.name: LxmlParser,
+}
+
+# Parser propre à chaque processus du pool de parsing (voir TipsterScraper, mode pipeline)
+_worker_parser = None
+
+
+def init_parse_worker(backend: str, base_url: str):
+    """Initialiseur des processus de parsing : instancie le backend une fois par processus"""
+    global _worker_parser
+    _worker_parser = PARSER_BACKENDS[backend](base_url)
+
+
+def parse_profile_in_worker(html_content: bytes) -> Tuple[Dict, float]:
+    """Parse une page de profil dans un processus du pool ; renvoie (profil sous forme JSON, durée du parsing
+    en secondes). Le processus principal reconstruit les enregistrements (records.revive) pour que leurs
+    chaînes soient internées chez lui."""
+    start = time.perf_counter()
+    profile = plain(_worker_parser.parse_profile(html_content))
+    return profile, time.perf_counter() - start
@@ -0,0 +1,211 @@
+"""Enregistrements compacts des matchs (pages de profil) et des tips (page "Tomorrow Tips")
+
+Chaque ligne est un NamedTuple au lieu d'un dict de chaînes :
+- les champs texte gardent la valeur de la page (affichage, base, empreintes) mais sont internés : un
+  bookmaker, un nom de tipster, un marché ou une heure n'existent qu'une fois en mémoire ;
+- les valeurs numériques sont parsées une seule fois, à la construction : cote et mise (float) et
+  date/heure du match (datetime). Les objets parsés sont eux aussi partagés (cache), les cotes et les
+  horaires se répétant d'une ligne à l'autre.
+
+`TipColumns` range un grand nombre de tips en colonnes (listes de chaînes internées, cotes dans un
+`array('d')`) pour filtrer et trier sans recréer un objet par ligne.
+
+La forme JSON (caches HTTP, listings, profils enregistrés) reste celle des dicts de chaînes :
+`plain` convertit vers cette forme, `revive` reconstruit les enregistrements.
+"""
+import datetime
+import math
+import sys
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+# Colonnes texte, dans l'ordre des tables matches / tips
+MATCH_FIELDS = ("day", "time", "bookmaker", "match", "tip", "stake", "odds", "score")
+TIP_FIELDS = ("tipster_name", "time", "bookmaker", "match", "tip", "odds", "score")
+
+DAY_FORMATS = ("%d.%m.%Y", "%d-%m-%Y", "%d/%m/%Y")
+
+
+def intern_text(value: Optional[str]) -> str:
+    """Chaîne partagée (sys.intern) pour les valeurs répétées"""
+    return sys.intern(value or "")
+
+
+@lru_cache(maxsize=4096)
+def parse_odds(text: str) -> Optional[float]:
+    """"1,85" -> 1.85 ; None si la cote n'est pas numérique"""
+    try:
+        value = float(text.replace(",", "."))
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+@lru_cache(maxsize=256)
+def parse_stake(text: str) -> Optional[float]:
+    """Mise en unités ("4" -> 4.0, "2,5" -> 2.5, sans arrondi), None si absente ou invalide"""
+    return parse_odds(text)
+
+
+@lru_cache(maxsize=1024)
+def parse_date(text: str) -> Optional[datetime.date]:
+    """Date ISO (ou jj.mm.aaaa / jj-mm-aaaa / jj/mm/aaaa), None si illisible"""
+    text = text.strip()
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in DAY_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=8192)
+def parse_kickoff(day: str, time: str) -> Optional[datetime.datetime]:
+    """Date et heure du match (minuit si l'heure est illisible), None sans date lisible"""
+    date = parse_date(day)
+    if date is None:
+        return None
+    try:
+        hour, minute = time.strip().split(":")[:2]
+        clock = datetime.time(int(hour), int(minute))
+    except ValueError:
+        clock = datetime.time()
+    return datetime.datetime.combine(date, clock)
+
+
+class Match(NamedTuple):
+    """Match à venir d'une page de profil"""
+    day: str
+    time: str
+    bookmaker: str
+    match: str
+    tip: str
+    stake: str
+    odds: str
+    score: str
+    kickoff: Optional[datetime.datetime]
+    stake_value: Optional[float]
+    odds_value: Optional[float]
+
+    @classmethod
+    def create(cls, day: str, time: str, bookmaker: str, match: str, tip: str, stake: str, odds: str,
+               score: str) -> "Match":
+        day, time, stake, odds = intern_text(day), intern_text(time), intern_text(stake), intern_text(odds)
+        return cls(day, time, intern_text(bookmaker), intern_text(match), intern_text(tip), stake, odds,
+                   intern_text(score), parse_kickoff(day, time), parse_stake(stake), parse_odds(odds))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, str]) -> "Match":
+        return cls.create(*(data.get(field) or "" for field in MATCH_FIELDS))
+
+    def raw(self) -> Tuple[str, ...]:
+        """Valeurs texte, dans l'ordre de MATCH_FIELDS"""
+        return self[:len(MATCH_FIELDS)]
+
+    def to_dict(self) -> Dict[str, str]:
+        return dict(zip(MATCH_FIELDS, self.raw()))
+
+
+class Tip(NamedTuple):
+    """Tip de la page "Tomorrow Tips" """
+    tipster_name: str
+    time: str
+    bookmaker: str
+    match: str
+    tip: str
+    odds: str
+    score: str
+    odds_value: Optional[float]
+
+    @classmethod
+    def create(cls, tipster_name: str, time: str, bookmaker: str, match: str, tip: str, odds: str,
+               score: str) -> "Tip":
+        odds = intern_text(odds)
+        return cls(intern_text(tipster_name), intern_text(time), intern_text(bookmaker), intern_text(match),
+                   intern_text(tip), odds, intern_text(score), parse_odds(odds))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, str]) -> "Tip":
+        return cls.create(*(data.get(field) or "" for field in TIP_FIELDS))
+
+    def raw(self) -> Tuple[str, ...]:
+        """Valeurs texte, dans l'ordre de TIP_FIELDS"""
+        return self[:len(TIP_FIELDS)]
+
+    def to_dict(self) -> Dict[str, str]:
+        return dict(zip(TIP_FIELDS, self.raw()))
+
+
+class TipColumns:
+    """Tips rangés en colonnes : une liste de chaînes internées par champ texte, les cotes dans un array('d')
+    (NaN si absente). `where_tipster` travaille sur les colonnes puis ne recopie que des références."""
+    def __init__(self, tips: Iterable[Tip] = ()):
+        self.columns: Dict[str, List[str]] = {field: [] for field in TIP_FIELDS}
+        self.odds_values = array("d")
+        self.extend(tips)
+
+    def append(self, tip: Tip):
+        for column, value in zip(self.columns.values(), tip.raw()):
+            column.append(value)
+        self.odds_values.append(math.nan if tip.odds_value is None else tip.odds_value)
+
+    def extend(self, tips: Iterable[Tip]):
+        for tip in tips:
+            self.append(tip)
+
+    def __len__(self) -> int:
+        return len(self.odds_values)
+
+    def __getitem__(self, index: int) -> Tip:
+        odds_value = self.odds_values[index]
+        return Tip(*(column[index] for column in self.columns.values()), None if math.isnan(odds_value) else odds_value)
+
+    def __iter__(self) -> Iterator[Tip]:
+        return (self[index] for index in range(len(self)))
+
+    def _take(self, indexes: Sequence[int]) -> "TipColumns":
+        result = TipColumns()
+        for field, column in self.columns.items():
+            result.columns[field] = [column[index] for index in indexes]
+        result.odds_values = array("d", (self.odds_values[index] for index in indexes))
+        return result
+
+    def where_tipster(self, names: Set[str]) -> "TipColumns":
+        """Tips des tipsters de `names`, dans l'ordre d'origine"""
+        return self._take([index for index, name in enumerate(self.columns["tipster_name"]) if name in names])
+
+    def rows(self) -> Iterator[Tuple]:
+        """Lignes (valeurs texte..., cote numérique) pour executemany"""
+        for index, row in enumerate(zip(*self.columns.values())):
+            odds_value = self.odds_values[index]
+            yield (*row, None if math.isnan(odds_value) else odds_value)
+
+
+def plain(parsed: Any) -> Any:
+    """Forme JSON d'un résultat parsé : enregistrements convertis en dicts de chaînes"""
+    if isinstance(parsed, (Match, Tip)):
+        return parsed.to_dict()
+    if isinstance(parsed, TipColumns):
+        return [tip.to_dict() for tip in parsed]
+    if isinstance(parsed, dict):
+        return {key: plain(value) for key, value in parsed.items()}
+    if isinstance(parsed, list):
+        return [plain(value) for value in parsed]
+    return parsed
+
+
+def revive(parsed: Any) -> Any:
+    """Inverse de `plain` pour les résultats des parsers : profil (upcoming_matches) ou page Tomorrow Tips (tips)"""
+    if isinstance(parsed, dict):
+        if parsed.get("upcoming_matches"):
+            parsed["upcoming_matches"] = [
+                match if isinstance(match, Match) else Match.from_dict(match) for match in parsed["upcoming_matches"]
+            ]
+        if parsed.get("tips"):
+            parsed["tips"] = [tip if isinstance(tip, Tip) else Tip.from_dict(tip) for tip in parsed["tips"]]
+    return parsed
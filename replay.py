@@ -0,0 +1,106 @@
+"""Enregistrement et rejeu des réponses HTTP du scraper
+
+`RecordReplayAdapter` se monte sur la session requests de TipsterScraper à la place de l'HTTPAdapter :
+- mode "record" : les requêtes partent normalement et chaque réponse est enregistrée dans le dossier ;
+- mode "replay" : aucune requête réseau, les réponses sont relues depuis le dossier (ConnectionError si
+  l'URL n'a pas été enregistrée), avec 304 si les en-têtes conditionnels correspondent à la réponse.
+
+Chaque réponse occupe deux fichiers nommés d'après le hash de l'URL : `<clé>.json` (URL, statut,
+en-têtes) et `<clé>.html` (corps, décodé de tout Content-Encoding), lisibles et réutilisables comme
+fixtures. Un cycle entier peut ainsi être rejoué hors-ligne, par exemple pour mesurer une modification
+de bet.py (voir `benchmark.py cycle --replay`).
+"""
+import hashlib
+import json
+import os
+import time
+from http.client import responses as HTTP_REASONS
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from snapshot import write_atomic
+
+MODES = ("record", "replay")
+
+# En-têtes qui ne décrivent plus le corps enregistré (décompressé, longueur recalculée)
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def fixture_key(url: str) -> str:
+    """Nom de base des fichiers d'une URL"""
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:20]
+
+
+def save_response(directory: str, url: str, status: int, headers: Dict[str, str], body: bytes):
+    """Enregistre une réponse (le corps d'abord, les métadonnées ensuite : une entrée lisible est complète)"""
+    key = fixture_key(url)
+    write_atomic(os.path.join(directory, f"{key}.html"), body)
+    meta = {
+        "url": url,
+        "status": status,
+        "headers": {name: value for name, value in headers.items() if name.lower() not in DROPPED_HEADERS},
+        "recorded_at": time.time(),
+    }
+    write_atomic(os.path.join(directory, f"{key}.json"), json.dumps(meta, indent=2, ensure_ascii=False).encode("utf-8"))
+
+
+def load_response(directory: str, url: str) -> Optional[Dict]:
+    """Réponse enregistrée pour `url` (métadonnées + "body"), None si absente"""
+    key = fixture_key(url)
+    try:
+        with open(os.path.join(directory, f"{key}.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, f"{key}.html"), "rb") as f:
+            meta["body"] = f.read()
+    except FileNotFoundError:
+        return None
+    return meta
+
+
+class RecordReplayAdapter(HTTPAdapter):
+    """Adaptateur de transport requests qui enregistre ou rejoue les réponses"""
+    def __init__(self, directory: str, mode: str, **kwargs):
+        if mode not in MODES:
+            raise ValueError(f"Mode d'enregistrement inconnu : {mode} (valeurs possibles : {', '.join(MODES)})")
+        super().__init__(**kwargs)
+        self.directory = directory
+        self.mode = mode
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        if self.mode == "replay":
+            return self._replay(request)
+        response = super().send(request, **kwargs)
+        # Un 304 ne contient pas de page : on garde la dernière réponse complète enregistrée
+        if response.status_code != 304:
+            save_response(self.directory, request.url, response.status_code, response.headers, response.content)
+        return response
+
+    def _replay(self, request: requests.PreparedRequest) -> requests.Response:
+        recorded = load_response(self.directory, request.url)
+        if recorded is None:
+            raise requests.ConnectionError(f"Aucune réponse enregistrée pour {request.url}", request=request)
+
+        headers = CaseInsensitiveDict(recorded["headers"])
+        status, body = recorded["status"], recorded["body"]
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        if status == 200 and (
+            (etag is not None and request.headers.get("If-None-Match") == etag)
+            or (last_modified is not None and request.headers.get("If-Modified-Since") == last_modified)
+        ):
+            status, body = 304, b""
+        headers["Content-Length"] = str(len(body))
+
+        response = requests.Response()
+        response.status_code = status
+        response.reason = HTTP_REASONS.get(status, "")
+        response.headers = headers
+        response._content = body
+        response.encoding = requests.utils.get_encoding_from_headers(headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
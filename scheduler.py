@@ -0,0 +1,203 @@
+"""Planification des cycles de scraping
+
+- Bail (lease) SQLite : un seul processus exécute un cycle à la fois, même avec plusieurs workers ou
+  machines sur la même base. Le bail expire de lui-même si son détenteur meurt, et il est renouvelé
+  en arrière-plan pendant les cycles longs.
+- Cadence par type de page (la page "Tomorrow Tips" plus souvent que Remainder), avec jitter.
+- Nouvel essai avec backoff exponentiel après un échec partiel, au lieu d'attendre la cadence normale.
+- Métriques de chaque exécution enregistrées dans la table `runs`.
+"""
+import logging
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import AbstractContextManager
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Colonnes de métriques de la table runs, renseignées par la tâche
+RUN_METRICS = ("listings_failed", "profiles_fetched", "profiles_reused", "profiles_failed", "qualified", "tips")
+
+ConnectionFactory = Callable[[], AbstractContextManager]
+
+
+def create_schema(conn: sqlite3.Connection):
+    """Crée les tables du bail et de l'historique des exécutions"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            started_at REAL NOT NULL,
+            finished_at REAL,
+            duration REAL,
+            owner TEXT,
+            pages TEXT NOT NULL,
+            attempt INTEGER NOT NULL DEFAULT 1,
+            status TEXT NOT NULL,
+            {", ".join(f"{column} INTEGER" for column in RUN_METRICS)},
+            error TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started_at)')
+
+
+def record_run(conn: sqlite3.Connection, run: Dict):
+    """Enregistre une exécution (colonnes absentes de `run` laissées à NULL)"""
+    columns = ("started_at", "finished_at", "duration", "owner", "pages", "attempt", "status") + RUN_METRICS + ("error",)
+    conn.execute(
+        f'INSERT INTO runs ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+        [run.get(column) for column in columns]
+    )
+
+
+class Lease:
+    """Bail exclusif nommé dans SQLite, avec expiration et renouvellement en arrière-plan"""
+    def __init__(self, connect: ConnectionFactory, name: str, ttl: float, owner: Optional[str] = None):
+        self.connect = connect
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def acquire(self) -> bool:
+        """Prend (ou prolonge) le bail s'il est libre, expiré ou déjà détenu ; False sinon"""
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.execute('''
+                INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE leases.expires_at < ? OR leases.owner = excluded.owner
+            ''', (self.name, self.owner, now + self.ttl, now))
+            return cursor.rowcount == 1
+
+    def release(self):
+        """Libère le bail s'il est toujours détenu"""
+        with self.connect() as conn:
+            conn.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (self.name, self.owner))
+
+    def __enter__(self) -> "Lease":
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._renew, name=f"lease-{self.name}", daemon=True)
+        self._heartbeat.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._heartbeat.join()
+        try:
+            self.release()
+        except sqlite3.Error as e:
+            # Le bail expirera de lui-même après ttl secondes
+            logger.error(f"Erreur de libération du bail {self.name} : {e}")
+
+    def _renew(self):
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                if not self.acquire():
+                    logger.error(f"Bail {self.name} perdu au profit d'un autre processus")
+                    return
+            except sqlite3.Error as e:
+                logger.error(f"Erreur de renouvellement du bail {self.name} : {e}")
+
+
+class Scheduler:
+    """Exécute `job(pages)` selon la cadence de chaque type de page.
+
+    `job` renvoie les métriques du cycle (dict) dont `status` vaut "ok", "partial" ou "failed" ; un cycle
+    qui n'est pas "ok" est relancé après un backoff exponentiel (plafonné à la cadence) au lieu d'attendre
+    la cadence normale. Les pages dues au même moment sont traitées dans le même cycle.
+    """
+    def __init__(self, job: Callable[[List[str]], Dict], connect: ConnectionFactory, cadences: Dict[str, float],
+                 jitter: float = 0.1, retry_base: float = 300, lease_ttl: float = 900, lease_name: str = "scrape"):
+        self.job = job
+        self.connect = connect
+        self.cadences = dict(cadences)
+        self.jitter = jitter
+        self.retry_base = retry_base
+        self.lease = Lease(connect, lease_name, lease_ttl)
+        self._attempts = {page: 0 for page in self.cadences}
+        # Premier cycle immédiat pour toutes les pages
+        self._next_run = {page: time.monotonic() for page in self.cadences}
+
+    def _jittered(self, delay: float) -> float:
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def due_pages(self, now: Optional[float] = None) -> List[str]:
+        now = time.monotonic() if now is None else now
+        return [page for page, next_run in self._next_run.items() if next_run <= now]
+
+    def run_pending(self) -> Optional[Dict]:
+        """Exécute un cycle pour les pages dues ; renvoie l'exécution enregistrée (None si rien n'est dû)"""
+        pages = self.due_pages()
+        if not pages:
+            return None
+        attempt = max(self._attempts[page] for page in pages) + 1
+        run = {"started_at": time.time(), "owner": self.lease.owner, "pages": ",".join(pages), "attempt": attempt}
+        start = time.monotonic()
+
+        try:
+            acquired = self.lease.acquire()
+        except sqlite3.Error as e:
+            # Base verrouillée ou indisponible : échec du cycle, nouvel essai avec backoff
+            logger.error(f"Erreur de prise du bail {self.lease.name} : {e}")
+            run.update(status="failed", error=str(e))
+            self._reschedule(pages, run["status"])
+        else:
+            if not acquired:
+                # Un autre processus exécute un cycle : on repasse plus tard sans compter d'échec
+                run.update(status="locked")
+                for page in pages:
+                    self._next_run[page] = time.monotonic() + self._jittered(min(self.retry_base, self.cadences[page]))
+                logger.info(f"Cycle {run['pages']} ignoré : bail détenu par un autre processus")
+            else:
+                with self.lease:
+                    try:
+                        run.update(self.job(pages))
+                    except Exception as e:
+                        logger.error(f"Erreur dans le cycle {run['pages']} : {e}")
+                        run.update(status="failed", error=str(e))
+                self._reschedule(pages, run["status"])
+
+        run.update(finished_at=time.time(), duration=time.monotonic() - start)
+        try:
+            with self.connect() as conn:
+                record_run(conn, run)
+        except sqlite3.Error as e:
+            logger.error(f"Erreur d'enregistrement de l'exécution : {e}")
+        return run
+
+    def _reschedule(self, pages: Iterable[str], status: str):
+        now = time.monotonic()
+        for page in pages:
+            if status == "ok":
+                self._attempts[page] = 0
+                delay = self.cadences[page]
+            else:
+                self._attempts[page] += 1
+                delay = min(self.retry_base * 2 ** (self._attempts[page] - 1), self.cadences[page])
+                logger.warning(f"Cycle {page} en échec ({status}), nouvel essai n°{self._attempts[page]} dans {delay:.0f}s")
+            self._next_run[page] = now + self._jittered(delay)
+
+    def run_forever(self, poll: float = 60):
+        """Boucle principale : exécute les cycles dus puis dort jusqu'au prochain (au plus `poll` secondes)"""
+        while True:
+            try:
+                self.run_pending()
+            except Exception as e:
+                # Le thread du planificateur ne doit jamais s'arrêter : le cycle est retenté au prochain tour
+                logger.error(f"Erreur du planificateur : {e}")
+                logger.exception("Erreur détaillée du planificateur (avec traceback)")
+            wait = min(self._next_run.values()) - time.monotonic()
+            time.sleep(min(max(wait, 1.0), poll))
@@ -0,0 +1,176 @@
+"""Snapshot pré-calculé du tableau de bord
+
+À la fin de chaque cycle, le scraper publie le tableau de bord rendu (HTML) et ses données (JSON compact)
+dans SNAPSHOT_DIR, avec leurs variantes pré-compressées (gzip, brotli si le module est installé).
+La version du snapshot est le hash des données et du HTML rendu : un cycle qui ne change rien ne réécrit
+rien, une modification du template est republiée, et l'ETag (fort) de chaque variante dérive de cette version.
+
+Les fichiers d'une version portent la version dans leur nom ; le manifeste (`manifest.json`) est
+remplacé en dernier, par renommage atomique, pour que les lecteurs voient toujours une version complète.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli est optionnel : seules les variantes gzip sont alors publiées
+    brotli = None
+
+MANIFEST = "manifest.json"
+
+# Type de snapshot -> (extension, type MIME)
+SNAPSHOT_KINDS = {
+    "html": ("html", "text/html; charset=utf-8"),
+    "json": ("json", "application/json"),
+}
+
+# Encodages pré-calculés, par ordre de préférence
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class Variant(NamedTuple):
+    """Représentation d'un snapshot prête à servir"""
+    body: bytes
+    etag: str
+    encoding: Optional[str]
+    mimetype: str
+
+
+def data_version(data: Dict, html: str) -> str:
+    """Version du snapshot : hash stable de la sérialisation JSON des données et du HTML rendu"""
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    digest = hashlib.sha256(payload.encode("utf-8"))
+    digest.update(html.encode("utf-8"))
+    return digest.hexdigest()[:20]
+
+
+def write_atomic(path: str, content: bytes):
+    """Écrit dans un fichier temporaire du même dossier puis le renomme sur la cible (les lecteurs voient
+    l'ancien contenu ou le nouveau, jamais un fichier partiel)"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _compressed(content: bytes) -> Iterable[Tuple[str, bytes]]:
+    if brotli is not None:
+        yield ".br", brotli.compress(content, quality=11)
+    yield ".gz", gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def read_manifest(directory: str) -> Optional[Dict]:
+    """Manifeste du snapshot publié, None si aucun"""
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def publish(directory: str, data: Dict, html: str) -> Tuple[str, bool]:
+    """Publie le snapshot (données + HTML rendu) ; renvoie (version, publié) - rien n'est écrit si la version
+    est déjà en ligne"""
+    os.makedirs(directory, exist_ok=True)
+    version = data_version(data, html)
+    current = read_manifest(directory)
+    if current is not None and current["version"] == version and all(
+        os.path.exists(os.path.join(directory, entry["name"])) for entry in current["files"].values()
+    ):
+        return version, False
+
+    contents = {
+        "html": html.encode("utf-8"),
+        "json": json.dumps({"version": version, **data}, separators=(",", ":"), ensure_ascii=False).encode("utf-8"),
+    }
+    files = {}
+    for kind, content in contents.items():
+        name = f"dashboard.{version}.{SNAPSHOT_KINDS[kind][0]}"
+        write_atomic(os.path.join(directory, name), content)
+        encodings = []
+        for suffix, compressed in _compressed(content):
+            write_atomic(os.path.join(directory, name + suffix), compressed)
+            encodings.append(suffix)
+        files[kind] = {"name": name, "encodings": encodings}
+
+    manifest = {"version": version, "published_at": time.time(), "files": files}
+    write_atomic(os.path.join(directory, MANIFEST), json.dumps(manifest).encode("utf-8"))
+
+    # On garde la version précédente pour les requêtes en cours qui l'ont déjà sélectionnée
+    keep = {version} | ({current["version"]} if current else set())
+    for name in os.listdir(directory):
+        parts = name.split(".")
+        if parts[0] == "dashboard" and len(parts) > 2 and parts[1] not in keep:
+            os.unlink(os.path.join(directory, name))
+    return version, True
+
+
+class SnapshotStore:
+    """Lecture du snapshot publié côté Flask.
+
+    Le manifeste n'est relu que si son mtime change ; les corps sont gardés en mémoire pour la version
+    courante uniquement, si bien que le cache suit la version des données et non une durée.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._manifest_mtime: Optional[int] = None
+        self._manifest: Optional[Dict] = None
+        self._bodies: Dict[Tuple[str, str], bytes] = {}
+
+    def manifest(self) -> Optional[Dict]:
+        """Manifeste courant (None si aucun snapshot n'a encore été publié)"""
+        try:
+            mtime = os.stat(os.path.join(self.directory, MANIFEST)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                manifest = read_manifest(self.directory)
+                if manifest is None:
+                    return None
+                if self._manifest is None or manifest["version"] != self._manifest["version"]:
+                    self._bodies = {}
+                self._manifest, self._manifest_mtime = manifest, mtime
+            return self._manifest
+
+    def _body(self, name: str, suffix: str) -> bytes:
+        key = (name, suffix)
+        with self._lock:
+            body = self._bodies.get(key)
+        if body is None:
+            with open(os.path.join(self.directory, name + suffix), "rb") as f:
+                body = f.read()
+            with self._lock:
+                self._bodies[key] = body
+        return body
+
+    def select(self, kind: str, accepted_encodings: Iterable[str]) -> Optional[Variant]:
+        """Meilleure variante du snapshot `kind` pour les encodages acceptés par le client"""
+        manifest = self.manifest()
+        if manifest is None:
+            return None
+        entry = manifest["files"][kind]
+        accepted = set(accepted_encodings)
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted and suffix in entry["encodings"]:
+                break
+        else:
+            encoding, suffix = None, ""
+        etag = f'{manifest["version"]}-{kind}' + (f"-{encoding}" if encoding else "")
+        try:
+            body = self._body(entry["name"], suffix)
+        except FileNotFoundError:
+            # Version remplacée entre la lecture du manifeste et celle du fichier
+            return None
+        return Variant(body, etag, encoding, SNAPSHOT_KINDS[kind][1])
@@ -0,0 +1,288 @@
+"""Historique des tipsters et statistiques glissantes incrémentales
+
+Chaque cycle ajoute une ligne par tipster dans `tipster_history` (append-only) et les tips
+nouvellement réglés (score connu) dans le registre `settled_tips`. Les statistiques sur
+7/30/90 jours sont maintenues en O(delta) :
+- `tipster_daily` agrège les tips réglés par tipster et par jour ;
+- `tipster_rolling` garde les sommes de chaque fenêtre : on y ajoute les nouveaux tips et on
+  retire les jours qui sortent de la fenêtre, sans jamais tout recalculer ;
+- `tipster_streaks` suit la série en cours et la meilleure série de tips gagnants.
+"""
+import datetime
+import re
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from records import parse_kickoff
+
+WINDOWS = (7, 30, 90)
+
+SCORE_RE = re.compile(r"(\d+)\s*[:\-]\s*(\d+)")
+TOTAL_RE = re.compile(r"(over|under|o|u)\s*(\d+(?:[.,]\d+)?)", re.IGNORECASE)
+
+# Colonnes agrégées des tables tipster_daily et tipster_rolling
+AGGREGATES = ("n", "wins", "staked", "profit")
+
+
+def parse_score(score: str) -> Optional[Tuple[int, int]]:
+    """"2:1" -> (2, 1), None si le match n'est pas encore joué"""
+    found = SCORE_RE.search(score or "")
+    return (int(found.group(1)), int(found.group(2))) if found else None
+
+
+def settle_tip(tip: str, score: str) -> Optional[bool]:
+    """Règle un tip (1/X/2, double chance, over/under, BTTS) ; None si non réglable"""
+    goals = parse_score(score)
+    if goals is None:
+        return None
+    home, away = goals
+    tip = (tip or "").strip().upper()
+    outcome = "1" if home > away else "2" if away > home else "X"
+    if tip in ("1", "X", "2"):
+        return tip == outcome
+    if tip in ("1X", "X2", "12"):
+        return outcome in tip
+    if tip in ("BTTS", "BTTS YES", "GG"):
+        return home > 0 and away > 0
+    if tip in ("BTTS NO", "NG"):
+        return home == 0 or away == 0
+    total = TOTAL_RE.fullmatch(tip)
+    if total:
+        line = float(total.group(2).replace(",", "."))
+        if home + away == line:
+            return None
+        return (home + away > line) == total.group(1).upper().startswith("O")
+    return None
+
+
+def create_schema(conn: sqlite3.Connection):
+    """Crée les tables d'historique et d'agrégats"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tipster_history (
+            id INTEGER PRIMARY KEY,
+            observed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            tipster_name TEXT NOT NULL,
+            win_rate REAL,
+            tips INTEGER,
+            new_wins INTEGER,
+            new_losses INTEGER
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_history_tipster ON tipster_history(tipster_name, observed_at)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS settled_tips (
+            tipster_name TEXT NOT NULL,
+            day TEXT NOT NULL,
+            time TEXT NOT NULL,
+            match TEXT NOT NULL,
+            tip TEXT NOT NULL,
+            stake REAL,
+            odds REAL,
+            score TEXT,
+            won INTEGER,
+            profit REAL,
+            kickoff TEXT,
+            PRIMARY KEY (tipster_name, day, time, match, tip)
+        ) WITHOUT ROWID
+    ''')
+    if "kickoff" not in {row[1] for row in conn.execute('PRAGMA table_info(settled_tips)')}:
+        # Registre créé par une version antérieure : date/heure relues depuis le jour et l'heure affichés
+        conn.execute('ALTER TABLE settled_tips ADD COLUMN kickoff TEXT')
+        conn.executemany(
+            'UPDATE settled_tips SET kickoff = ? WHERE tipster_name = ? AND day = ? AND time = ? AND match = ? AND tip = ?',
+            [
+                (_isoformat(parse_kickoff(day, time)), name, day, time, match, tip)
+                for name, day, time, match, tip in conn.execute('SELECT tipster_name, day, time, match, tip FROM settled_tips')
+            ]
+        )
+    # Ordre chronologique des tips d'un tipster (backtest) : le jour affiché ne se trie pas (jj.mm.aaaa)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_settled_tips_kickoff ON settled_tips(tipster_name, kickoff)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tipster_daily (
+            tipster_name TEXT NOT NULL,
+            day TEXT NOT NULL,
+            n INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            staked REAL NOT NULL DEFAULT 0,
+            profit REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (tipster_name, day)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tipster_rolling (
+            tipster_name TEXT NOT NULL,
+            window_days INTEGER NOT NULL,
+            as_of TEXT NOT NULL,
+            n INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            staked REAL NOT NULL DEFAULT 0,
+            profit REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (tipster_name, window_days)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tipster_streaks (
+            tipster_name TEXT PRIMARY KEY,
+            current INTEGER NOT NULL DEFAULT 0,
+            best INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+
+def _isoformat(kickoff: Optional[datetime.datetime]) -> Optional[str]:
+    return kickoff.isoformat() if kickoff else None
+
+
+def _roll_forward(conn: sqlite3.Connection, today: str):
+    """Retire des fenêtres les jours qui en sont sortis depuis leur dernière mise à jour"""
+    expired = " ".join(f'''
+        {column} = {column} - (
+            SELECT COALESCE(SUM(d.{column}), 0) FROM tipster_daily d
+            WHERE d.tipster_name = tipster_rolling.tipster_name
+            AND d.day > date(tipster_rolling.as_of, '-' || tipster_rolling.window_days || ' days')
+            AND d.day <= date(:today, '-' || tipster_rolling.window_days || ' days')
+        ),''' for column in AGGREGATES)
+    conn.execute(f'UPDATE tipster_rolling SET {expired} as_of = :today WHERE as_of < :today', {"today": today})
+
+
+def _ensure_rolling_rows(conn: sqlite3.Connection, names: Iterable[str], today: str):
+    """Initialise (une seule fois) les fenêtres d'un tipster à partir de ses agrégats journaliers"""
+    sums = ", ".join(f"COALESCE(SUM({column}), 0)" for column in AGGREGATES)
+    conn.executemany(f'''
+        INSERT OR IGNORE INTO tipster_rolling (tipster_name, window_days, as_of, {", ".join(AGGREGATES)})
+        SELECT :name, :window, :today, {sums} FROM tipster_daily
+        WHERE tipster_name = :name AND day > date(:today, '-' || :window || ' days') AND day <= :today
+    ''', [{"name": name, "window": window, "today": today} for name in names for window in WINDOWS])
+
+
+def record_cycle(conn: sqlite3.Connection, profiles: Dict[str, Dict], today: datetime.date) -> int:
+    """Enregistre un cycle (à appeler dans une transaction) et met à jour les agrégats en O(delta).
+
+    `profiles` associe le nom du tipster à son profil parsé (win_rate, upcoming_matches : records.Match).
+    Renvoie le nombre de tips nouvellement réglés.
+    """
+    today_iso = today.isoformat()
+    _roll_forward(conn, today_iso)
+
+    # Tips réglés jamais vus : le registre (clé primaire) sert de filtre
+    new_tips: List[Tuple[str, str, str, bool, float, float]] = []
+    history_rows = []
+    for name, profile in profiles.items():
+        wins = losses = 0
+        for match in profile.get("upcoming_matches") or []:
+            won = settle_tip(match.tip, match.score)
+            odds = match.odds_value
+            if won is None or odds is None:
+                continue
+            stake = match.stake_value if match.stake_value is not None else 1
+            profit = stake * (odds - 1) if won else -stake
+            # Le registre garde le jour tel qu'affiché ; l'agrégat journalier utilise la date lue (ou celle du cycle)
+            inserted = conn.execute('''
+                INSERT OR IGNORE INTO settled_tips
+                (tipster_name, day, time, match, tip, stake, odds, score, won, profit, kickoff)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (name, match.day, match.time, match.match, match.tip,
+                  stake, odds, match.score, int(won), profit, _isoformat(match.kickoff))).rowcount
+            if inserted:
+                day = (match.kickoff.date() if match.kickoff else today).isoformat()
+                new_tips.append((name, day, match.time, won, stake, profit))
+                wins += won
+                losses += not won
+        history_rows.append((name, profile.get("win_rate"), len(profile.get("upcoming_matches") or []), wins, losses))
+
+    conn.executemany(
+        'INSERT INTO tipster_history (tipster_name, win_rate, tips, new_wins, new_losses) VALUES (?, ?, ?, ?, ?)',
+        history_rows
+    )
+    if not new_tips:
+        return 0
+
+    _ensure_rolling_rows(conn, {tip[0] for tip in new_tips}, today_iso)
+
+    deltas: Dict[Tuple[str, str], List[float]] = {}
+    for name, day, _, won, stake, profit in new_tips:
+        delta = deltas.setdefault((name, day), [0, 0, 0.0, 0.0])
+        delta[0] += 1
+        delta[1] += won
+        delta[2] += stake
+        delta[3] += profit
+    assignments = ", ".join(f"{column} = {column} + excluded.{column}" for column in AGGREGATES)
+    conn.executemany(f'''
+        INSERT INTO tipster_daily (tipster_name, day, {", ".join(AGGREGATES)}) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(tipster_name, day) DO UPDATE SET {assignments}
+    ''', [(name, day, *delta) for (name, day), delta in deltas.items()])
+    increments = ", ".join(f"{column} = {column} + ?" for column in AGGREGATES)
+    conn.executemany(f'''
+        UPDATE tipster_rolling SET {increments}
+        WHERE tipster_name = ? AND window_days = ? AND ? > date(?, '-' || window_days || ' days') AND ? <= ?
+    ''', [
+        (*delta, name, window, day, today_iso, day, today_iso)
+        for (name, day), delta in deltas.items() for window in WINDOWS
+    ])
+
+    # Séries : les nouveaux tips sont appliqués dans l'ordre chronologique
+    touched = list({tip[0] for tip in new_tips})
+    streaks = {
+        row["tipster_name"]: [row["current"], row["best"]]
+        for row in conn.execute(
+            f'SELECT tipster_name, current, best FROM tipster_streaks '
+            f'WHERE tipster_name IN ({", ".join("?" * len(touched))})',
+            touched
+        )
+    }
+    for name, _, _, won, _, _ in sorted(new_tips, key=lambda tip: (tip[1], tip[2])):
+        streak = streaks.setdefault(name, [0, 0])
+        if won:
+            streak[0] = streak[0] + 1 if streak[0] > 0 else 1
+        else:
+            streak[0] = streak[0] - 1 if streak[0] < 0 else -1
+        streak[1] = max(streak[1], streak[0])
+    conn.executemany('''
+        INSERT INTO tipster_streaks (tipster_name, current, best) VALUES (?, ?, ?)
+        ON CONFLICT(tipster_name) DO UPDATE SET current = excluded.current, best = excluded.best
+    ''', [(name, current, best) for name, (current, best) in streaks.items()])
+    return len(new_tips)
+
+
+def rolling_stats(conn: sqlite3.Connection, names: Iterable[str]) -> Dict[str, Dict]:
+    """Statistiques glissantes par tipster : {nom: {7: {...}, 30: {...}, 90: {...}, "streak", "best_streak"}}"""
+    names = list(names)
+    if not names:
+        return {}
+    placeholders = ", ".join("?" * len(names))
+    stats: Dict[str, Dict] = {}
+    for row in conn.execute(
+        f'SELECT tipster_name, window_days, n, wins, staked, profit FROM tipster_rolling '
+        f'WHERE tipster_name IN ({placeholders})', names
+    ):
+        stats.setdefault(row["tipster_name"], {})[row["window_days"]] = {
+            "n": row["n"],
+            "wins": row["wins"],
+            "hit_rate": 100 * row["wins"] / row["n"] if row["n"] else None,
+            "roi": 100 * row["profit"] / row["staked"] if row["staked"] else None,
+            "staked": row["staked"],
+            "profit": row["profit"]
+        }
+    for row in conn.execute(
+        f'SELECT tipster_name, current, best FROM tipster_streaks WHERE tipster_name IN ({placeholders})', names
+    ):
+        stats.setdefault(row["tipster_name"], {}).update(streak=row["current"], best_streak=row["best"])
+    return stats
+
+
+def cumulative_roi(conn: sqlite3.Connection, names: Iterable[str]) -> List[Tuple[str, float]]:
+    """ROI cumulé (%) jour par jour de l'ensemble des tipsters donnés, depuis `tipster_daily`"""
+    names = list(names)
+    if not names:
+        return []
+    staked = profit = 0.0
+    roi = []
+    for row in conn.execute(
+        f'SELECT day, SUM(staked) AS staked, SUM(profit) AS profit FROM tipster_daily '
+        f'WHERE tipster_name IN ({", ".join("?" * len(names))}) GROUP BY day ORDER BY day', names
+    ):
+        staked += row["staked"]
+        profit += row["profit"]
+        if staked:
+            roi.append((row["day"], round(100 * profit / staked, 2)))
+    return roi
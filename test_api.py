@@ -0,0 +1,125 @@
+"""Filtres, tri et pagination par curseur de l'API JSON"""
+import base64
+import json
+
+import pytest
+
+import api
+import bet
+import records
+from benchmark import bench_config
+
+WIN_RATES = {"alpha": 90.0, "bravo": 80.0, "charlie": None, "delta": 80.0, "echo": 76.0}
+TIPS = [
+    # tipster, heure, bookmaker, cote
+    ("alpha", "12:00", "Bet365", "1.50"),
+    ("bravo", "18:30", "Unibet", "2.10"),
+    ("alpha", "09:15", "Unibet", "3.40"),
+    ("delta", "", "Bet365", ""),
+    ("echo", "21:00", "Betclic", "2.10"),
+    ("charlie", "15:00", "Bet365", "1.80"),
+    ("bravo", "10:00", "Bet365", "2.75"),
+]
+
+
+@pytest.fixture(scope="module")
+def conn():
+    with bench_config(EMAIL_USER=None):
+        qualified = [{
+            "name": name,
+            "win_rate": win_rate,
+            "profile_url": f"https://www.typersi.com/profile/{name}",
+            "upcoming_matches": [records.Match.create("01.02.2026", "12:00", "Bet365" if name < "c" else "Unibet",
+                                                      "Home - Away", "1", "5", "1.90", "-")],
+        } for name, win_rate in WIN_RATES.items()]
+        tips = records.TipColumns(records.Tip.create(
+            tipster_name=name, time=time, bookmaker=bookmaker, match=f"Match {i}", tip="1", odds=odds, score="-"
+        ) for i, (name, time, bookmaker, odds) in enumerate(TIPS))
+        bet.DatabaseManager().save_cycle(qualified, tips, "2026-02-01")
+        with bet.db_reader() as conn:
+            yield conn
+
+
+def all_pages(conn, query, **args):
+    """Parcourt toutes les pages (limit=2) et renvoie les éléments dans l'ordre"""
+    items, cursor = [], None
+    while True:
+        page = query(conn, dict(args, limit="2", **({"cursor": cursor} if cursor else {})))
+        items += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items
+
+
+@pytest.mark.parametrize("sort, order", [("win_rate", "desc"), ("win_rate", "asc"), ("name", "asc"), ("name", "desc")])
+def test_tipsters_keyset_pagination(conn, sort, order):
+    single = api.query_tipsters(conn, {"sort": sort, "order": order, "limit": "100"})["items"]
+    assert len(single) == len(WIN_RATES)
+    assert all_pages(conn, api.query_tipsters, sort=sort, order=order) == single
+
+
+def test_tipsters_sorted_by_win_rate(conn):
+    items = api.query_tipsters(conn, {})["items"]
+    # Win rate décroissant (départage par nom, dans le même sens), tipster sans win rate en dernier
+    assert [item["name"] for item in items] == ["alpha", "delta", "bravo", "echo", "charlie"]
+
+
+@pytest.mark.parametrize("sort, order", [("time", "asc"), ("odds", "desc"), ("odds", "asc"), ("id", "desc")])
+def test_tips_keyset_pagination(conn, sort, order):
+    single = api.query_tips(conn, {"sort": sort, "order": order, "limit": "100"})["items"]
+    assert len(single) == len(TIPS)
+    assert all_pages(conn, api.query_tips, sort=sort, order=order) == single
+
+
+def test_tips_sorted_by_kickoff(conn):
+    items = api.query_tips(conn, {"sort": "time"})["items"]
+    # Heure inconnue (pas de date/heure ISO) en premier, puis ordre chronologique
+    assert [item["time"] for item in items] == ["", "09:15", "10:00", "12:00", "15:00", "18:30", "21:00"]
+
+
+def test_tips_filters(conn):
+    def matches(**args):
+        return sorted(item["match"] for item in api.query_tips(conn, args)["items"])
+
+    assert matches(bookmaker="Unibet") == ["Match 1", "Match 2"]
+    assert matches(min_odds="2,5") == ["Match 2", "Match 6"]
+    assert matches(tipster="bravo") == ["Match 1", "Match 6"]
+    assert matches(min_win_rate="85") == ["Match 0", "Match 2"]
+    assert matches(bookmaker="Bet365", min_odds="2") == ["Match 6"]
+    assert [item["tipster_name"] for item in api.query_tips(conn, {"source": "profile", "bookmaker": "Unibet"})["items"]] \
+        == ["charlie", "delta", "echo"]
+
+
+def test_tipsters_filters(conn):
+    def names(**args):
+        return [item["name"] for item in api.query_tipsters(conn, dict(args, sort="name"))["items"]]
+
+    assert names(min_win_rate="80") == ["alpha", "bravo", "delta"]
+    assert names(bookmaker="Bet365") == ["alpha", "bravo"]
+    assert names(day="01.02.2026", min_win_rate="85") == ["alpha"]
+
+
+def raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("args", [
+    {"cursor": "not-a-cursor!"},
+    {"cursor": raw_cursor({"a": 1})},
+    {"cursor": raw_cursor(["odds", "desc", [2.1, 1]])},
+    {"cursor": raw_cursor(["time", "asc", ["2026-02-01T12:00:00"]])},
+    {"cursor": raw_cursor(["time", "asc", [{"a": 1}, 1]])},
+    {"cursor": raw_cursor(["time", "asc", [[1], 1]])},
+    {"sort": "nope"},
+    {"min_odds": "abc"},
+    {"limit": "x"},
+])
+def test_invalid_parameters(conn, args):
+    with pytest.raises(api.ApiError):
+        api.query_tips(conn, args)
+
+
+def test_invalid_cursor_is_a_bad_request(conn):
+    cursor = raw_cursor(["time", "asc", [{"a": 1}, 1]])
+    response = bet.app.test_client().get(f"/api/tips?cursor={cursor}")
+    assert response.status_code == 400
@@ -0,0 +1,106 @@
+"""Backtest vectorisé comparé à une boucle naïve pari par pari"""
+import datetime
+import random
+import sqlite3
+
+import pytest
+
+import backtest
+import stats
+
+TIPS = ["1", "X", "2", "1X", "X2", "12", "BTTS", "BTTS NO", "Over 2.5", "Under 2.5", "Over 3", "Handicap -1"]
+SCORES = ["2:0", "1:1", "0:1", "3:2", "0:0", "1:2", "2:1", "-", ""]
+
+
+def make_rows(seed: int = 0, tipsters: int = 6):
+    """Tips (tipster, tip, score, cote, mise) triés par tipster, dans l'ordre chronologique de chacun"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(tipsters):
+        # Un tipster sans aucun tip réglable n'apparaît pas dans les résultats
+        scores = ["-"] if i == tipsters - 1 else SCORES
+        for _ in range(rng.randint(1, 80)):
+            rows.append((f"tipster{i}", rng.choice(TIPS), rng.choice(scores), round(rng.uniform(1.2, 4.5), 2),
+                         float(rng.choice((1, 1, 2, 5)))))
+    return rows
+
+
+def naive(rows, kelly_fraction: float = 0.25, kelly_cap: float = 0.1):
+    """Référence : mêmes métriques calculées pari par pari"""
+    results = {}
+    for name in dict.fromkeys(row[0] for row in rows):
+        n = wins = 0
+        staked = profit = flat_profit = 0.0
+        cumulative = peak = drawdown = 0.0
+        bankroll = 1.0
+        for _, tip, score, odds, stake in (row for row in rows if row[0] == name):
+            won = stats.settle_tip(tip, score)
+            if won is None:
+                continue
+            # Kelly : taux de réussite a posteriori (prior Beta(1, 1)) des tips précédents uniquement
+            p = (wins + 1) / (n + 2)
+            fraction = min(max((p * odds - 1) / (odds - 1) * kelly_fraction, 0.0), kelly_cap)
+            flat_return = odds - 1 if won else -1.0
+            bankroll *= 1 + fraction * flat_return
+
+            n += 1
+            wins += won
+            staked += stake
+            profit += stake * flat_return
+            flat_profit += flat_return
+            cumulative += stake * flat_return
+            peak = max(peak, cumulative)
+            drawdown = max(drawdown, peak - cumulative)
+        if n:
+            results[name] = {
+                "tips": n,
+                "wins": wins,
+                "hit_rate": 100 * wins / n,
+                "roi": 100 * flat_profit / n,
+                "yield": 100 * profit / staked,
+                "profit": profit,
+                "max_drawdown": drawdown,
+                "kelly_growth": 100 * (bankroll - 1),
+            }
+    return results
+
+
+def assert_same(results, expected):
+    assert results.keys() == expected.keys()
+    for name, metrics in expected.items():
+        assert results[name] == pytest.approx(metrics, rel=1e-9, abs=1e-9), name
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_evaluate_matches_naive_loop(seed):
+    rows = make_rows(seed)
+    tips = backtest.from_columns(*zip(*rows))
+    assert_same(backtest.evaluate(tips), naive(rows))
+
+
+def test_settle_matches_settle_tip():
+    rows = [("t", tip, score, 2.0, 1.0) for tip in TIPS for score in SCORES]
+    outcome = backtest.settle(backtest.from_columns(*zip(*rows)))
+    for (_, tip, score, _, _), result in zip(rows, outcome):
+        won = stats.settle_tip(tip, score)
+        assert result == (-1 if won is None else int(won)), (tip, score)
+
+
+def test_load_tips_in_kickoff_order():
+    """Le drawdown et la mise de Kelly suivent l'ordre des matchs, pas l'ordre d'insertion"""
+    rows = make_rows(seed=7, tipsters=3)
+    start = datetime.datetime(2026, 1, 1, 12)
+    dated = [(row, start + datetime.timedelta(hours=i)) for i, row in enumerate(rows)]
+    conn = sqlite3.connect(":memory:")
+    stats.create_schema(conn)
+    conn.executemany(
+        'INSERT INTO settled_tips (tipster_name, day, time, match, tip, stake, odds, score, kickoff) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        [
+            (name, kickoff.strftime("%d.%m.%Y"), kickoff.strftime("%H:%M"), f"match {i}", tip, stake, odds, score,
+             kickoff.isoformat())
+            for i, ((name, tip, score, odds, stake), kickoff) in enumerate(reversed(dated))
+        ]
+    )
+    assert_same(backtest.evaluate(backtest.load_tips(conn)), naive(rows))
+    assert_same(backtest.evaluate(backtest.load_tips(conn, ["tipster1"])), naive([r for r in rows if r[0] == "tipster1"]))
@@ -0,0 +1,171 @@
+"""Événements de tips (notify.record_diff), flux /events et digests, contre le site synthétique et le
+serveur SMTP stub de benchmark.py"""
+import datetime
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import bet
+import metrics
+import notify
+from benchmark import StubHandler, SyntheticSite, bench_config, read_sse, smtp_stub, stub_server
+
+RECIPIENTS = ["user0@localhost", "user1@localhost"]
+
+
+def tip(tipster: str, match: str, live: bool = True):
+    """Entrée de snapshot (clé, SnapshotTip) d'un tip de la page Tomorrow Tips"""
+    values = (tipster, "2026-01-01", "12:00", "Bet365", match, "1", "2.00", 2.0)
+    key = ("tomorrow", (tipster, "2026-01-01", "12:00", match, "1"))
+    return key, notify.SnapshotTip(values, live)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    notify.create_schema(conn)
+    yield conn
+    conn.close()
+
+
+def diff(conn, before, after, unavailable=()):
+    return notify.record_diff(conn, dict(before), dict(after), 7, unavailable)
+
+
+def test_first_snapshot_is_baseline(conn):
+    assert diff(conn, [], [tip("a", "A - B")]) == {"added": 0, "removed": 0}
+    assert notify.events_since(conn, 0) == []
+
+
+def test_new_tips_after_empty_cycle(conn):
+    a, b = tip("a", "A - B"), tip("b", "C - D")
+    diff(conn, [], [a])
+    assert diff(conn, [a], []) == {"added": 0, "removed": 1}
+    # Après un cycle vide, seul le tip jamais vu est annoncé
+    assert diff(conn, [], [a, b]) == {"added": 1, "removed": 0}
+    assert [event["tipster_name"] for event in notify.events_since(conn, 0, kind="added")] == ["b"]
+
+
+def test_settled_tips_not_announced(conn):
+    diff(conn, [], [])
+    assert diff(conn, [], [tip("a", "A - B", live=False), tip("b", "C - D")]) == {"added": 1, "removed": 0}
+
+
+def test_unavailable_tipsters_not_removed(conn):
+    a, b = tip("a", "A - B"), tip("b", "C - D")
+    diff(conn, [], [a, b])
+    assert diff(conn, [a, b], [], unavailable={"a"}) == {"added": 0, "removed": 1}
+
+
+def test_is_live():
+    now = datetime.datetime(2026, 1, 1, 12).isoformat()
+    assert notify.is_live("-", "2026-01-02T12:00:00", now)
+    assert notify.is_live("", None, now)
+    assert not notify.is_live("2:1", "2026-01-02T12:00:00", now)
+    assert not notify.is_live("-", "2025-12-31T12:00:00", now)
+
+
+@pytest.fixture
+def site(monkeypatch):
+    """Site synthétique servi par le stub HTTP, base temporaire et digests envoyés au serveur SMTP stub"""
+    site = SyntheticSite(60, 40)
+    monkeypatch.setattr(bet, "_mailer", None)
+    with stub_server(0.0, site=site) as base_url, smtp_stub() as smtp, bench_config(
+            SCRAPE_URL_REMAINDER=f"{base_url}/remainder", SCRAPE_URL_TOMORROW_TIPS=f"{base_url}/tomorrow",
+            SCRAPE_URL_BASE=base_url, SMTP_SERVER="127.0.0.1", SMTP_PORT=smtp.server_address[1], SMTP_SSL=False,
+            EMAIL_USER="test@localhost", EMAIL_PASSWORD="test", DIGEST_MIN_INTERVAL=0, DIGEST_MIN_ODDS=0,
+            DIGEST_RECIPIENTS=RECIPIENTS, SSE_POLL_SECONDS=0.1, SSE_HEARTBEAT_SECONDS=0.2,
+            FETCH_RETRIES=0, FETCH_BACKOFF=0
+    ):
+        bet.DatabaseManager.ensure_schema()
+        yield site, smtp
+        bet.get_mailer().close()
+        bet.get_event_feed().close()
+        bet.get_chart_service().wait()
+
+
+def cycle_events(cursor: int):
+    """Événements postérieurs à `cursor` et nouveau curseur"""
+    with bet.db_reader() as conn:
+        events = notify.events_since(conn, cursor, limit=None)
+    return events, events[-1]["id"] if events else cursor
+
+
+def test_cycles_events_and_digests(site):
+    site, smtp = site
+    client = bet.app.test_client()
+    bet.scheduled_job()
+    events, cursor = cycle_events(0)
+    assert not events and not smtp.messages
+
+    for _ in range(2):
+        site.touch(0.3)
+        received, stop = [], threading.Event()
+        reader = threading.Thread(target=read_sse, args=(client, cursor, received, stop), daemon=True)
+        reader.start()
+        messages_before = len(smtp.messages)
+        bet.scheduled_job()
+        events, cursor = cycle_events(cursor)
+        deadline = time.monotonic() + 5
+        while len(received) < len(events) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        stop.set()
+        reader.join()
+
+        kinds = {event["kind"] for event in events}
+        assert kinds == {"added", "removed"}
+        assert [event["id"] for event in received] == [event["id"] for event in events]
+        assert len(smtp.messages) - messages_before == len(RECIPIENTS)
+    # Une seule connexion SMTP pour tous les digests
+    assert smtp.connections == 1
+
+    assert client.get("/events", headers={"Last-Event-ID": "abc"}).status_code == 400
+    assert metrics.SSE_CLIENTS.value() == 0
+
+
+def test_failed_profiles_do_not_churn(site, monkeypatch):
+    site, _ = site
+    bet.CONFIG["INCREMENTAL_SCRAPE"] = False
+    bet.scheduled_job()
+    _, cursor = cycle_events(0)
+
+    do_get = StubHandler.do_GET
+
+    def failing_profiles(handler):
+        if handler.path.startswith("/profile/"):
+            handler.send_response(500)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+        do_get(handler)
+
+    monkeypatch.setattr(StubHandler, "do_GET", failing_profiles)
+    assert bet.scheduled_job()["status"] == "partial"
+    events, cursor = cycle_events(cursor)
+    assert events == []
+
+    monkeypatch.setattr(StubHandler, "do_GET", do_get)
+    site.touch(0.3)
+    assert bet.scheduled_job()["status"] == "ok"
+    events, _ = cycle_events(cursor)
+    assert any(event["kind"] == "added" for event in events)
+
+
+def test_streams_capped_per_process(monkeypatch):
+    monkeypatch.setattr(bet, "_sse_slots", None)
+    with bench_config(SSE_MAX_STREAMS=1, SSE_POLL_SECONDS=0.1, SSE_HEARTBEAT_SECONDS=0.2):
+        bet.DatabaseManager.ensure_schema()
+        client = bet.app.test_client()
+        first = client.get("/events", buffered=False)
+        assert first.status_code == 200
+        rejected = client.get("/events")
+        assert rejected.status_code == 503 and rejected.headers["Retry-After"]
+        # La place est rendue à la fermeture du flux, même s'il n'a pas été lu
+        first.close()
+        second = client.get("/events", buffered=False)
+        assert second.status_code == 200
+        second.close()
+        bet.get_event_feed().close()
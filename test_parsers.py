@@ -0,0 +1,50 @@
+"""Parsers de pages contre les pages enregistrées (fixtures/*.html -> fixtures/*.expected.json), pour chaque backend"""
+import json
+import os
+
+import pytest
+
+import bet
+import records
+from benchmark import FIXTURE_PARSERS, FIXTURES_DIR, load_fixture
+from parsers import PARSER_BACKENDS
+
+
+@pytest.fixture(scope="module", params=list(PARSER_BACKENDS))
+def scraper(request):
+    return bet.TipsterScraper(parser_backend=request.param)
+
+
+@pytest.mark.parametrize("name, method", FIXTURE_PARSERS.items())
+def test_fixture(scraper, name, method):
+    with open(os.path.join(FIXTURES_DIR, f"{name}.expected.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    assert records.plain(getattr(scraper, method)(load_fixture(name))) == expected
+
+
+def test_tomorrow_single_pass(scraper):
+    """La page Tomorrow Tips parsée en une passe donne les mêmes résultats que les deux parsers séparés"""
+    html = load_fixture("tomorrow")
+    assert scraper.parse_tomorrow_page(html) == {
+        "tipsters": scraper.parse_tomorrow_tips_page(html),
+        "tips": scraper.parse_tomorrow_tips(html),
+    }
+
+
+@pytest.mark.parametrize("html", [b"", b"   ", b"<!-- vide -->"])
+def test_empty_page(html):
+    """Une page vide donne le même résultat (vide) avec chaque backend, sans lever d'erreur"""
+    results = []
+    for backend in PARSER_BACKENDS:
+        scraper = bet.TipsterScraper(parser_backend=backend)
+        results.append(records.plain({
+            "profile": scraper.parse_tipster_profile_page(html),
+            "tomorrow": scraper.parse_tomorrow_page(html),
+            "remainder": scraper.parse_remainder_page(html),
+        }))
+    assert results[0] == {
+        "profile": {"win_rate": None, "upcoming_matches": []},
+        "tomorrow": {"tipsters": [], "tips": []},
+        "remainder": [],
+    }
+    assert all(result == results[0] for result in results)
@@ -0,0 +1,126 @@
+"""Bail SQLite et nouvel essai avec backoff du planificateur"""
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import pytest
+
+import scheduler
+
+CADENCES = {"remainder": 3600, "tomorrow": 900}
+
+
+@pytest.fixture
+def connect(tmp_path):
+    """Connexions à une base temporaire : commit en sortie, rollback sur exception (comme db_writer)"""
+    path = str(tmp_path / "scheduler.db")
+
+    @contextmanager
+    def connect():
+        conn = sqlite3.connect(path, timeout=1)
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    with connect() as conn:
+        scheduler.create_schema(conn)
+    return connect
+
+
+def runs(connect):
+    with connect() as conn:
+        return [row[0] for row in conn.execute('SELECT status FROM runs ORDER BY id')]
+
+
+def make_scheduler(connect, job, **kwargs):
+    return scheduler.Scheduler(job, connect, CADENCES, jitter=0, retry_base=60, **kwargs)
+
+
+def delays(sched):
+    now = time.monotonic()
+    return {page: round(next_run - now) for page, next_run in sched._next_run.items()}
+
+
+def test_lease_is_exclusive(connect):
+    first = scheduler.Lease(connect, "scrape", ttl=60, owner="a")
+    second = scheduler.Lease(connect, "scrape", ttl=60, owner="b")
+    assert first.acquire()
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+
+
+def test_lease_expires(connect):
+    first = scheduler.Lease(connect, "scrape", ttl=0.05, owner="a")
+    second = scheduler.Lease(connect, "scrape", ttl=60, owner="b")
+    assert first.acquire()
+    time.sleep(0.1)
+    assert second.acquire()
+
+
+def test_backoff_until_ok(connect):
+    statuses = iter(["partial", "failed", "ok"])
+    sched = make_scheduler(connect, lambda pages: {"status": next(statuses)})
+
+    assert sched.run_pending()["status"] == "partial"
+    assert delays(sched) == {"remainder": 60, "tomorrow": 60}
+    sched._next_run = dict.fromkeys(CADENCES, 0)
+    assert sched.run_pending()["attempt"] == 2
+    assert delays(sched) == {"remainder": 120, "tomorrow": 120}
+    sched._next_run = dict.fromkeys(CADENCES, 0)
+    assert sched.run_pending()["status"] == "ok"
+    assert delays(sched) == CADENCES
+    assert runs(connect) == ["partial", "failed", "ok"]
+
+
+def test_backoff_capped_by_cadence(connect):
+    sched = make_scheduler(connect, lambda pages: {"status": "failed"})
+    for _ in range(6):
+        sched._next_run = dict.fromkeys(CADENCES, 0)
+        sched.run_pending()
+    assert delays(sched) == {"remainder": 1920, "tomorrow": 900}
+
+
+def test_job_exception_is_a_failure(connect):
+    def job(pages):
+        raise RuntimeError("boom")
+
+    sched = make_scheduler(connect, job)
+    run = sched.run_pending()
+    assert (run["status"], run["error"]) == ("failed", "boom")
+    assert delays(sched) == {"remainder": 60, "tomorrow": 60}
+
+
+def test_locked_by_another_process(connect):
+    assert scheduler.Lease(connect, "scrape", ttl=60, owner="other").acquire()
+    calls = []
+    sched = make_scheduler(connect, lambda pages: calls.append(pages) or {"status": "ok"})
+    assert sched.run_pending()["status"] == "locked"
+    assert not calls
+    # Pas d'échec compté : l'essai suivant reste le premier
+    sched._next_run = dict.fromkeys(CADENCES, 0)
+    assert sched.run_pending()["attempt"] == 1
+
+
+def test_lease_errors_do_not_stop_the_scheduler(connect, monkeypatch):
+    def locked(self):
+        raise sqlite3.OperationalError("database is locked")
+
+    sched = make_scheduler(connect, lambda pages: {"status": "ok"})
+    monkeypatch.setattr(scheduler.Lease, "acquire", locked)
+    run = sched.run_pending()
+    assert (run["status"], run["error"]) == ("failed", "database is locked")
+    assert delays(sched) == {"remainder": 60, "tomorrow": 60}
+
+    # Échec de la libération après le cycle : le cycle reste réussi, le bail expirera de lui-même
+    monkeypatch.undo()
+    monkeypatch.setattr(scheduler.Lease, "release", locked)
+    sched._next_run = dict.fromkeys(CADENCES, 0)
+    assert sched.run_pending()["status"] == "ok"
+    assert runs(connect) == ["failed", "ok"]
@@ -0,0 +1,19 @@
+"""Publication versionnée du snapshot du tableau de bord"""
+import snapshot
+
+DATA = {"qualified_tipsters": [], "tomorrow_tips": []}
+
+
+def test_unchanged_snapshot_is_not_republished(tmp_path):
+    version, published = snapshot.publish(str(tmp_path), DATA, "<html>v1</html>")
+    assert published
+    assert snapshot.publish(str(tmp_path), DATA, "<html>v1</html>") == (version, False)
+
+
+def test_template_change_is_republished(tmp_path):
+    first, _ = snapshot.publish(str(tmp_path), DATA, "<html>v1</html>")
+    second, published = snapshot.publish(str(tmp_path), DATA, "<html>v2</html>")
+    assert published and second != first
+    variant = snapshot.SnapshotStore(str(tmp_path)).select("html", [])
+    assert variant.body == b"<html>v2</html>"
+    assert variant.etag.startswith(second)
@@ -0,0 +1,102 @@
+"""Statistiques glissantes incrémentales (stats.record_cycle) comparées à un recalcul complet"""
+import datetime
+import random
+import sqlite3
+
+import pytest
+
+import records
+import stats
+
+START = datetime.date(2026, 1, 1)
+TIPSTERS = ("alpha", "bravo", "charlie")
+# Une page de profil montre les tips des PROFILE_DAYS derniers jours et ceux des prochains jours
+PROFILE_DAYS = 10
+
+
+def make_tips(seed: int = 0):
+    """Tips de chaque tipster sur 150 jours : (nom, date, heure, gagné, mise, cote)"""
+    rng = random.Random(seed)
+    tips = []
+    for name in TIPSTERS:
+        day = START
+        while day < START + datetime.timedelta(days=150):
+            tips.append((name, day, f"{rng.randint(12, 21)}:00", rng.random() < 0.55, rng.choice((1, 2, 5)),
+                         round(rng.uniform(1.3, 3.5), 2)))
+            day += datetime.timedelta(days=rng.randint(1, 4))
+    return tips
+
+
+def profile_page(tips, today: datetime.date):
+    """Profils tels que scrapés le jour `today` : tips récents réglés (score), tips à venir sans score"""
+    profiles = {name: {"win_rate": 50.0, "upcoming_matches": []} for name in TIPSTERS}
+    for name, day, time, won, stake, odds in tips:
+        if today - datetime.timedelta(days=PROFILE_DAYS) <= day <= today + datetime.timedelta(days=3):
+            score = ("2:0" if won else "0:1") if day < today else "-"
+            profiles[name]["upcoming_matches"].append(records.Match.create(
+                day.strftime("%d.%m.%Y"), time, "Bet365", f"{name} {day}", "1", str(stake), f"{odds:.2f}", score
+            ))
+    return profiles
+
+
+def recompute(tips, today: datetime.date):
+    """Recalcul complet : agrégats de chaque fenêtre et séries depuis tous les tips réglés avant `today`"""
+    settled = sorted((tip for tip in tips if tip[1] < today), key=lambda tip: (tip[1], tip[2]))
+    expected = {}
+    for name, day, _, won, stake, odds in settled:
+        profit = stake * (odds - 1) if won else -stake
+        for window in stats.WINDOWS:
+            aggregates = expected.setdefault(name, {}).setdefault(window, [0, 0, 0.0, 0.0])
+            if today - datetime.timedelta(days=window) < day <= today:
+                aggregates[0] += 1
+                aggregates[1] += won
+                aggregates[2] += stake
+                aggregates[3] += profit
+        streak = expected[name].setdefault("streak", [0, 0])
+        if won:
+            streak[0] = streak[0] + 1 if streak[0] > 0 else 1
+        else:
+            streak[0] = streak[0] - 1 if streak[0] < 0 else -1
+        streak[1] = max(streak[1], streak[0])
+    return expected
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    stats.create_schema(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("step", [1, 3, 5])
+def test_incremental_matches_full_recompute(conn, step):
+    tips = make_tips()
+    # Cycles jusqu'après le dernier tip : les jours sortent peu à peu des fenêtres 7, 30 puis 90 jours
+    for offset in range(0, 260, step):
+        today = START + datetime.timedelta(days=offset)
+        with conn:
+            stats.record_cycle(conn, profile_page(tips, today), today)
+
+        expected = recompute(tips, today)
+        incremental = stats.rolling_stats(conn, TIPSTERS)
+        assert incremental.keys() == expected.keys()
+        for name, windows in expected.items():
+            for window in stats.WINDOWS:
+                n, wins, staked, profit = windows[window]
+                got = incremental[name][window]
+                assert (got["n"], got["wins"]) == (n, wins), (today, name, window)
+                assert got["staked"] == pytest.approx(staked) and got["profit"] == pytest.approx(profit, abs=1e-6)
+            assert [incremental[name]["streak"], incremental[name]["best_streak"]] == windows["streak"]
+
+
+def test_settled_tips_counted_once(conn):
+    tips = make_tips(seed=1)
+    today = START + datetime.timedelta(days=20)
+    profiles = profile_page(tips, today)
+    with conn:
+        first = stats.record_cycle(conn, profiles, today)
+    with conn:
+        assert stats.record_cycle(conn, profiles, today) == 0
+    assert first == sum(1 for tip in tips if today - datetime.timedelta(days=PROFILE_DAYS) <= tip[1] < today)
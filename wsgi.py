@@ -0,0 +1,17 @@
+"""Point d'entrée WSGI du tableau de bord (production, plusieurs workers)
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Les workers ne font que lire : base SQLite (WAL, lecteurs en parallèle), snapshot publié et
+graphiques sur disque, cache des réponses de l'API partagé (FileSystemCache). Le scraping tourne
+dans un processus séparé : `python bet.py worker`.
+"""
+import metrics
+from bet import CONFIG, DatabaseManager, app
+
+# Schéma vérifié une fois dans le maître (preload_app), avant le fork des workers
+DatabaseManager.ensure_schema()
+# Métriques des workers d'un lancement précédent effacées (les compteurs repartent de zéro)
+metrics.reset_web_textfiles(CONFIG["WEB_METRICS_DIR"])
+
+__all__ = ["app"]